@@ -1,33 +1,76 @@
+import hashlib
+import os
+import secrets
+from contextvars import ContextVar
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 from . import models, schemas
-from .database import get_db
+from .cache import LRUCache
+from .database import get_db, release_connection
+from . import membership
+from .membership import membership_index
+from .passwords import password_pool, pwd_context, hash_password, verify_and_update
+from .timing import phase
+from .write_queue import run_write
 
 # Configuration
 SECRET_KEY = "your-secret-key-here"  # In production, use environment variable
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+# Issue tokens carrying the user's project roles, see create_role_claims
+TOKEN_ROLE_CLAIMS = os.getenv("TOKEN_ROLE_CLAIMS") == "1"
+TOKEN_MAX_ROLE_CLAIMS = int(os.getenv("TOKEN_MAX_ROLE_CLAIMS", "100"))
+# Lifetime of the single-use tickets that open the event stream
+STREAM_TICKET_SECONDS = int(os.getenv("STREAM_TICKET_SECONDS", "30"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Verified principals keyed by raw token: (decoded claims, detached user snapshot,
+# project roles claimed by the token or None). Entries expire with the token's exp claim.
+principal_cache = LRUCache(maxsize=PRINCIPAL_CACHE_SIZE)
+
+ROLE_CODES = {models.UserRole.ADMIN: "a", models.UserRole.MEMBER: "m", models.UserRole.VIEWER: "v"}
+_CODE_ROLES = {code: role for role, code in ROLE_CODES.items()}
+
+# (user id, {project_id: role}) of the current request's token when its claims are current
+_token_roles: ContextVar[Optional[tuple]] = ContextVar("token_roles", default=None)
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = db.query(models.User).filter(models.User.username == username).first()
+async def get_password_hash_async(password):
+    """Hash on the bounded password pool instead of the event loop"""
+    with phase("auth"):
+        return await password_pool.run(hash_password, password)
+
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    user = await db.scalar(select(models.User).where(models.User.username == username))
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    # Do not hold a pooled connection through bcrypt
+    await release_connection(db)
+    with phase("auth"):
+        valid, new_hash = await password_pool.run(verify_and_update, password, user.hashed_password)
+    if not valid:
         return False
+    
+    # Rehash transparently when the bcrypt cost settings have changed
+    if new_hash:
+        def store_hash(session):
+            session.get(models.User, user.id).hashed_password = new_hash
+        
+        await run_write(db, store_hash)
+        invalidate_user(user.id)
     return user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -40,7 +83,113 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def create_role_claims(db: AsyncSession, user_id: int) -> dict:
+    """Claims listing the user's project roles, stamped with their membership version.
+
+    A token carrying them is authorized without looking roles up for as long
+    as the version matches; any membership change of the user bumps it, and
+    the token falls back to the membership index until refreshed. Users with
+    more than TOKEN_MAX_ROLE_CLAIMS projects get no claims.
+    """
+    if not (TOKEN_ROLE_CLAIMS and membership.membership_versions_enabled):
+        return {}
+    # Version first: a change landing after it makes these claims stale, never wrong
+    version = await membership.load_membership_version(db, user_id)
+    members = models.project_members.c
+    rows = (await db.execute(
+        select(members.project_id, members.role).where(members.user_id == user_id)
+    )).all()
+    roles = {project_id: ROLE_CODES[role] for project_id, role in rows}
+    owned = await db.scalars(select(models.Project.id).where(models.Project.owner_id == user_id))
+    roles.update((project_id, ROLE_CODES[models.UserRole.ADMIN]) for project_id in owned)
+    if len(roles) > TOKEN_MAX_ROLE_CLAIMS:
+        return {}
+    return {"uid": user_id, "mv": version, "roles": {str(project_id): code for project_id, code in roles.items()}}
+
+async def issue_access_token(db: AsyncSession, user: models.User) -> str:
+    claims = await create_role_claims(db, user.id)
+    return create_access_token(
+        data={"sub": user.username, **claims}, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+
+def _ticket_id(ticket: str) -> str:
+    return hashlib.sha256(ticket.encode()).hexdigest()
+
+async def issue_stream_ticket(db: AsyncSession, user_id: int) -> str:
+    """Short-lived, single-use ticket standing in for the access token in a stream URL.
+
+    EventSource cannot send headers, and URLs end up in access logs and
+    browser history, so the URL carries this ticket instead of the token.
+    Tickets are kept in the database, hashed, so any worker can redeem them.
+    """
+    ticket = secrets.token_urlsafe(32)
+    now = datetime.utcnow()
+
+    def store(session):
+        session.execute(delete(models.EventTicket).where(models.EventTicket.expires_at <= now))
+        session.add(models.EventTicket(
+            id=_ticket_id(ticket), user_id=user_id, expires_at=now + timedelta(seconds=STREAM_TICKET_SECONDS),
+        ))
+
+    await run_write(db, store)
+    return ticket
+
+async def redeem_stream_ticket(db: AsyncSession, ticket: str) -> models.User:
+    """User a stream ticket was issued to; the ticket is used up"""
+    def consume(session):
+        return session.execute(
+            delete(models.EventTicket)
+            .where(models.EventTicket.id == _ticket_id(ticket), models.EventTicket.expires_at > datetime.utcnow())
+            .returning(models.EventTicket.user_id)
+        ).scalar()
+
+    with phase("auth"):
+        user_id = await run_write(db, consume)
+        user = await db.get(models.User, user_id) if user_id is not None else None
+        if user is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired ticket")
+        _token_roles.set(None)
+        return user
+
+def _claimed_roles(payload: dict):
+    roles = payload.get("roles")
+    if not isinstance(roles, dict) or "mv" not in payload:
+        return None
+    try:
+        return {int(project_id): _CODE_ROLES[code] for project_id, code in roles.items()}
+    except (KeyError, ValueError):
+        return None
+
+def _snapshot_user(user: models.User) -> models.User:
+    """Copy a user's columns into a detached instance safe to share across sessions"""
+    snapshot = models.User(
+        id=user.id,
+        email=user.email,
+        username=user.username,
+        hashed_password=user.hashed_password,
+        created_at=user.created_at,
+    )
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+def invalidate_user(user_id: int):
+    """Drop cached principals for a user whose row has changed"""
+    return principal_cache.evict_if(lambda entry: entry[1].id == user_id)
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    with phase("auth"):
+        payload, user, roles = await _resolve_principal(token, db)
+        current = None
+        if roles is not None and payload["mv"] == await membership_index.get_version(db, user.id):
+            current = (user.id, roles)
+        _token_roles.set(current)
+        return user
+
+async def _resolve_principal(token: str, db: AsyncSession):
+    cached = principal_cache.get(token)
+    if cached is not None:
+        return cached
+    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -54,30 +203,33 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         token_data = schemas.TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user = db.query(models.User).filter(models.User.username == token_data.username).first()
+    user = await db.scalar(select(models.User).where(models.User.username == token_data.username))
     if user is None:
         raise credentials_exception
-    return user
+    user = _snapshot_user(user)
+    roles = _claimed_roles(payload) if payload.get("uid") == user.id else None
+    principal = (payload, user, roles)
+    principal_cache.set(token, principal, expires_at=payload.get("exp"))
+    return principal
 
-def get_user_role_in_project(db: Session, user_id: int, project_id: int):
+async def get_user_role_in_project(db: AsyncSession, user_id: int, project_id: int):
     """Get user's role in a specific project"""
-    project = db.query(models.Project).filter(models.Project.id == project_id).first()
-    if not project:
-        return None
-    
-    # Owner has admin role
-    if project.owner_id == user_id:
-        return models.UserRole.ADMIN
-    
-    # Check member role
-    member = db.query(models.project_members).filter(
-        models.project_members.c.user_id == user_id,
-        models.project_members.c.project_id == project_id
-    ).first()
-    
-    if member:
-        return member.role
-    return None
+    # Current role claims of the request's token answer without the database
+    claimed = _token_roles.get()
+    if claimed is not None and claimed[0] == user_id:
+        return claimed[1].get(project_id)
+    # Owners map to the admin role; the index loads each project's roles once
+    return await membership_index.get_role(db, user_id, project_id)
+
+def accessible_project_ids(user_id: int):
+    """Select the ids of projects the user owns or is a member of.
+
+    A union of two index lookups; "owner_id = ? OR members.any(...)" makes
+    SQLite scan every project.
+    """
+    return select(models.Project.id).where(models.Project.owner_id == user_id).union(
+        select(models.project_members.c.project_id).where(models.project_members.c.user_id == user_id)
+    )
 
 def require_project_access(required_role: models.UserRole = models.UserRole.VIEWER):
     """Decorator to require specific project access"""
@@ -0,0 +1,220 @@
+"""Negotiated response compression.
+
+CompressionMiddleware encodes response bodies of COMPRESS_MIN_SIZE bytes
+or more with the best coding the client accepts: zstd or br when the
+zstandard or brotli package is installed, gzip always. Only text-like
+content types are compressed; Server-Sent Events, byte ranges and
+responses that already have a Content-Encoding pass through unchanged.
+Streaming responses are compressed chunk by chunk, flushing after each,
+so NDJSON rows still arrive as they are produced.
+
+Bodies of COMPRESS_THREAD_MIN_SIZE bytes or more are compressed on the
+thread pool instead of the event loop. A response with an ETag is a
+versioned representation, so its compressed body is kept in an LRU
+cache keyed by path, ETag and coding and reused for later requests; the
+ETag sent with a compressed body is weakened, since it now names one of
+several encodings of the same representation, and If-None-Match keeps
+matching it.
+"""
+import os
+import zlib
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from .cache import LRUCache
+from .timing import phase
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+COMPRESS_RESPONSES = os.getenv("COMPRESS_RESPONSES", "1") == "1"
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))  # bytes
+COMPRESS_THREAD_MIN_SIZE = int(os.getenv("COMPRESS_THREAD_MIN_SIZE", str(64 * 1024)))  # bytes
+COMPRESS_CACHE_SIZE = int(os.getenv("COMPRESS_CACHE_SIZE", "1024"))  # entries
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "4"))
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "3"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript")
+UNCOMPRESSED_TYPES = ("text/event-stream",)
+
+class _Stream:
+    """Incremental encoder: compress() buffers, flush() emits all input so far, finish() ends the stream"""
+
+    def __init__(self, compress, flush, finish):
+        self.compress = compress
+        self.flush = flush
+        self.finish = finish
+
+def _gzip_stream():
+    encoder = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    return _Stream(encoder.compress, lambda: encoder.flush(zlib.Z_SYNC_FLUSH), encoder.flush)
+
+def _gzip(body: bytes) -> bytes:
+    encoder = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return encoder.compress(body) + encoder.flush()
+
+def _zstd_stream():
+    encoder = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    return _Stream(encoder.compress, lambda: encoder.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK), encoder.flush)
+
+def _zstd(body: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+
+def _brotli_stream():
+    encoder = brotli.Compressor(quality=BROTLI_QUALITY)
+    return _Stream(encoder.process, encoder.flush, encoder.finish)
+
+def _brotli(body: bytes) -> bytes:
+    return brotli.compress(body, quality=BROTLI_QUALITY)
+
+# coding -> (one-shot encoder, streaming encoder factory), in order of preference
+CODINGS = {}
+if zstandard is not None:
+    CODINGS["zstd"] = (_zstd, _zstd_stream)
+if brotli is not None:
+    CODINGS["br"] = (_brotli, _brotli_stream)
+CODINGS["gzip"] = (_gzip, _gzip_stream)
+
+# Compressed bodies of versioned responses: (path, etag, coding) -> bytes
+compressed_cache = LRUCache(maxsize=COMPRESS_CACHE_SIZE)
+
+_counters = {"responses": 0, "bytes_in": 0, "bytes_out": 0}
+
+def stats() -> dict:
+    ratio = _counters["bytes_out"] / _counters["bytes_in"] if _counters["bytes_in"] else 0.0
+    return {**_counters, "ratio": ratio, "codings": ",".join(CODINGS)}
+
+def negotiate(accept_encoding: str):
+    """The supported coding the Accept-Encoding header prefers, or None for identity"""
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding.strip().lower()] = q
+    wildcard = weights.get("*", 0.0)
+    best, best_q = None, 0.0
+    for coding in CODINGS:
+        q = weights.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+def compressible(headers: Headers) -> bool:
+    content_type = headers.get("content-type", "").lower()
+    return (
+        "content-encoding" not in headers
+        and "content-range" not in headers
+        # Byte ranges count bytes of the identity body; keep them meaningful
+        and "accept-ranges" not in headers
+        and content_type.startswith(COMPRESSIBLE_TYPES)
+        and not content_type.startswith(UNCOMPRESSED_TYPES)
+    )
+
+async def _compress(coding: str, body: bytes) -> bytes:
+    encode = CODINGS[coding][0]
+    with phase("compress"):
+        if len(body) >= COMPRESS_THREAD_MIN_SIZE:
+            return await run_in_threadpool(encode, body)
+        return encode(body)
+
+def _count(bytes_in: int, bytes_out: int):
+    _counters["bytes_in"] += bytes_in
+    _counters["bytes_out"] += bytes_out
+
+class CompressionMiddleware:
+    """ASGI middleware compressing response bodies with the negotiated coding"""
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not COMPRESS_RESPONSES or scope["method"] == "HEAD":
+            return await self.app(scope, receive, send)
+        request_headers = Headers(scope=scope)
+        coding = negotiate(request_headers.get("accept-encoding", ""))
+        if coding is None or "range" in request_headers:
+            return await self.app(scope, receive, send)
+
+        start = None
+        stream = None  # _Stream once a multi-message body is being compressed
+        passthrough = False
+
+        def encoded_headers(length=None):
+            headers = MutableHeaders(raw=start["headers"])
+            headers["Content-Encoding"] = coding
+            headers.add_vary_header("Accept-Encoding")
+            if length is None:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(length)
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = "W/" + etag
+
+        async def send_compressed(message):
+            nonlocal start, stream, passthrough
+            if passthrough:
+                return await send(message)
+            if message["type"] == "http.response.start":
+                start = {**message, "headers": list(message.get("headers", ()))}
+                if start["status"] < 200 or start["status"] in (204, 206, 304) or not compressible(
+                    Headers(raw=start["headers"])
+                ):
+                    passthrough = True
+                    await send(start)
+                return
+            if message["type"] != "http.response.body":
+                return await send(message)
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if stream is None and not more_body:
+                # Whole body in one message
+                if len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    return await send(message)
+                etag = Headers(raw=start["headers"]).get("etag") if start["status"] == 200 else None
+                key = (scope["path"], etag, coding)
+                compressed = compressed_cache.get(key) if etag else None
+                if compressed is None:
+                    compressed = await _compress(coding, body)
+                    if etag:
+                        compressed_cache.set(key, compressed)
+                _counters["responses"] += 1
+                _count(len(body), len(compressed))
+                encoded_headers(len(compressed))
+                await send(start)
+                return await send({"type": "http.response.body", "body": compressed})
+
+            # Streaming: compress each chunk and flush it, so rows are not held back
+            if stream is None:
+                stream = CODINGS[coding][1]()
+                _counters["responses"] += 1
+                encoded_headers()
+                await send(start)
+            with phase("compress"):
+                if len(body) >= COMPRESS_THREAD_MIN_SIZE:
+                    chunk = await run_in_threadpool(
+                        lambda: stream.compress(body) + (stream.flush() if more_body else stream.finish())
+                    )
+                else:
+                    chunk = stream.compress(body) + (stream.flush() if more_body else stream.finish())
+            _count(len(body), len(chunk))
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,20 +1,179 @@
-from sqlalchemy import create_engine
+import os
+from contextlib import asynccontextmanager
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+from . import doc_storage
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./app.db"
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+ASYNC_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+# Set ASYNC_DB=1 to serve requests from an AsyncSession over aiosqlite instead of
+# the sync engine, e.g. to compare latency of both paths at equal concurrency.
+ASYNC_DB = os.getenv("ASYNC_DB", "0").lower() in ("1", "true", "yes")
+
+# Set WRITE_QUEUE=1 to funnel mutations through the group-commit writer in
+# app.write_queue; request sessions then only read.
+WRITE_QUEUE = os.getenv("WRITE_QUEUE", "0").lower() in ("1", "true", "yes")
+
+# DB_PROFILE=production tunes SQLite for concurrent serving: WAL and the
+# pragmas below on every connection, one dedicated writer connection and a
+# pool of read-only connections. Request sessions all read from that pool;
+# run_write takes the writer only for the write itself.
+DB_PROFILE = os.getenv("DB_PROFILE", "default")
+PRODUCTION = DB_PROFILE == "production" and SQLALCHEMY_DATABASE_URL.startswith("sqlite")
+READER_POOL_SIZE = int(os.getenv("DB_READER_POOL_SIZE", "8"))
+SQLITE_PRAGMAS = {
+    "synchronous": "NORMAL",
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536")),  # negative means KiB
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+}
+
+def _sqlite_pragmas(read_only: bool):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not read_only:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+    return on_connect
+
+def _make_engines(factory, url, **kwargs):
+    """Return (writer, reader) engines; they are the same engine outside production"""
+    if not PRODUCTION:
+        writer = factory(url, **kwargs)
+        return writer, writer
+    writer = factory(url, pool_size=1, max_overflow=0, **kwargs)
+    reader = factory(url, pool_size=READER_POOL_SIZE, max_overflow=0, **kwargs)
+    for target, read_only in ((writer, False), (reader, True)):
+        event.listen(getattr(target, "sync_engine", target), "connect", _sqlite_pragmas(read_only))
+    return writer, reader
+
+engine, reader_engine = _make_engines(
+    create_engine, SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+ReaderSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=reader_engine)
+
+async_engine, async_reader_engine = _make_engines(create_async_engine, ASYNC_DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+AsyncReaderSessionLocal = async_sessionmaker(
+    async_reader_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+# doc_text() for reading compressed documentation bodies in SQL, before any connection is opened
+for _engine in (engine, reader_engine, async_engine, async_reader_engine):
+    doc_storage.install(_engine)
 
 Base = declarative_base()
 
+class ThreadedSession:
+    """Awaitable facade over a sync Session.
+
+    Mirrors the subset of the AsyncSession API the routers use, running each
+    blocking call in the threadpool so the event loop is never stalled.
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    def _execute(self, statement, params=None, **kwargs):
+        result = self.sync_session.execute(statement, params, **kwargs)
+        # Fetch rows in the worker thread, as the async driver does
+        return result.freeze()() if getattr(result, "returns_rows", True) else result
+
+    async def execute(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self._execute, statement, params, **kwargs)
+
+    async def scalar(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, statement, params, **kwargs)
+
+    async def scalars(self, statement, params=None, **kwargs):
+        result = await self.execute(statement, params, **kwargs)
+        return result.scalars()
+
+    async def stream(self, statement, params=None, **kwargs):
+        result = await run_in_threadpool(self.sync_session.execute, statement, params, **kwargs)
+        return ThreadedResult(result)
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    async def delete(self, instance):
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self):
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def refresh(self, instance, attribute_names=None):
+        await run_in_threadpool(self.sync_session.refresh, instance, attribute_names)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+class ThreadedResult:
+    """Counterpart of AsyncResult for ThreadedSession.stream"""
+
+    def __init__(self, result):
+        self._result = result
+
+    async def partitions(self, size=None):
+        while True:
+            partition = await run_in_threadpool(self._result.fetchmany, size)
+            if not partition:
+                break
+            yield partition
+
+@asynccontextmanager
+async def session_scope(read_only: bool = False):
+    """Open a session for the configured path outside of request dependencies"""
+    if ASYNC_DB:
+        async with (AsyncReaderSessionLocal if read_only else AsyncSessionLocal)() as db:
+            yield db
+    else:
+        db = ThreadedSession((ReaderSessionLocal if read_only else SessionLocal)())
+        try:
+            yield db
+        finally:
+            await db.close()
+
+async def release_connection(db):
+    """End db's transaction so its connection goes back to the pool.
+
+    For handlers about to wait on something other than the database, e.g.
+    bcrypt; loaded objects stay usable (sessions do not expire on commit).
+    """
+    await db.commit()
+
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db(request: Request):
+    # Safe methods never write, so they can use the read-only pool; with the
+    # write queue on or in production no request session writes, run_write
+    # does in a session of its own
+    read_only = WRITE_QUEUE or PRODUCTION or request.method in ("GET", "HEAD")
+    async with session_scope(read_only=read_only) as db:
         yield db
-    finally:
-        db.close() 
\ No newline at end of file
@@ -0,0 +1,190 @@
+"""Storage of documentation bodies: compression, size and excerpt.
+
+Bodies of DOC_COMPRESS_THRESHOLD bytes or more are stored zlib-compressed,
+as BLOBs in the same content column. SQLite keeps each value's own type,
+so rows written before stay plain TEXT and both kinds read back through
+CompressedText. SQL sees the plain text through doc_text(), a function
+registered on every SQLite connection; the full-text index and the LIKE
+search fallback read bodies through it. Anything else writing to the
+documentation table (e.g. the sqlite3 shell) has no doc_text() and fails
+in the search index triggers.
+
+Every row also keeps content_size, the body's size in UTF-8 bytes, and
+excerpt, its first DOC_EXCERPT_LENGTH characters, so documentation lists
+show a summary without reading bodies at all.
+
+To compress bodies stored before compression was enabled, or after
+lowering the threshold, run from the backend directory:
+
+    python -m app.doc_storage stats
+    python -m app.doc_storage compress
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import zlib
+from sqlalchemy import Text, event, func, text, type_coerce
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.types import TypeDecorator
+
+logger = logging.getLogger(__name__)
+
+DOC_COMPRESS_THRESHOLD = int(os.getenv("DOC_COMPRESS_THRESHOLD", "4096"))  # bytes; 0 disables
+DOC_COMPRESS_LEVEL = int(os.getenv("DOC_COMPRESS_LEVEL", "6"))
+DOC_EXCERPT_LENGTH = int(os.getenv("DOC_EXCERPT_LENGTH", "200"))
+CHUNK_SIZE = 64 * 1024
+
+# Set once doc_text() is registered on the engines, i.e. on SQLite
+sql_functions = False
+
+def encode(body: str):
+    """Value to store for body: compressed bytes when that pays off, else body itself"""
+    data = body.encode()
+    if DOC_COMPRESS_THRESHOLD <= 0 or len(data) < DOC_COMPRESS_THRESHOLD:
+        return body
+    compressed = zlib.compress(data, DOC_COMPRESS_LEVEL)
+    return compressed if len(compressed) < len(data) else body
+
+def decode(stored):
+    return zlib.decompress(stored).decode() if isinstance(stored, bytes) else stored
+
+def content_size(body: str) -> int:
+    return len(body.encode())
+
+def excerpt(body: str) -> str:
+    return body[:DOC_EXCERPT_LENGTH]
+
+def content_size_default(context):
+    return content_size(context.get_current_parameters()["content"])
+
+def excerpt_default(context):
+    return excerpt(context.get_current_parameters()["content"])
+
+class CompressedText(TypeDecorator):
+    """Text column whose large values are stored compressed (SQLite only)"""
+
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name != "sqlite":
+            return value
+        return encode(value)
+
+    def process_result_value(self, value, dialect):
+        return decode(value)
+
+def stored(column):
+    """The column's value as stored: bytes when compressed, str otherwise"""
+    return type_coerce(column, Text)
+
+def plain_text(column):
+    """SQL expression of the body behind column, for filtering in SQL"""
+    return func.doc_text(column) if sql_functions else column
+
+def iter_body(stored, start: int = 0, stop: int = None, chunk_size: int = CHUNK_SIZE):
+    """Yield bytes start..stop of the UTF-8 body, inflating no further than stop"""
+    if not isinstance(stored, bytes):
+        data = stored.encode()[start:stop]
+        for offset in range(0, len(data), chunk_size):
+            yield data[offset:offset + chunk_size]
+        return
+    inflater = zlib.decompressobj()
+    data, position = stored, 0
+    while not inflater.eof and (stop is None or position < stop):
+        chunk = inflater.decompress(data, chunk_size)
+        data = inflater.unconsumed_tail
+        if not chunk and not data:
+            break
+        chunk_start, position = position, position + len(chunk)
+        if position > start:
+            yield chunk[max(start - chunk_start, 0):None if stop is None else stop - chunk_start]
+
+def register_functions(dbapi_connection, connection_record=None):
+    """Define doc_text() on a sqlite3 connection"""
+    dbapi_connection.create_function("doc_text", 1, decode, deterministic=True)
+
+def install(engine):
+    """Register doc_text() on every connection a SQLite engine opens"""
+    global sql_functions
+    target = getattr(engine, "sync_engine", engine)
+    if target.dialect.name != "sqlite":
+        return False
+    if not event.contains(target, "connect", register_functions):
+        event.listen(target, "connect", register_functions)
+    sql_functions = True
+    return True
+
+def create_doc_storage(engine):
+    """Add content_size and excerpt to databases created before them, and fill them in"""
+    if engine.dialect.name != "sqlite":
+        return False
+    try:
+        with engine.begin() as conn:
+            columns = {row[1] for row in conn.execute(text("PRAGMA table_info(documentation)"))}
+            for name, ddl in (("content_size", "INTEGER"), ("excerpt", "VARCHAR")):
+                if name not in columns:
+                    conn.execute(text(f"ALTER TABLE documentation ADD COLUMN {name} {ddl}"))
+            conn.execute(text(
+                "UPDATE documentation SET content_size = length(CAST(doc_text(content) AS BLOB)),"
+                " excerpt = substr(doc_text(content), 1, :length) WHERE content_size IS NULL"
+            ), {"length": DOC_EXCERPT_LENGTH})
+    except OperationalError as exc:
+        logger.warning("Documentation summaries unavailable: %s", exc)
+        return False
+    return True
+
+def compress(engine, batch_size: int = 500) -> int:
+    """Compress stored plain bodies at or above the threshold; returns how many were"""
+    if DOC_COMPRESS_THRESHOLD <= 0:
+        return 0
+    compressed = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(text(
+                "SELECT id, content FROM documentation WHERE id > :last_id AND typeof(content) = 'text'"
+                " AND content_size >= :threshold ORDER BY id LIMIT :limit"
+            ), {"last_id": last_id, "threshold": DOC_COMPRESS_THRESHOLD, "limit": batch_size}).all()
+            if not rows:
+                return compressed
+            updates = [{"id": row_id, "content": value} for row_id, body in rows
+                       if isinstance(value := encode(body), bytes)]
+            if updates:
+                conn.execute(text("UPDATE documentation SET content = :content WHERE id = :id"), updates)
+            compressed += len(updates)
+            last_id = rows[-1][0]
+
+def storage_stats(engine) -> dict:
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT typeof(content), COUNT(*), SUM(length(CAST(content AS BLOB))), SUM(content_size)"
+            " FROM documentation GROUP BY 1"
+        )).all()
+    kinds = {"text": "plain", "blob": "compressed"}
+    return {
+        kinds.get(kind, kind): {"rows": count, "stored_bytes": stored_bytes or 0, "body_bytes": body_bytes or 0}
+        for kind, count, stored_bytes, body_bytes in rows
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compress documentation bodies or report how they are stored")
+    parser.add_argument("command", choices=["compress", "stats"])
+    args = parser.parse_args()
+
+    from .database import engine
+    from . import models, search
+    models.Base.metadata.create_all(bind=engine)
+    if not create_doc_storage(engine):
+        sys.exit("Compressed documentation bodies are not supported on this database")
+    if args.command == "compress":
+        # The search index must read bodies through doc_text() before any are compressed
+        search.create_search_index(engine)
+        print(f"Compressed {compress(engine)} documentation bodies")
+    else:
+        print(json.dumps(storage_stats(engine), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import asyncio
+import itertools
+import os
+import time
+from typing import Iterable
+from .serialization import dumps
+
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "256"))
+EVENT_HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
+
+# Queued in place of an event when a subscriber is dropped
+DROPPED = None
+
+class Subscription:
+    __slots__ = ("user_id", "project_ids", "follow_new", "queue", "dropped")
+
+    def __init__(self, user_id: int, project_ids: set, follow_new: bool, queue_size: int):
+        self.user_id = user_id
+        self.project_ids = project_ids
+        self.follow_new = follow_new  # Also receive projects the user gains access to later
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+class EventHub:
+    """In-process pub/sub for change events, fanned out per project.
+
+    Each subscriber has a bounded queue. publish never waits: a subscriber
+    whose queue is full is dropped and told so, and is expected to
+    reconnect and refetch. Events are encoded once and shared by every
+    subscriber. Must be used from the event loop. The hub is per process,
+    so with several workers a client only sees writes made by its own.
+    """
+
+    def __init__(self, queue_size: int = EVENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._by_project = {}  # project_id -> set of subscriptions
+        self._by_user = {}  # user_id -> set of subscriptions following new projects
+        self._seq = itertools.count(1)
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, user_id: int, project_ids: Iterable[int], follow_new: bool = True) -> Subscription:
+        subscription = Subscription(user_id, set(project_ids), follow_new, self.queue_size)
+        for project_id in subscription.project_ids:
+            self._by_project.setdefault(project_id, set()).add(subscription)
+        if follow_new:
+            self._by_user.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        for project_id in subscription.project_ids:
+            subscribers = self._by_project.get(project_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._by_project[project_id]
+        followers = self._by_user.get(subscription.user_id)
+        if followers is not None:
+            followers.discard(subscription)
+            if not followers:
+                del self._by_user[subscription.user_id]
+
+    def grant(self, user_id: int, project_id: int):
+        """Route a project's events to the user's live subscriptions that follow new projects"""
+        for subscription in self._by_user.get(user_id, ()):
+            if project_id not in subscription.project_ids:
+                subscription.project_ids.add(project_id)
+                self._by_project.setdefault(project_id, set()).add(subscription)
+
+    def drop_project(self, project_id: int):
+        for subscription in self._by_project.pop(project_id, ()):
+            subscription.project_ids.discard(project_id)
+
+    def publish(self, event_type: str, project_id: int, ids: Iterable[int]):
+        """Queue {"seq", "type", "project_id", "ids", "at"} for the project's subscribers"""
+        subscribers = self._by_project.get(project_id)
+        self.published += 1
+        if not subscribers:
+            return
+        # Encoded once as a complete SSE frame and shared by every subscriber
+        seq = next(self._seq)
+        event = b"id: %d\nevent: change\ndata: %s\n\n" % (seq, dumps({
+            "seq": seq,
+            "type": event_type,
+            "project_id": project_id,
+            "ids": list(ids),
+            "at": time.time(),
+        }))
+        for subscription in list(subscribers):
+            try:
+                subscription.queue.put_nowait(event)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                self._drop(subscription)
+
+    def publish_grouped(self, event_type: str, items: Iterable):
+        """Publish one event per project for (project_id, id) pairs"""
+        grouped = {}
+        for project_id, item_id in items:
+            grouped.setdefault(project_id, []).append(item_id)
+        for project_id, ids in grouped.items():
+            self.publish(event_type, project_id, ids)
+
+    def _drop(self, subscription: Subscription):
+        self.unsubscribe(subscription)
+        subscription.dropped = True
+        self.dropped += 1
+        # Make room for the marker; the client refetches anyway
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(DROPPED)
+
+    def stats(self):
+        subscriptions = set().union(*self._by_project.values(), *self._by_user.values())
+        return {
+            "subscribers": len(subscriptions),
+            "projects": len(self._by_project),
+            "queue_size": self.queue_size,
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+event_hub = EventHub()
+
+async def sse_stream(subscription: Subscription, heartbeat: float = EVENT_HEARTBEAT_SECONDS):
+    """Server-Sent Events for a subscription; unsubscribes when the client goes away"""
+    try:
+        yield b"retry: 3000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                # Comment line; keeps proxies from closing the idle connection
+                yield b": keepalive\n\n"
+                continue
+            if event is DROPPED:
+                yield b"event: dropped\ndata: {}\n\n"
+                return
+            yield event
+    finally:
+        event_hub.unsubscribe(subscription)
@@ -0,0 +1,50 @@
+from functools import lru_cache
+from typing import FrozenSet, Optional
+from fastapi import HTTPException, Response
+from pydantic import create_model
+
+def _split(value: str, allowed, param: str) -> set:
+    names = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = names - set(allowed)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown {param}: {', '.join(sorted(unknown))}; choose from {', '.join(allowed)}",
+        )
+    return names
+
+def select_fields(schema, fields: Optional[str], include: Optional[str] = None,
+                  relations: tuple = ()) -> Optional[FrozenSet[str]]:
+    """Resolve fields= and include= into the set of response fields.
+
+    fields picks plain attributes of schema and include picks nested
+    relations; either one left out means all of its kind. Returns None when
+    neither is given, i.e. the full response. id is always returned.
+    """
+    if fields is None and include is None:
+        return None
+    plain = [name for name in schema.model_fields if name not in relations]
+    chosen = _split(fields, plain, "fields") if fields is not None else set(plain)
+    chosen |= _split(include, relations, "include") if include is not None else set(relations)
+    chosen.add("id")
+    return frozenset(chosen)
+
+@lru_cache(maxsize=256)
+def sparse_model(schema, fields: Optional[FrozenSet[str]]):
+    """Subset of schema with only fields, so excluded attributes are never read"""
+    if fields is None:
+        return schema
+    return create_model(
+        f"{schema.__name__}Sparse",
+        __config__=schema.model_config,
+        **{name: (info.annotation, info) for name, info in schema.model_fields.items() if name in fields},
+    )
+
+def variant_key(fields: Optional[FrozenSet[str]]) -> str:
+    """Stable label of a field selection, for cache keys and ETags"""
+    return ",".join(sorted(fields)) if fields is not None else ""
+
+def render(obj, schema, fields: Optional[FrozenSet[str]]) -> Response:
+    """Serialize obj with only fields, bypassing the route's response_model"""
+    body = sparse_model(schema, fields).model_validate(obj).model_dump_json()
+    return Response(content=body, media_type="application/json")
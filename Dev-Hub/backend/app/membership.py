@@ -0,0 +1,197 @@
+import logging
+import os
+import threading
+import time
+from typing import Optional
+from sqlalchemy import column, select, table, text
+from sqlalchemy.exc import OperationalError
+from . import models
+from .cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+MEMBERSHIP_INDEX_SIZE = int(os.getenv("MEMBERSHIP_INDEX_SIZE", "10000"))
+# Seconds a project's cached owner and member roles are trusted before they
+# are read again, which bounds how long another worker's member change or
+# project deletion can go unnoticed; 0 reads them on every check
+MEMBERSHIP_INDEX_TTL = float(os.getenv("MEMBERSHIP_INDEX_TTL", "1"))
+# Seconds a membership version is trusted before it is read again, which
+# bounds how long another worker's membership change can go unnoticed; 0
+# reads it on every check
+MEMBERSHIP_VERSION_TTL = float(os.getenv("MEMBERSHIP_VERSION_TTL", "1"))
+
+# One counter per user, bumped by triggers whenever a project membership of
+# theirs changes: added, role changed or removed, and projects they own
+# created, deleted or handed over. Tokens carrying role claims record the
+# counter they were issued at, see auth.create_role_claims.
+_BUMP = """INSERT INTO membership_versions(user_id, version)
+        SELECT {ref}.{col}, 1 WHERE {ref}.{col} IS NOT NULL
+        ON CONFLICT(user_id) DO UPDATE SET version = version + 1;"""
+
+def _bump_trigger(name, event, table_name, refs, col):
+    body = "\n        ".join(_BUMP.format(ref=ref, col=col) for ref in refs)
+    return f"""CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON {table_name} BEGIN
+        {body}
+    END"""
+
+MEMBERSHIP_VERSION_DDL = [
+    """CREATE TABLE IF NOT EXISTS membership_versions (
+        user_id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )""",
+    _bump_trigger("project_members_membership_insert", "INSERT", "project_members", ("new",), "user_id"),
+    _bump_trigger("project_members_membership_update", "UPDATE", "project_members", ("old", "new"), "user_id"),
+    _bump_trigger("project_members_membership_delete", "DELETE", "project_members", ("old",), "user_id"),
+    _bump_trigger("projects_membership_insert", "INSERT", "projects", ("new",), "owner_id"),
+    _bump_trigger("projects_membership_update", "UPDATE OF owner_id", "projects", ("old", "new"), "owner_id"),
+    _bump_trigger("projects_membership_delete", "DELETE", "projects", ("old",), "owner_id"),
+]
+
+membership_versions = table("membership_versions", column("user_id"), column("version"))
+
+membership_versions_enabled = False
+
+def create_membership_versions(engine):
+    """Create the membership_versions table and the triggers that maintain it"""
+    global membership_versions_enabled
+    if engine.dialect.name != "sqlite":
+        return False
+    try:
+        with engine.begin() as conn:
+            for ddl in MEMBERSHIP_VERSION_DDL:
+                conn.execute(text(ddl))
+    except OperationalError as exc:
+        # UPSERT needs SQLite 3.24+; without it tokens carry no role claims
+        logger.warning("Membership versions unavailable, tokens carry no role claims: %s", exc)
+        return False
+    membership_versions_enabled = True
+    return True
+
+async def load_membership_version(db, user_id: int) -> int:
+    """Current membership version of a user, read from the database"""
+    version = await db.scalar(
+        select(membership_versions.c.version).where(membership_versions.c.user_id == user_id)
+    )
+    return version or 0
+
+class MembershipIndex:
+    """In-memory (user_id, project_id) -> UserRole index.
+
+    Each project's owner and member roles are loaded on first use, so
+    access checks cost a dict lookup no matter how many members a project
+    has. Writes through this process update or drop the entry right away;
+    entries also expire after project_ttl seconds, so changes made by other
+    workers are seen within that time.
+
+    It also caches each user's membership version, which the same writes
+    invalidate, so checking a token's role claims is current costs no query.
+    Versions also expire after version_ttl seconds: the triggers bump them
+    for changes made by any worker, and a version read again picks those up.
+    """
+
+    def __init__(self, maxsize: int = MEMBERSHIP_INDEX_SIZE, version_ttl: float = MEMBERSHIP_VERSION_TTL,
+                 project_ttl: float = MEMBERSHIP_INDEX_TTL):
+        # project_id -> (owner_id, {user_id: role}); None marks a missing project
+        self._projects = LRUCache(maxsize=maxsize)
+        self._versions = LRUCache(maxsize=maxsize)  # user_id -> membership version
+        self.version_ttl = version_ttl
+        self.project_ttl = project_ttl
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _set_project(self, project_id: int, entry):
+        # Called with _lock held
+        if self.project_ttl > 0:
+            self._projects.set(project_id, entry, expires_at=time.time() + self.project_ttl)
+        else:
+            self._projects.pop(project_id)
+
+    async def _load(self, db, project_id: int):
+        entry = self._projects.get(project_id, default=False)
+        if entry is not False:
+            return entry
+
+        writes = self._writes
+        owner_id = await db.scalar(select(models.Project.owner_id).where(models.Project.id == project_id))
+        if owner_id is None:
+            entry = None
+        else:
+            rows = await db.execute(select(
+                models.project_members.c.user_id, models.project_members.c.role
+            ).where(models.project_members.c.project_id == project_id))
+            roles = {user_id: role for user_id, role in rows}
+            roles[owner_id] = models.UserRole.ADMIN
+            entry = (owner_id, roles)
+
+        # Skip installing a snapshot that a concurrent write may have outdated
+        with self._lock:
+            if writes == self._writes:
+                self._set_project(project_id, entry)
+        return entry
+
+    async def get_version(self, db, user_id: int) -> int:
+        version = self._versions.get(user_id)
+        if version is not None:
+            return version
+        writes = self._writes
+        version = await load_membership_version(db, user_id)
+        with self._lock:
+            if writes == self._writes and self.version_ttl > 0:
+                self._versions.set(user_id, version, expires_at=time.time() + self.version_ttl)
+        return version
+
+    async def get_role(self, db, user_id: int, project_id: int) -> Optional[models.UserRole]:
+        entry = await self._load(db, project_id)
+        if entry is None:
+            return None
+        return entry[1].get(user_id)
+
+    async def get_owner(self, db, project_id: int) -> Optional[int]:
+        entry = await self._load(db, project_id)
+        return None if entry is None else entry[0]
+
+    async def get_members(self, db, project_id: int) -> dict:
+        """user_id -> role of everyone in the project, owner included; do not modify"""
+        entry = await self._load(db, project_id)
+        return {} if entry is None else entry[1]
+
+    async def project_exists(self, db, project_id: int) -> bool:
+        return await self._load(db, project_id) is not None
+
+    def add_project(self, project_id: int, owner_id: int):
+        with self._lock:
+            self._writes += 1
+            self._set_project(project_id, (owner_id, {owner_id: models.UserRole.ADMIN}))
+            self._versions.pop(owner_id)
+
+    def member_changed(self, project_id: int, user_id: int):
+        """Forget a project's roles after user_id was added to it or their role changed"""
+        with self._lock:
+            self._writes += 1
+            self._versions.pop(user_id)
+            # Reloaded on next use rather than updated, so the entry cannot
+            # outlive its TTL by being written to
+            self._projects.pop(project_id)
+
+    def drop_project(self, project_id: int):
+        with self._lock:
+            self._writes += 1
+            entry = self._projects.pop(project_id)
+            self._set_project(project_id, None)
+            if entry:
+                for user_id in entry[1]:
+                    self._versions.pop(user_id)
+            else:
+                # Members unknown here; every one of them has a new version
+                self._versions.clear()
+
+    def clear(self):
+        with self._lock:
+            self._writes += 1
+            self._projects.clear()
+            self._versions.clear()
+
+    def stats(self):
+        return self._projects.stats()
+
+membership_index = MembershipIndex()
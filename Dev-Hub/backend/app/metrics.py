@@ -0,0 +1,226 @@
+"""Request instrumentation and the Prometheus text exposition behind GET /metrics.
+
+MetricsMiddleware times every request until its response headers, adds
+a Server-Timing header, and records per route:
+
+- total wall time, as a histogram
+- the number of SQL queries and the time spent in them (see app.timing)
+- auth time: token resolution and bcrypt
+- serialization time: from the endpoint returning to the response being
+  ready, i.e. response_model validation, lazy loads it triggers, and JSON
+  encoding. This needs routes built with TimedRoute
+- compression time, part of serialization (see app.compression)
+
+Alongside those, render() reports connection pool usage and the counters
+of the in-process caches and queues. Metrics are per worker process.
+"""
+import asyncio
+import functools
+import os
+import time
+from fastapi.routing import APIRoute
+from . import auth, compression, database, query_debug, timing
+from .events import event_hub
+from .membership import membership_index
+from .passwords import password_pool
+from .user_directory import user_directory
+from .versions import project_cache
+from .write_queue import write_queue
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METRICS_BUCKETS = tuple(
+    float(bucket) for bucket in os.getenv("METRICS_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10").split(",")
+)
+
+class RequestMetrics:
+    """Per-route aggregates; only touched from the event loop"""
+
+    def __init__(self, buckets=METRICS_BUCKETS):
+        self.buckets = buckets
+        self.requests = {}  # (method, route, status) -> count
+        self.durations = {}  # (method, route) -> [count per bucket..., +Inf count, sum]
+        self.queries = {}  # (method, route) -> count
+        self.db_seconds = {}  # (method, route) -> seconds
+        self.phase_seconds = {}  # (method, route, phase) -> seconds
+
+    def observe(self, method: str, route: str, status: int, seconds: float, timings: timing.RequestTimings):
+        key = (method, route)
+        self.requests[method, route, str(status)] = self.requests.get((method, route, str(status)), 0) + 1
+        histogram = self.durations.get(key)
+        if histogram is None:
+            histogram = self.durations[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        for index, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                histogram[index] += 1
+        histogram[-2] += 1
+        histogram[-1] += seconds
+        self.queries[key] = self.queries.get(key, 0) + timings.queries
+        self.db_seconds[key] = self.db_seconds.get(key, 0.0) + timings.db_seconds
+        for name, spent in timings.phases.items():
+            self.phase_seconds[method, route, name] = self.phase_seconds.get((method, route, name), 0.0) + spent
+
+    def render(self, lines):
+        _family(lines, "http_requests_total", "counter", "Requests by route and status",
+                [({"method": m, "route": r, "status": s}, count) for (m, r, s), count in sorted(self.requests.items())])
+        lines.append("# HELP http_request_duration_seconds Time until the response headers, by route")
+        lines.append("# TYPE http_request_duration_seconds histogram")
+        for (method, route), histogram in sorted(self.durations.items()):
+            labels = {"method": method, "route": route}
+            for bound, count in zip(self.buckets, histogram):
+                lines.append(f"http_request_duration_seconds_bucket{_labels({**labels, 'le': _number(bound)})} {count}")
+            lines.append(f"http_request_duration_seconds_bucket{_labels({**labels, 'le': '+Inf'})} {histogram[-2]}")
+            lines.append(f"http_request_duration_seconds_count{_labels(labels)} {histogram[-2]}")
+            lines.append(f"http_request_duration_seconds_sum{_labels(labels)} {_number(histogram[-1])}")
+        _family(lines, "http_request_db_queries_total", "counter", "SQL statements issued while handling requests",
+                [({"method": m, "route": r}, count) for (m, r), count in sorted(self.queries.items())])
+        _family(lines, "http_request_db_seconds_total", "counter", "Time spent executing SQL while handling requests",
+                [({"method": m, "route": r}, seconds) for (m, r), seconds in sorted(self.db_seconds.items())])
+        _family(lines, "http_request_phase_seconds_total", "counter", "Time spent in auth and serialization",
+                [({"method": m, "route": r, "phase": p}, seconds) for (m, r, p), seconds in sorted(self.phase_seconds.items())])
+
+request_metrics = RequestMetrics()
+
+def server_timing(seconds: float, timings: timing.RequestTimings) -> str:
+    queries = f"{timings.queries} {'query' if timings.queries == 1 else 'queries'}"
+    entries = [f"total;dur={seconds * 1000:.2f}", f'db;dur={timings.db_seconds * 1000:.2f};desc="{queries}"']
+    entries += [f"{name};dur={spent * 1000:.2f}" for name, spent in timings.phases.items()]
+    return ", ".join(entries)
+
+class MetricsMiddleware:
+    """ASGI middleware recording request metrics and adding Server-Timing"""
+
+    def __init__(self, app, registry: RequestMetrics = request_metrics):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = None
+        with timing.request_scope(record=query_debug.recording()) as timings:
+            def observe(status):
+                seconds = time.perf_counter() - timings.start
+                if timings.endpoint_done is not None:
+                    timings.phases["serialize"] = time.perf_counter() - timings.endpoint_done
+                route = scope.get("route")
+                self.registry.observe(scope["method"], getattr(route, "path", "unmatched"), status, seconds, timings)
+                return seconds
+
+            async def send_with_timing(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    seconds = observe(status)
+                    message["headers"] = [*message.get("headers", ()), (b"server-timing", server_timing(seconds, timings).encode())]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timing)
+            except Exception:
+                if status is None:
+                    status = 500
+                    observe(status)
+                raise
+            finally:
+                if timings.statements is not None:
+                    # After the body, so statements of streamed responses are included
+                    route = getattr(scope.get("route"), "path", "unmatched")
+                    query_debug.finish(scope["method"], route, status, timings)
+
+def _endpoint_done():
+    timings = timing.current()
+    if timings is not None:
+        timings.endpoint_done = time.perf_counter()
+
+def _mark_return(endpoint):
+    # functools.wraps keeps the signature FastAPI reads dependencies from
+    if getattr(endpoint, "_marks_return", False):
+        return endpoint  # include_router rebuilds routes from already wrapped endpoints
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            result = await endpoint(*args, **kwargs)
+            _endpoint_done()
+            return result
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            result = endpoint(*args, **kwargs)
+            _endpoint_done()
+            return result
+    wrapper._marks_return = True
+    return wrapper
+
+class TimedRoute(APIRoute):
+    """APIRoute that notes when its endpoint returns, so the remainder counts as serialization"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _mark_return(endpoint), **kwargs)
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escape = lambda value: str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels.items()) + "}"
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+def _family(lines, name: str, kind: str, help_text: str, samples):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+# Monotonic fields of the components' stats(); everything else is a gauge
+_COUNTERS = {"hits", "misses", "evictions", "completed", "failed", "rejected", "groups", "writes",
+             "replayed_groups", "published", "delivered", "dropped", "responses", "bytes_in", "bytes_out",
+             "searches", "refreshes"}
+
+def _component(lines, prefix: str, stats: dict, labels: dict = None):
+    for key, value in stats.items():
+        if not isinstance(value, (int, float)):
+            continue
+        name = f"{prefix}_{key}_total" if key in _COUNTERS else f"{prefix}_{key}"
+        lines.append(f"# TYPE {name} {'counter' if key in _COUNTERS else 'gauge'}")
+        lines.append(f"{name}{_labels(labels or {})} {_number(value)}")
+
+def _pools():
+    """Distinct connection pools by role; outside the production profile readers share the writer's"""
+    engines = (("sync", database.engine), ("sync_reader", database.reader_engine),
+               ("async", database.async_engine), ("async_reader", database.async_reader_engine))
+    seen = set()
+    for name, engine in engines:
+        pool = getattr(engine, "sync_engine", engine).pool
+        if id(pool) not in seen and hasattr(pool, "checkedout"):
+            seen.add(id(pool))
+            yield name, pool
+
+def render() -> str:
+    lines = []
+    request_metrics.render(lines)
+
+    pools = list(_pools())
+    _family(lines, "db_pool_size", "gauge", "Connections the pool keeps open",
+            [({"pool": name}, pool.size()) for name, pool in pools])
+    _family(lines, "db_pool_checked_out", "gauge", "Connections currently in use",
+            [({"pool": name}, pool.checkedout()) for name, pool in pools])
+    _family(lines, "db_pool_overflow", "gauge", "Connections open beyond the pool size",
+            [({"pool": name}, max(pool.overflow(), 0)) for name, pool in pools])
+
+    caches = (("principal", auth.principal_cache.stats()), ("membership", membership_index.stats()),
+              ("project", project_cache.stats()), ("compressed", compression.compressed_cache.stats()))
+    for key, kind, help_text in (("size", "gauge", "Entries held"), ("maxsize", "gauge", "Entry limit"),
+                                 ("hits", "counter", "Lookups served"), ("misses", "counter", "Lookups not served"),
+                                 ("evictions", "counter", "Entries evicted for space"),
+                                 ("hit_rate", "gauge", "Hits over lookups since start")):
+        name = f"cache_{key}_total" if kind == "counter" else f"cache_{key}"
+        _family(lines, name, kind, help_text, [({"cache": cache}, stats[key]) for cache, stats in caches])
+
+    _component(lines, "password_pool", password_pool.stats(), {"kind": password_pool.kind})
+    _component(lines, "write_queue", write_queue.stats())
+    _component(lines, "event_hub", event_hub.stats())
+    _component(lines, "compression", compression.stats())
+    _component(lines, "user_directory", user_directory.stats())
+    return "\n".join(lines) + "\n"
@@ -1,8 +1,9 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, Table
+from sqlalchemy import Column, Computed, Integer, String, Text, DateTime, ForeignKey, Enum, Table, Index, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from datetime import datetime
 import enum
+from . import doc_storage
 
 Base = declarative_base()
 
@@ -16,13 +17,37 @@ class DocumentationType(enum.Enum):
     LINK = "link"
     CODE_SNIPPET = "code_snippet"
 
+class TaskStatus(enum.Enum):
+    PENDING = "pending"
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+
+class TaskPriority(enum.Enum):
+    LOW = "low"
+    MEDIUM = "medium"
+    HIGH = "high"
+
+# Most urgent first; a task's priority_rank is its position here
+PRIORITY_ORDER = (TaskPriority.HIGH, TaskPriority.MEDIUM, TaskPriority.LOW)
+PRIORITY_RANK_SQL = "CASE priority {} ELSE {} END".format(
+    " ".join(f"WHEN '{priority.value}' THEN {rank}" for rank, priority in enumerate(PRIORITY_ORDER)),
+    len(PRIORITY_ORDER),
+)
+
+def _enum_values(enum_cls):
+    # Persist enum values ("admin") rather than names so the str enums from
+    # schemas round-trip through the same columns
+    return [member.value for member in enum_cls]
+
 # Association table for project members and their roles
 project_members = Table(
     'project_members',
     Base.metadata,
     Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
     Column('project_id', Integer, ForeignKey('projects.id'), primary_key=True),
-    Column('role', Enum(UserRole), nullable=False, default=UserRole.VIEWER)
+    Column('role', Enum(UserRole, values_callable=_enum_values), nullable=False, default=UserRole.VIEWER),
+    # The primary key covers lookups by user; this one a project's roster
+    Index('ix_project_members_project_user_role', 'project_id', 'user_id', 'role'),
 )
 
 class User(Base):
@@ -46,7 +71,7 @@ class Project(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
     description = Column(Text)
-    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -62,8 +87,11 @@ class Task(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
     description = Column(Text)
-    status = Column(String, default="pending")  # pending, in_progress, completed
-    priority = Column(String, default="medium")  # low, medium, high
+    status = Column(Enum(TaskStatus, values_callable=_enum_values), default=TaskStatus.PENDING)
+    priority = Column(Enum(TaskPriority, values_callable=_enum_values), default=TaskPriority.MEDIUM)
+    # 0 for high priority to 2 for low (3 when unset), computed by the database
+    # so sorting by urgency can walk an index
+    priority_rank = Column(Integer, Computed(PRIORITY_RANK_SQL))
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
     assignee_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -74,13 +102,37 @@ class Task(Base):
     assignee = relationship("User", back_populates="tasks")
     documentation = relationship("Documentation", back_populates="task", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index('ix_tasks_project_status', 'project_id', 'status'),
+        # Keyset pages of a project, newest first
+        Index('ix_tasks_project_updated', 'project_id', 'updated_at'),
+        Index('ix_tasks_project_created', 'project_id', 'created_at'),
+        # Descending keys match the priority sort exactly, ties included, so pages need no sorting
+        Index('ix_tasks_project_priority', 'project_id', 'priority_rank', text('updated_at DESC'), text('id DESC')),
+        # The same orders over the tasks assigned to a user, for "my tasks" and the dashboard
+        Index('ix_tasks_assignee_status', 'assignee_id', 'status'),
+        Index('ix_tasks_assignee_updated', 'assignee_id', 'updated_at'),
+        Index('ix_tasks_assignee_created', 'assignee_id', 'created_at'),
+        Index('ix_tasks_assignee_priority', 'assignee_id', 'priority_rank', text('updated_at DESC'), text('id DESC')),
+    )
+
+class EventTicket(Base):
+    """Single-use ticket for opening the event stream, see auth.issue_stream_ticket"""
+    __tablename__ = "event_tickets"
+
+    id = Column(String, primary_key=True)  # SHA-256 of the ticket; the ticket itself is not stored
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
 class Documentation(Base):
     __tablename__ = "documentation"
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
-    content = Column(Text, nullable=False)
-    doc_type = Column(Enum(DocumentationType), nullable=False)
+    content = Column(doc_storage.CompressedText, nullable=False)  # Compressed when large, see app.doc_storage
+    content_size = Column(Integer, default=doc_storage.content_size_default)  # UTF-8 bytes of content
+    excerpt = Column(String, default=doc_storage.excerpt_default)  # Start of content, for lists
+    doc_type = Column(Enum(DocumentationType, values_callable=_enum_values), nullable=False)
     language = Column(String)  # For code snippets (e.g., "python", "javascript")
     url = Column(String)  # For link type documentation
     author_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -92,4 +144,18 @@ class Documentation(Base):
     # Relationships
     author = relationship("User", back_populates="documentation")
     project = relationship("Project", back_populates="documentation")
-    task = relationship("Task", back_populates="documentation") 
\ No newline at end of file
+    task = relationship("Task", back_populates="documentation")
+
+    __table_args__ = (
+        Index('ix_documentation_project_type', 'project_id', 'doc_type'),
+        Index('ix_documentation_project_updated', 'project_id', 'updated_at'),
+        Index('ix_documentation_task', 'task_id'),
+    )
+
+    @validates("content")
+    def _summarize_content(self, key, content):
+        # Column defaults cover Core inserts; this keeps ORM inserts and updates in step
+        if content is not None:
+            self.content_size = doc_storage.content_size(content)
+            self.excerpt = doc_storage.excerpt(content)
+        return content
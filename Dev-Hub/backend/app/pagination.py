@@ -0,0 +1,115 @@
+import base64
+import json
+import os
+from datetime import datetime
+from enum import Enum
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import DateTime, and_, or_
+from .database import session_scope
+from .serialization import dumps
+
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+class StreamFormat(str, Enum):
+    NDJSON = "ndjson"
+    JSON = "json"
+
+def default_order(model):
+    """Newest first: (column, descending) pairs ending in the primary key"""
+    return [(model.updated_at, True), (model.id, True)]
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, columns):
+    """Values of columns stored in cursor; a cursor only fits the order it was issued for"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError(cursor)
+        return [
+            datetime.fromisoformat(value) if isinstance(column.type, DateTime) else int(value)
+            for column, value in zip(columns, values)
+        ]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset(query, model, cursor: str = None, order=None):
+    """Order by order (newest first by default) and resume after cursor"""
+    order = order or default_order(model)
+    query = query.order_by(None).order_by(*(column.desc() if descending else column for column, descending in order))
+    if cursor:
+        values = decode_cursor(cursor, [column for column, _ in order])
+        # Rows after the cursor: equal on a prefix of the order, then past it on the next column
+        query = query.where(or_(*(
+            and_(
+                *(column == value for (column, _), value in zip(order[:position], values)),
+                order[position][0] < values[position] if order[position][1] else order[position][0] > values[position],
+            )
+            for position in range(len(order))
+        )))
+    return query
+
+async def _stream_rows(query, projection, fmt: StreamFormat):
+    # Dependency sessions are closed before a streamed body is sent, so the
+    # generator reads through a session of its own
+    async with session_scope(read_only=True) as db:
+        result = await db.stream(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+        if fmt == StreamFormat.JSON:
+            yield b"["
+        first = True
+        async for partition in result.partitions(STREAM_BATCH_SIZE):
+            items = [projection.to_dict(row) for row in partition]
+            if fmt == StreamFormat.NDJSON:
+                chunk = b"".join(dumps(item) + b"\n" for item in items)
+            else:
+                # Strip the brackets of the encoded list to splice it into the array
+                chunk = dumps(items)[1:-1]
+                if not first:
+                    chunk = b"," + chunk
+            first = False
+            yield chunk
+        if fmt == StreamFormat.JSON:
+            yield b"]"
+
+async def list_response(db, query, projection, limit: int = None, cursor: str = None,
+                        stream: StreamFormat = None, order=None):
+    """Run a list query as a full list, a keyset page or a streamed body.
+
+    query selects projection.columns (start from projection.select()); rows
+    are encoded with orjson without building ORM objects or models. With
+    limit or cursor set, rows are ordered newest first on (updated_at, id),
+    or by order, a list of (column, descending) pairs ending in the primary
+    key, and the X-Next-Cursor header carries the cursor of the following
+    page. With stream set, every row after cursor (up to limit) is written
+    as it is fetched, so memory stays flat however many match.
+    """
+    model = projection.model
+    if order:
+        # The cursor is built from the order columns, selected or not
+        selected = {column.key for column in projection.columns}
+        query = query.add_columns(*(column for column, _ in order if column.key not in selected))
+    if limit or cursor or stream or order:
+        query = keyset(query, model, cursor, order)
+    order = order or default_order(model)
+
+    if stream:
+        media_type = "application/x-ndjson" if stream == StreamFormat.NDJSON else "application/json"
+        return StreamingResponse(_stream_rows(query.limit(limit), projection, stream), media_type=media_type)
+
+    if not limit and not cursor:
+        rows = (await db.execute(query)).all()
+        return ORJSONResponse([projection.to_dict(row) for row in rows])
+
+    limit = limit or MAX_PAGE_SIZE
+    rows = (await db.execute(query.limit(limit + 1))).all()
+    headers = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers = {NEXT_CURSOR_HEADER: encode_cursor(*(getattr(rows[-1], column.key) for column, _ in order))}
+    return ORJSONResponse([projection.to_dict(row) for row in rows], headers=headers)
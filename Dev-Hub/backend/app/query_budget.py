@@ -0,0 +1,102 @@
+"""pytest plugin: fail tests whose requests exceed a query budget.
+
+Enable it with `pytest -p app.query_budget`, or with
+`pytest_plugins = ["app.query_budget"]` in conftest.py. Budgets count the
+SQL statements each request issues through the app (see app.timing) and
+are declared per test with the marker:
+
+    @pytest.mark.query_budget(4)  # every request in the test
+    @pytest.mark.query_budget(routes={"GET /projects/{project_id}": 3})
+    def test_project_detail(client): ...
+
+for a block with the fixture:
+
+    def test_listing(client, query_budget):
+        with query_budget(2):
+            client.get("/projects/")
+
+or for every test in the ini file, routes by their path template:
+
+    [pytest]
+    query_budgets =
+        GET /projects/ = 3
+        GET /tasks/{task_id} = 4
+
+A request under a budget also fails the test when it issues one statement
+shape N_PLUS_ONE_THRESHOLD or more times (see app.query_debug), unless
+allow_n_plus_one=True is passed.
+"""
+from contextlib import contextmanager
+from typing import Dict, Optional
+import pytest
+from . import query_debug
+
+class Budget:
+    def __init__(self, limit: Optional[int] = None, routes: Optional[Dict[str, int]] = None,
+                 allow_n_plus_one: bool = False):
+        self.limit = limit
+        self.routes = routes or {}
+        self.allow_n_plus_one = allow_n_plus_one
+
+    def violations(self, reports):
+        problems = []
+        for report in reports:
+            limit = self.routes.get(report.label, self.limit)
+            if limit is None:
+                continue
+            if report.queries > limit:
+                problems.append(f"{report.label} issued {report.queries} queries, budget {limit}:")
+                problems += [f"    {count} x {shape}" for shape, count, _ in report.repeated(1)]
+            if not self.allow_n_plus_one:
+                problems += [
+                    f"{report.label} repeated a statement {count} times (N+1?): {shape}"
+                    for shape, count, _ in report.repeated()
+                ]
+        return problems
+
+def _check(budget: Budget, reports):
+    problems = budget.violations(reports)
+    if problems:
+        pytest.fail("Query budget exceeded\n" + "\n".join(problems), pytrace=False)
+
+def _ini_budgets(config) -> Dict[str, int]:
+    budgets = {}
+    for line in config.getini("query_budgets"):
+        route, _, limit = line.rpartition("=")
+        if not route.strip():
+            raise pytest.UsageError(f"query_budgets: expected 'METHOD /path = N', got {line!r}")
+        budgets[" ".join(route.split())] = int(limit)
+    return budgets
+
+def pytest_addoption(parser):
+    parser.addini("query_budgets", "Per-route query budgets, one 'METHOD /path = N' per line", type="linelist", default=[])
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "query_budget(limit=None, routes=None, allow_n_plus_one=False): fail if a request issues more SQL statements",
+    )
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    routes = _ini_budgets(item.config)
+    marker = item.get_closest_marker("query_budget")
+    if marker is None and not routes:
+        return (yield)
+    budget = Budget(routes=routes)
+    if marker is not None:
+        budget = Budget(*marker.args, **{**marker.kwargs, "routes": {**routes, **marker.kwargs.get("routes", {})}})
+    with query_debug.watch() as reports:
+        result = yield
+    _check(budget, reports)
+    return result
+
+@pytest.fixture
+def query_budget():
+    """Context manager checking the requests made inside it against a budget"""
+    @contextmanager
+    def check(limit: Optional[int] = None, *, routes: Optional[Dict[str, int]] = None, allow_n_plus_one: bool = False):
+        with query_debug.watch() as reports:
+            yield reports
+        _check(Budget(limit, routes, allow_n_plus_one), reports)
+    return check
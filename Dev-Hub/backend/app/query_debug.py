@@ -0,0 +1,105 @@
+"""N+1 and slow-query detection for development and CI.
+
+With QUERY_DEBUG=1 the metrics middleware keeps every SQL statement a
+request issues and, when the request is done, fingerprints them: the
+statement with literals removed and placeholder lists collapsed, so
+`IN (?, ?)` and `IN (?, ?, ?)` match. A fingerprint issued
+N_PLUS_ONE_THRESHOLD or more times by one request is logged as a likely
+N+1, with the route and the first differing parameters.
+
+SLOW_QUERY_MS logs every statement slower than that, with its bound
+parameters and the route, on its own and without QUERY_DEBUG. Both are
+reported when the request finishes, so statements run outside a request
+(the group-commit writer, background tasks) are not covered.
+
+watch() collects the same reports programmatically; app.query_budget
+builds a pytest plugin on it.
+"""
+import logging
+import os
+import re
+from collections import Counter
+from contextlib import contextmanager
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+QUERY_DEBUG = os.getenv("QUERY_DEBUG") == "1"
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "3"))
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))  # 0 disables the slow-query log
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDERS = re.compile(r"\?(?:\s*,\s*\?)+")
+_ROWS = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+_SPACE = re.compile(r"\s+")
+_MAX_PARAMETERS_REPR = 300
+
+_watchers = []  # lists collecting a RequestReport per finished request
+
+def fingerprint(statement: str) -> str:
+    """The statement's shape: literals become ?, lists of placeholders and VALUES rows collapse to one"""
+    shape = _LITERAL.sub("?", _SPACE.sub(" ", statement).strip())
+    return _ROWS.sub("(?)", _PLACEHOLDERS.sub("?", shape))
+
+class RequestReport:
+    """The SQL one request issued"""
+
+    __slots__ = ("method", "route", "status", "queries", "statements")
+
+    def __init__(self, method: str, route: str, status: int, queries: int, statements: list):
+        self.method = method
+        self.route = route
+        self.status = status
+        self.queries = queries
+        self.statements = statements  # (statement, parameters, seconds, executemany)
+
+    @property
+    def label(self) -> str:
+        return f"{self.method} {self.route}"
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD):
+        """(fingerprint, count, example statements) of shapes issued at least threshold times"""
+        shapes = [fingerprint(statement) for statement, *_ in self.statements]
+        return [
+            (shape, count, [entry for entry, other in zip(self.statements, shapes) if other == shape])
+            for shape, count in Counter(shapes).most_common() if count >= threshold
+        ]
+
+    def slow(self, threshold_ms: float = SLOW_QUERY_MS):
+        return [entry for entry in self.statements if entry[2] * 1000 >= threshold_ms]
+
+def _parameters(parameters) -> str:
+    """repr of bound parameters, cut short for executemany batches"""
+    text = repr(parameters)
+    return text if len(text) <= _MAX_PARAMETERS_REPR else text[:_MAX_PARAMETERS_REPR] + "..."
+
+def recording() -> bool:
+    """Whether requests should keep their statements"""
+    return QUERY_DEBUG or SLOW_QUERY_MS > 0 or bool(_watchers)
+
+def finish(method: str, route: str, status: int, timings):
+    """Called by the metrics middleware once a recorded request is done"""
+    if timings.statements is None:
+        return
+    report = RequestReport(method, route, status, timings.queries, timings.statements)
+    if QUERY_DEBUG:
+        for shape, count, entries in report.repeated():
+            params = ", ".join(_parameters(parameters) for _, parameters, _, _ in entries[:3])
+            logger.warning("Possible N+1 in %s: %d x %s (parameters %s%s)",
+                           report.label, count, shape, params, ", ..." if len(entries) > 3 else "")
+    if SLOW_QUERY_MS > 0:
+        for statement, parameters, seconds, _ in report.slow():
+            logger.warning("Slow query in %s: %.1f ms %s %s", report.label, seconds * 1000,
+                           _SPACE.sub(" ", statement).strip(), _parameters(parameters))
+    for watcher in _watchers:
+        watcher.append(report)
+
+@contextmanager
+def watch(reports: Optional[List[RequestReport]] = None):
+    """Collect a RequestReport for every request finishing inside the block"""
+    reports = [] if reports is None else reports
+    _watchers.append(reports)
+    try:
+        yield reports
+    finally:
+        _watchers[:] = [watcher for watcher in _watchers if watcher is not reports]
@@ -0,0 +1,64 @@
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models, schemas, auth, stats
+from ..database import get_db
+from ..metrics import TimedRoute
+from ..serialization import Projection
+
+router = APIRouter(prefix="/dashboard", tags=["dashboard"], route_class=TimedRoute)
+
+@router.get("", response_model=schemas.DashboardResponse)
+async def get_dashboard(
+    task_limit: int = Query(10, ge=0, le=100, description="Open tasks assigned to the user to return"),
+    doc_limit: int = Query(10, ge=0, le=100, description="Most recently updated documentation to return"),
+    current_user: models.User = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Everything the dashboard shows, in four queries however many tasks there are.
+
+    The user's projects with their task counts (read from the stats
+    counters), the counts summed over them, the user's open tasks by
+    priority and the latest documentation titles of their projects.
+    """
+    projects = Projection(models.Project, schemas.ProjectResponse)
+    rows = await db.execute(
+        projects.select()
+        .where(models.Project.id.in_(auth.accessible_project_ids(current_user.id)))
+        .order_by(models.Project.id)
+    )
+    body = {"projects": [projects.to_dict(row) for row in rows]}
+    project_ids = [project["id"] for project in body["projects"]]
+
+    counts = await stats.project_counts(db, project_ids)
+    for project in body["projects"]:
+        project["task_counts"] = counts[project["id"]]
+    body["task_counts"] = stats.sum_counts(counts.values())
+
+    body["my_tasks"] = []
+    if project_ids and task_limit:
+        tasks = Projection(models.Task, schemas.TaskResponse)
+        rows = await db.execute(
+            tasks.select()
+            .where(
+                models.Task.assignee_id == current_user.id,
+                models.Task.project_id.in_(project_ids),
+                or_(models.Task.status.is_(None), models.Task.status != models.TaskStatus.COMPLETED),
+            )
+            .order_by(models.Task.priority_rank, models.Task.updated_at.desc(), models.Task.id.desc())
+            .limit(task_limit)
+        )
+        body["my_tasks"] = [tasks.to_dict(row) for row in rows]
+
+    body["recent_documentation"] = []
+    if project_ids and doc_limit:
+        docs = Projection(models.Documentation, schemas.DashboardDocument)
+        rows = await db.execute(
+            docs.select()
+            .where(models.Documentation.project_id.in_(project_ids))
+            .order_by(models.Documentation.updated_at.desc(), models.Documentation.id.desc())
+            .limit(doc_limit)
+        )
+        body["recent_documentation"] = [docs.to_dict(row) for row in rows]
+    return ORJSONResponse(body)
@@ -1,15 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer, joinedload
 from typing import List, Optional
-from .. import models, schemas, auth
+from .. import models, schemas, auth, doc_storage, fieldsets, pagination, search as doc_search
 from ..database import get_db
+from ..metrics import TimedRoute
+from ..events import event_hub
+from ..serialization import Projection
+from ..write_queue import run_write
 
-router = APIRouter(prefix="/documentation", tags=["documentation"])
+router = APIRouter(prefix="/documentation", tags=["documentation"], route_class=TimedRoute)
+
+# Nested objects of DocumentationResponse that include= can leave out
+DOCUMENTATION_RELATIONS = ("author",)
+# List items without fields=: everything but the body
+SUMMARY_FIELDS = frozenset(schemas.DocumentationSummary.model_fields) - {"content"}
+
+async def _check_project_access(db: AsyncSession, user_id: int, project_id: int, detail: str):
+    """Raise unless the user is owner or member of the project"""
+    if await auth.get_user_role_in_project(db, user_id, project_id):
+        return
+    if not await auth.membership_index.project_exists(db, project_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+    raise HTTPException(status_code=403, detail=detail)
+
+def _loader_options(selected):
+    """Join the author and load content only when the response needs them"""
+    options = []
+    if selected is None or "author" in selected:
+        options.append(joinedload(models.Documentation.author))
+    if selected is not None and "content" not in selected:
+        options.append(defer(models.Documentation.content))
+    return options
+
+async def _check_author_or_owner(db: AsyncSession, documentation: models.Documentation, user_id: int, detail: str):
+    """Raise unless the user is the author or the owner of the documentation's project"""
+    if documentation.author_id == user_id:
+        return
+    if documentation.project_id and await auth.membership_index.get_owner(db, documentation.project_id) != user_id:
+        raise HTTPException(status_code=403, detail=detail)
 
 @router.post("/", response_model=schemas.DocumentationResponse)
-def create_documentation(
+async def create_documentation(
     documentation: schemas.DocumentationCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
     """Create new documentation for a project or task"""
@@ -19,197 +55,242 @@ def create_documentation(
     
     # If task_id is provided, validate the task exists and user has access
     if documentation.task_id:
-        task = db.query(models.Task).filter(models.Task.id == documentation.task_id).first()
+        task = await db.get(models.Task, documentation.task_id)
         if not task:
             raise HTTPException(status_code=404, detail="Task not found")
         
-        # Check if user has access to the project
-        project = db.query(models.Project).filter(models.Project.id == task.project_id).first()
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
         # Check if user is owner or member of the project
-        if project.owner_id != current_user.id and current_user not in project.members:
-            raise HTTPException(status_code=403, detail="Not authorized to add documentation to this task")
+        await _check_project_access(db, current_user.id, task.project_id, "Not authorized to add documentation to this task")
         
         documentation.project_id = task.project_id
     
     # If only project_id is provided, validate the project exists and user has access
     elif documentation.project_id:
-        project = db.query(models.Project).filter(models.Project.id == documentation.project_id).first()
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
         # Check if user is owner or member of the project
-        if project.owner_id != current_user.id and current_user not in project.members:
-            raise HTTPException(status_code=403, detail="Not authorized to add documentation to this project")
+        await _check_project_access(db, current_user.id, documentation.project_id, "Not authorized to add documentation to this project")
     
     # Create the documentation
-    db_documentation = models.Documentation(
-        **documentation.dict(),
-        author_id=current_user.id
-    )
-    db.add(db_documentation)
-    db.commit()
-    db.refresh(db_documentation)
-    
-    # Load the author relationship for response
-    db.refresh(db_documentation.author)
+    def insert_documentation(session):
+        # The author is the already loaded current user, attached without a query
+        db_documentation = models.Documentation(
+            **documentation.dict(),
+            author=session.merge(current_user, load=False)
+        )
+        session.add(db_documentation)
+        session.flush()
+        return db_documentation
     
+    db_documentation = await run_write(db, insert_documentation)
+    if db_documentation.project_id:
+        event_hub.publish("documentation.created", db_documentation.project_id, [db_documentation.id])
     return db_documentation
 
-@router.get("/", response_model=List[schemas.DocumentationResponse])
-def get_documentation(
+@router.get("/", response_model=List[schemas.DocumentationSummary])
+async def get_documentation(
     project_id: Optional[int] = Query(None, description="Filter by project ID"),
     task_id: Optional[int] = Query(None, description="Filter by task ID"),
     search: Optional[str] = Query(None, description="Search in title and content"),
     doc_type: Optional[schemas.DocumentationType] = Query(None, description="Filter by documentation type"),
-    db: Session = Depends(get_db),
+    limit: Optional[int] = Query(None, ge=1, le=pagination.MAX_PAGE_SIZE, description="Page size, enables keyset pagination (newest first instead of by relevance)"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    stream: Optional[pagination.StreamFormat] = Query(None, description="Stream rows as NDJSON or a chunked JSON array"),
+    fields: Optional[str] = Query(None, description="Comma-separated attributes to return; add content for full bodies"),
+    include: Optional[str] = Query(None, description="Comma-separated nested objects to embed: author"),
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
-    """Get documentation with optional filtering"""
-    query = db.query(models.Documentation)
+    """Get documentation summaries with optional filtering"""
+    selected = fieldsets.select_fields(schemas.DocumentationSummary, fields, include, DOCUMENTATION_RELATIONS)
+    if fields is None:
+        # Summaries: size and excerpt instead of the body, which GET /{id} serves
+        selected = SUMMARY_FIELDS if selected is None else selected & SUMMARY_FIELDS
+    # Author columns come from a join; content is only read when selected
+    projection = Projection(
+        models.Documentation, schemas.DocumentationSummary, selected,
+        nested={"author": (models.User, schemas.UserResponse)},
+    )
+    query = projection.select()
     
     # Filter by project_id
     if project_id:
         # Check if user has access to the project
-        project = db.query(models.Project).filter(models.Project.id == project_id).first()
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        if project.owner_id != current_user.id and current_user not in project.members:
-            raise HTTPException(status_code=403, detail="Not authorized to view documentation for this project")
+        await _check_project_access(db, current_user.id, project_id, "Not authorized to view documentation for this project")
         
-        query = query.filter(models.Documentation.project_id == project_id)
+        query = query.where(models.Documentation.project_id == project_id)
     
     # Filter by task_id
     if task_id:
-        task = db.query(models.Task).filter(models.Task.id == task_id).first()
+        task = await db.get(models.Task, task_id)
         if not task:
             raise HTTPException(status_code=404, detail="Task not found")
         
         # Check if user has access to the project
-        project = db.query(models.Project).filter(models.Project.id == task.project_id).first()
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
+        await _check_project_access(db, current_user.id, task.project_id, "Not authorized to view documentation for this task")
         
-        if project.owner_id != current_user.id and current_user not in project.members:
-            raise HTTPException(status_code=403, detail="Not authorized to view documentation for this task")
-        
-        query = query.filter(models.Documentation.task_id == task_id)
+        query = query.where(models.Documentation.task_id == task_id)
     
     # If no filters provided, show only documentation from projects user has access to
     if not project_id and not task_id:
-        user_projects = db.query(models.Project).filter(
-            (models.Project.owner_id == current_user.id) |
-            (models.Project.members.any(id=current_user.id))
-        ).all()
-        project_ids = [p.id for p in user_projects]
-        query = query.filter(models.Documentation.project_id.in_(project_ids))
+        project_ids = (await db.scalars(auth.accessible_project_ids(current_user.id))).all()
+        query = query.where(models.Documentation.project_id.in_(project_ids))
     
     # Filter by documentation type
     if doc_type:
-        query = query.filter(models.Documentation.doc_type == doc_type)
+        query = query.where(models.Documentation.doc_type == doc_type)
     
-    # Search in title and content
+    # Search in title and content, best matches first
     if search:
-        search_filter = f"%{search}%"
-        query = query.filter(
-            (models.Documentation.title.ilike(search_filter)) |
-            (models.Documentation.content.ilike(search_filter))
-        )
+        query = doc_search.apply_search(query, search)
     
-    # Load author relationship
-    query = query.options(joinedload(models.Documentation.author))
-    
-    documentation_list = query.all()
-    return documentation_list
+    return await pagination.list_response(db, query, projection, limit, cursor, stream)
 
 @router.get("/{documentation_id}", response_model=schemas.DocumentationResponse)
-def get_documentation_by_id(
+async def get_documentation_by_id(
     documentation_id: int,
-    db: Session = Depends(get_db),
+    fields: Optional[str] = Query(None, description="Comma-separated attributes to return, e.g. leave out content"),
+    include: Optional[str] = Query(None, description="Comma-separated nested objects to embed: author"),
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
     """Get specific documentation by ID"""
-    documentation = db.query(models.Documentation).filter(
-        models.Documentation.id == documentation_id
-    ).first()
+    selected = fieldsets.select_fields(schemas.DocumentationResponse, fields, include, DOCUMENTATION_RELATIONS)
+    documentation = await db.scalar(
+        select(models.Documentation)
+        .where(models.Documentation.id == documentation_id)
+        .options(*_loader_options(selected))
+    )
     
     if not documentation:
         raise HTTPException(status_code=404, detail="Documentation not found")
     
     # Check if user has access to the project
     if documentation.project_id:
-        project = db.query(models.Project).filter(models.Project.id == documentation.project_id).first()
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        if project.owner_id != current_user.id and current_user not in project.members:
-            raise HTTPException(status_code=403, detail="Not authorized to view this documentation")
-    
-    # Load author relationship
-    db.refresh(documentation.author)
+        await _check_project_access(db, current_user.id, documentation.project_id, "Not authorized to view this documentation")
     
+    if selected is not None:
+        return fieldsets.render(documentation, schemas.DocumentationResponse, selected)
     return documentation
 
+def _parse_range(header: str, size: int):
+    """(start, stop) of a single bytes range; None to send the whole body"""
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None  # Other units and multiple ranges: ignore the header
+    first, dash, last = spec.strip().partition("-")
+    try:
+        if not dash or not (first or last):
+            return None
+        if not first:
+            start, stop = max(size - int(last), 0), size  # The last N bytes
+        else:
+            start = int(first)
+            stop = min(int(last) + 1, size) if last else size
+    except ValueError:
+        return None
+    if start >= size or stop <= start:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, stop
+
+@router.get("/{documentation_id}/content")
+async def get_documentation_content(
+    documentation_id: int,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_range: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """Get the body of documentation as text, streamed, or a byte range of it"""
+    row = (await db.execute(
+        select(
+            models.Documentation.project_id, models.Documentation.content_size,
+            models.Documentation.updated_at, doc_storage.stored(models.Documentation.content),
+        ).where(models.Documentation.id == documentation_id)
+    )).first()
+    
+    if not row:
+        raise HTTPException(status_code=404, detail="Documentation not found")
+    
+    project_id, size, updated_at, stored = row
+    # Check if user has access to the project
+    if project_id:
+        await _check_project_access(db, current_user.id, project_id, "Not authorized to view this documentation")
+    
+    # Changes with every update, so a resumed download never splices two versions
+    etag = f'"d{documentation_id}-{updated_at.timestamp():.6f}-{size}"'
+    headers = {"Accept-Ranges": "bytes", "ETag": etag}
+    byte_range = None
+    if range_header and (if_range is None or if_range == etag):
+        byte_range = _parse_range(range_header, size)
+    
+    start, stop = byte_range or (0, size)
+    headers["Content-Length"] = str(stop - start)
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{stop - 1}/{size}"
+    # Compressed bodies are inflated chunk by chunk as they are sent
+    return StreamingResponse(
+        doc_storage.iter_body(stored, start, stop), status_code=206 if byte_range else 200,
+        media_type="text/plain; charset=utf-8", headers=headers,
+    )
+
 @router.put("/{documentation_id}", response_model=schemas.DocumentationResponse)
-def update_documentation(
+async def update_documentation(
     documentation_id: int,
     documentation_update: schemas.DocumentationUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
     """Update documentation"""
-    documentation = db.query(models.Documentation).filter(
-        models.Documentation.id == documentation_id
-    ).first()
+    documentation = await db.get(models.Documentation, documentation_id)
     
     if not documentation:
         raise HTTPException(status_code=404, detail="Documentation not found")
     
-    # Check if user is the author or has admin access
-    if documentation.author_id != current_user.id:
-        # Check if user is project owner
-        if documentation.project_id:
-            project = db.query(models.Project).filter(models.Project.id == documentation.project_id).first()
-            if not project or project.owner_id != current_user.id:
-                raise HTTPException(status_code=403, detail="Not authorized to update this documentation")
+    # Check if user is the author or the project owner
+    await _check_author_or_owner(db, documentation, current_user.id, "Not authorized to update this documentation")
     
     # Update only provided fields
     update_data = documentation_update.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(documentation, field, value)
     
-    db.commit()
-    db.refresh(documentation)
-    db.refresh(documentation.author)
+    def apply_update(session):
+        documentation = session.scalar(
+            select(models.Documentation)
+            .where(models.Documentation.id == documentation_id)
+            .options(joinedload(models.Documentation.author))
+        )
+        if documentation is None:
+            raise HTTPException(status_code=404, detail="Documentation not found")
+        for field, value in update_data.items():
+            setattr(documentation, field, value)
+        session.flush()
+        return documentation
     
+    documentation = await run_write(db, apply_update)
+    if documentation.project_id:
+        event_hub.publish("documentation.updated", documentation.project_id, [documentation_id])
     return documentation
 
 @router.delete("/{documentation_id}")
-def delete_documentation(
+async def delete_documentation(
     documentation_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
     """Delete documentation"""
-    documentation = db.query(models.Documentation).filter(
-        models.Documentation.id == documentation_id
-    ).first()
+    documentation = await db.get(models.Documentation, documentation_id)
     
     if not documentation:
         raise HTTPException(status_code=404, detail="Documentation not found")
     
-    # Check if user is the author or has admin access
-    if documentation.author_id != current_user.id:
-        # Check if user is project owner
-        if documentation.project_id:
-            project = db.query(models.Project).filter(models.Project.id == documentation.project_id).first()
-            if not project or project.owner_id != current_user.id:
-                raise HTTPException(status_code=403, detail="Not authorized to delete this documentation")
+    # Check if user is the author or the project owner
+    await _check_author_or_owner(db, documentation, current_user.id, "Not authorized to delete this documentation")
     
-    db.delete(documentation)
-    db.commit()
+    def delete_documentation_row(session):
+        documentation = session.get(models.Documentation, documentation_id)
+        if documentation is not None:
+            session.delete(documentation)
+    
+    await run_write(db, delete_documentation_row)
+    if documentation.project_id:
+        event_hub.publish("documentation.deleted", documentation.project_id, [documentation_id])
     
     return {"message": "Documentation deleted successfully"} 
\ No newline at end of file
@@ -0,0 +1,68 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from .. import models, auth, schemas
+from ..database import get_db
+from ..metrics import TimedRoute
+from ..events import event_hub, sse_stream
+
+router = APIRouter(prefix="/events", tags=["events"], route_class=TimedRoute)
+
+@router.post("/ticket", response_model=schemas.StreamTicket)
+async def create_stream_ticket(
+    current_user: models.User = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Single-use ticket for GET /events/?ticket=, for EventSource clients that cannot set headers"""
+    ticket = await auth.issue_stream_ticket(db, current_user.id)
+    return {"ticket": ticket, "expires_in": auth.STREAM_TICKET_SECONDS}
+
+@router.get("/")
+async def stream_events(
+    project_id: Optional[int] = Query(None, description="Only follow this project"),
+    ticket: Optional[str] = Query(None, description="From POST /events/ticket, for EventSource clients that cannot set headers"),
+    authorization: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """Server-Sent Events stream of changes to the user's projects.
+
+    Each change event carries {"seq", "type", "project_id", "ids", "at"},
+    e.g. type "task.updated" with the ids of the updated tasks. Without
+    project_id the stream follows every project the user can access,
+    including ones they are added to later. A "dropped" event means the
+    client fell behind; reconnect and refetch.
+    """
+    if ticket is not None:
+        current_user = await auth.redeem_stream_ticket(db, ticket)
+    elif authorization and authorization.lower().startswith("bearer "):
+        current_user = await auth.get_current_user(authorization[7:], db)
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    if project_id:
+        # Check if user has access to this project
+        if not await auth.get_user_role_in_project(db, current_user.id, project_id):
+            if not await auth.membership_index.project_exists(db, project_id):
+                raise HTTPException(status_code=404, detail="Project not found")
+            raise HTTPException(status_code=403, detail="Access denied")
+        subscription = event_hub.subscribe(current_user.id, [project_id], follow_new=False)
+    else:
+        project_ids = (await db.scalars(auth.accessible_project_ids(current_user.id))).all()
+        subscription = event_hub.subscribe(current_user.id, project_ids)
+
+    return StreamingResponse(
+        sse_stream(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/stats")
+async def event_stats(current_user: models.User = Depends(auth.get_current_user)):
+    """Subscriber and delivery counters of the change feed"""
+    return event_hub.stats()
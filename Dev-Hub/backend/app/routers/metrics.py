@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+from .. import metrics
+from ..metrics import TimedRoute
+
+router = APIRouter(tags=["metrics"], route_class=TimedRoute)
+
+@router.get("/metrics", response_class=Response)
+def read_metrics():
+    """Request, database, cache and queue metrics in the Prometheus text format"""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
@@ -1,82 +1,167 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from .. import models, schemas, auth
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import List, Optional
+from .. import models, schemas, auth, fieldsets, pagination, stats, versions
+from ..events import event_hub
+from ..serialization import Projection
 from ..database import get_db
+from ..metrics import TimedRoute
+from ..write_queue import run_write
 
-router = APIRouter(prefix="/projects", tags=["projects"])
+router = APIRouter(prefix="/projects", tags=["projects"], route_class=TimedRoute)
+
+# Nested collections of ProjectWithMembers that include= can leave out
+PROJECT_RELATIONS = ("members", "tasks")
 
 @router.post("/", response_model=schemas.ProjectResponse)
-def create_project(
+async def create_project(
     project: schemas.ProjectCreate,
     current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    db_project = models.Project(**project.dict(), owner_id=current_user.id)
-    db.add(db_project)
-    db.commit()
-    db.refresh(db_project)
+    def insert_project(session):
+        db_project = models.Project(**project.dict(), owner_id=current_user.id)
+        session.add(db_project)
+        session.flush()
+        return db_project
+    
+    db_project = await run_write(db, insert_project)
+    auth.membership_index.add_project(db_project.id, current_user.id)
+    event_hub.grant(current_user.id, db_project.id)
+    event_hub.publish("project.created", db_project.id, [db_project.id])
     return db_project
 
 @router.get("/", response_model=List[schemas.ProjectResponse])
-def get_projects(
+async def get_projects(
+    limit: Optional[int] = Query(None, ge=1, le=pagination.MAX_PAGE_SIZE, description="Page size, enables keyset pagination"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    stream: Optional[pagination.StreamFormat] = Query(None, description="Stream rows as NDJSON or a chunked JSON array"),
+    fields: Optional[str] = Query(None, description="Comma-separated attributes to return"),
     current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
+    projection = Projection(models.Project, schemas.ProjectResponse, fieldsets.select_fields(schemas.ProjectResponse, fields))
+    
     # Get projects where user is owner or member
-    projects = db.query(models.Project).filter(
-        (models.Project.owner_id == current_user.id) |
-        (models.Project.members.any(id=current_user.id))
-    ).all()
-    return projects
+    query = projection.select().where(models.Project.id.in_(auth.accessible_project_ids(current_user.id)))
+    return await pagination.list_response(db, query, projection, limit, cursor, stream)
+
+@router.get("/stats", response_model=List[schemas.ProjectStats])
+async def get_all_project_stats(
+    current_user: models.User = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Task counts for every project the user owns or belongs to"""
+    project_ids = sorted((await db.scalars(auth.accessible_project_ids(current_user.id))).all())
+    counts = await stats.project_counts(db, project_ids)
+    return [{"project_id": project_id, **counts[project_id]} for project_id in project_ids]
 
 @router.get("/{project_id}", response_model=schemas.ProjectWithMembers)
-def get_project(
+async def get_project(
     project_id: int,
+    fields: Optional[str] = Query(None, description="Comma-separated project attributes to return"),
+    include: Optional[str] = Query(None, description="Comma-separated nested collections to embed: members, tasks"),
+    if_none_match: Optional[str] = Header(None),
     current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    project = db.query(models.Project).filter(models.Project.id == project_id).first()
+    selected = fieldsets.select_fields(schemas.ProjectWithMembers, fields, include, PROJECT_RELATIONS)
+    
+    # Access is decided from the token's role claims or the membership index,
+    # so a revalidation never reads the project, task or member tables
+    user_role = await auth.get_user_role_in_project(db, current_user.id, project_id)
+    if not user_role:
+        if not await auth.membership_index.project_exists(db, project_id):
+            raise HTTPException(status_code=404, detail="Project not found")
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    if not versions.versions_enabled:
+        return Response(content=await _render_project(db, project_id, selected), media_type="application/json")
+    
+    # The version is read before the body, so a cached body is never older
+    # than the ETag it is served under
+    variant = fieldsets.variant_key(selected)
+    version = await versions.get_version(db, project_id)
+    etag = versions.make_etag(project_id, version, variant)
+    if versions.etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
+    body = versions.project_cache.get((project_id, version, variant))
+    if body is None:
+        body = await _render_project(db, project_id, selected)
+        versions.project_cache.set((project_id, version, variant), body)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+async def _render_project(db, project_id: int, selected) -> bytes:
+    """Load a project with only the selected collections, one query each, and serialize it"""
+    wanted = PROJECT_RELATIONS if selected is None else [name for name in PROJECT_RELATIONS if name in selected]
+    project = await db.scalar(
+        select(models.Project)
+        .where(models.Project.id == project_id)
+        .options(*(selectinload(getattr(models.Project, name)) for name in wanted))
+    )
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    
+    schema = fieldsets.sparse_model(schemas.ProjectWithMembers, selected)
+    return schema.model_validate(project).model_dump_json().encode()
+
+@router.get("/{project_id}/stats", response_model=schemas.ProjectStats)
+async def get_project_stats(
+    project_id: int,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Task counts of one project by status, priority and assignee"""
     # Check if user has access to this project
-    user_role = auth.get_user_role_in_project(db, current_user.id, project_id)
+    user_role = await auth.get_user_role_in_project(db, current_user.id, project_id)
     if not user_role:
+        if not await auth.membership_index.project_exists(db, project_id):
+            raise HTTPException(status_code=404, detail="Project not found")
         raise HTTPException(status_code=403, detail="Access denied")
     
-    return project
+    counts = await stats.project_counts(db, [project_id])
+    return {"project_id": project_id, **counts[project_id]}
 
 @router.put("/{project_id}", response_model=schemas.ProjectResponse)
-def update_project(
+async def update_project(
     project_id: int,
     project_update: schemas.ProjectUpdate,
     current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    project = db.query(models.Project).filter(models.Project.id == project_id).first()
+    project = await db.get(models.Project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
     # Only owner or admin can update project
-    user_role = auth.get_user_role_in_project(db, current_user.id, project_id)
+    user_role = await auth.get_user_role_in_project(db, current_user.id, project_id)
     if user_role not in [models.UserRole.ADMIN]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
-    for field, value in project_update.dict(exclude_unset=True).items():
-        setattr(project, field, value)
+    changes = project_update.dict(exclude_unset=True)
     
-    db.commit()
-    db.refresh(project)
+    def apply_update(session):
+        project = session.get(models.Project, project_id)
+        if project is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+        for field, value in changes.items():
+            setattr(project, field, value)
+        session.flush()
+        return project
+    
+    project = await run_write(db, apply_update)
+    event_hub.publish("project.updated", project_id, [project_id])
     return project
 
 @router.delete("/{project_id}")
-def delete_project(
+async def delete_project(
     project_id: int,
     current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    project = db.query(models.Project).filter(models.Project.id == project_id).first()
+    project = await db.get(models.Project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
@@ -84,28 +169,45 @@ def delete_project(
     if project.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Only project owner can delete project")
     
-    db.delete(project)
-    db.commit()
+    def delete_project_row(session):
+        # Load everything the delete cascades to up front, one query per
+        # relationship, rather than one documentation query per task
+        project = session.scalar(
+            select(models.Project)
+            .where(models.Project.id == project_id)
+            .options(
+                selectinload(models.Project.members),
+                selectinload(models.Project.documentation),
+                selectinload(models.Project.tasks).selectinload(models.Task.documentation),
+            )
+        )
+        if project is not None:
+            session.delete(project)
+    
+    await run_write(db, delete_project_row)
+    auth.membership_index.drop_project(project_id)
+    event_hub.publish("project.deleted", project_id, [project_id])
+    event_hub.drop_project(project_id)
     return {"message": "Project deleted successfully"}
 
 @router.post("/{project_id}/members", response_model=schemas.ProjectMemberResponse)
-def add_project_member(
+async def add_project_member(
     project_id: int,
     member: schemas.ProjectMember,
     current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    project = db.query(models.Project).filter(models.Project.id == project_id).first()
+    project = await db.get(models.Project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
     # Only owner or admin can add members
-    user_role = auth.get_user_role_in_project(db, current_user.id, project_id)
+    user_role = await auth.get_user_role_in_project(db, current_user.id, project_id)
     if user_role not in [models.UserRole.ADMIN]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
     # Check if user exists
-    user = db.query(models.User).filter(models.User.id == member.user_id).first()
+    user = await db.get(models.User, member.user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -115,7 +217,9 @@ def add_project_member(
         project_id=project_id,
         role=member.role
     )
-    db.execute(stmt)
-    db.commit()
+    await run_write(db, lambda session: session.execute(stmt))
+    auth.membership_index.member_changed(project_id, member.user_id)
+    event_hub.grant(member.user_id, project_id)
+    event_hub.publish("member.added", project_id, [member.user_id])
     
-    return {"user": user, "role": member.role} 
\ No newline at end of file
+    return {"user": user, "role": member.role}
@@ -0,0 +1,129 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from .. import models, schemas, auth, sync
+from ..database import get_db
+from ..metrics import TimedRoute
+from ..serialization import Projection
+
+router = APIRouter(prefix="/sync", tags=["sync"], route_class=TimedRoute)
+
+def _decode_cursor(since: str) -> int:
+    try:
+        seq = int(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if seq < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return seq
+
+def _changed(entity: str, project_ids, since: int, until: int, columns):
+    """Ids of entity rows in project_ids logged as changed within (since, until]"""
+    log = sync.sync_log.c
+    return select(*(getattr(log, name) for name in columns)).where(
+        log.entity == entity,
+        log.project_id.in_(project_ids),
+        log.seq > since,
+        log.seq <= until,
+        log.deleted == 0,
+    )
+
+@router.get("/", response_model=schemas.SyncResponse)
+async def sync_changes(
+    since: Optional[str] = Query(None, description="Cursor from the previous response; omit for a full load"),
+    current_user: models.User = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Everything in the user's projects created, updated or deleted after since.
+
+    Without since, every accessible project is returned in full. With it,
+    only rows changed since, plus projects the user has gained access to in
+    full, and the ids of deleted rows under deleted. A project listed in
+    deleted.projects (deleted, or the user's membership removed) takes its
+    tasks, documentation and memberships with it. Store the returned cursor
+    and pass it as since next time; 410 means the cursor predates the
+    retained tombstones and the client has to reload without since.
+    """
+    if not sync.sync_enabled:
+        raise HTTPException(status_code=501, detail="Sync is not available on this database")
+    since_seq = _decode_cursor(since) if since else 0
+
+    # The cursor is read first: rows changed while this runs may be sent
+    # again next time, but are never skipped
+    seq, horizon = (await db.execute(select(sync.sync_state.c.seq, sync.sync_state.c.horizon))).one()
+    if since_seq > seq:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if since_seq and since_seq < horizon:
+        raise HTTPException(status_code=410, detail="Cursor is older than the retained change log; reload without since")
+
+    accessible = set((await db.scalars(auth.accessible_project_ids(current_user.id))).all())
+    log = sync.sync_log.c
+
+    # Projects the user gained access to since the cursor are sent in full,
+    # the rest only as far as they changed
+    if since_seq:
+        gained = (await db.scalars(select(log.project_id).where(
+            log.entity == "grant",
+            log.user_id == current_user.id,
+            log.seq > since_seq,
+            log.seq <= seq,
+        ))).all()
+        full = accessible & set(gained)
+    else:
+        full = accessible
+    partial = accessible - full
+
+    def changed_rows(entity, model):
+        project_column = model.id if entity == "project" else model.project_id
+        return or_(
+            project_column.in_(full),
+            model.id.in_(_changed(entity, partial, since_seq, seq, ["entity_id"])),
+        )
+
+    body = {"cursor": str(seq)}
+    lists = (
+        ("projects", "project", models.Project, schemas.ProjectResponse, None),
+        ("tasks", "task", models.Task, schemas.TaskResponse, None),
+        ("documentation", "documentation", models.Documentation, schemas.DocumentationResponse,
+         {"author": (models.User, schemas.UserResponse)}),
+    )
+    for key, entity, model, schema, nested in lists:
+        projection = Projection(model, schema, nested=nested)
+        rows = await db.execute(projection.select().where(changed_rows(entity, model)))
+        body[key] = [projection.to_dict(row) for row in rows]
+
+    members = models.project_members.c
+    rows = await db.execute(select(members.project_id, members.user_id, members.role).where(or_(
+        members.project_id.in_(full),
+        tuple_(members.project_id, members.user_id).in_(
+            _changed("member", partial, since_seq, seq, ["project_id", "entity_id"])
+        ),
+    )))
+    body["memberships"] = [
+        {"project_id": project_id, "user_id": user_id, "role": role} for project_id, user_id, role in rows
+    ]
+
+    # Tombstones; a removed membership of the user's own also deletes the
+    # project from their point of view
+    deleted = {"projects": set(), "tasks": [], "documentation": [], "memberships": []}
+    if since_seq:
+        tombstones = await db.execute(select(log.entity, log.project_id, log.entity_id, log.user_id).where(
+            log.deleted == 1,
+            log.seq > since_seq,
+            log.seq <= seq,
+            or_(log.project_id.in_(accessible), log.user_id == current_user.id),
+        ))
+        for entity, project_id, entity_id, user_id in tombstones:
+            if entity == "project":
+                deleted["projects"].add(entity_id)
+            elif entity == "member":
+                deleted["memberships"].append({"project_id": project_id, "user_id": entity_id})
+                if user_id == current_user.id and project_id not in accessible:
+                    deleted["projects"].add(project_id)
+            else:
+                deleted[entity if entity == "documentation" else "tasks"].append(entity_id)
+    deleted["projects"] = sorted(deleted["projects"])
+    body["deleted"] = deleted
+    return ORJSONResponse(body)
@@ -1,19 +1,49 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from .. import models, schemas, auth
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from .. import models, schemas, auth, fieldsets, pagination
+from ..task_query import TaskFilters
+from ..events import event_hub
+from ..serialization import Projection
 from ..database import get_db
+from ..metrics import TimedRoute
+from ..write_queue import run_write
 
-router = APIRouter(prefix="/tasks", tags=["tasks"])
+router = APIRouter(prefix="/tasks", tags=["tasks"], route_class=TimedRoute)
+
+async def _project_roles(db: AsyncSession, user_id: int, project_ids):
+    """Resolve the user's role once per distinct project"""
+    return {
+        project_id: await auth.get_user_role_in_project(db, user_id, project_id)
+        for project_id in set(project_ids)
+    }
+
+async def _task_projects(db: AsyncSession, task_ids):
+    """Map each existing task id to its project id"""
+    rows = await db.execute(
+        select(models.Task.id, models.Task.project_id).where(models.Task.id.in_(set(task_ids)))
+    )
+    return dict(rows.all())
+
+def _write_error(user_role):
+    """Reason a role may not create or update tasks, if any"""
+    if not user_role:
+        return "Access denied to project"
+    # Only members and admins can create or update tasks
+    if user_role not in [models.UserRole.ADMIN, models.UserRole.MEMBER]:
+        return "Insufficient permissions"
+    return None
 
 @router.post("/", response_model=schemas.TaskResponse)
-def create_task(
+async def create_task(
     task: schemas.TaskCreate,
     current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Check if user has access to the project
-    user_role = auth.get_user_role_in_project(db, current_user.id, task.project_id)
+    user_role = await auth.get_user_role_in_project(db, current_user.id, task.project_id)
     if not user_role:
         raise HTTPException(status_code=403, detail="Access denied to project")
     
@@ -21,66 +51,220 @@ def create_task(
     if user_role not in [models.UserRole.ADMIN, models.UserRole.MEMBER]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
-    db_task = models.Task(**task.dict())
-    db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
+    def insert_task(session):
+        db_task = models.Task(**task.dict())
+        session.add(db_task)
+        session.flush()
+        return db_task
+    
+    db_task = await run_write(db, insert_task)
+    event_hub.publish("task.created", db_task.project_id, [db_task.id])
     return db_task
 
 @router.get("/", response_model=List[schemas.TaskResponse])
-def get_tasks(
+async def get_tasks(
     project_id: int = None,
+    limit: Optional[int] = Query(None, ge=1, le=pagination.MAX_PAGE_SIZE, description="Page size, enables keyset pagination"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    stream: Optional[pagination.StreamFormat] = Query(None, description="Stream rows as NDJSON or a chunked JSON array"),
+    fields: Optional[str] = Query(None, description="Comma-separated attributes to return"),
+    filters: TaskFilters = Depends(),
     current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
+    projection = Projection(models.Task, schemas.TaskResponse, fieldsets.select_fields(schemas.TaskResponse, fields))
+    
     if project_id:
         # Check if user has access to the project
-        user_role = auth.get_user_role_in_project(db, current_user.id, project_id)
+        user_role = await auth.get_user_role_in_project(db, current_user.id, project_id)
         if not user_role:
             raise HTTPException(status_code=403, detail="Access denied to project")
-        
-        tasks = db.query(models.Task).filter(models.Task.project_id == project_id).all()
+    
+        query = projection.select().where(models.Task.project_id == project_id)
     else:
         # Get all tasks from projects user has access to
-        user_projects = db.query(models.Project).filter(
-            (models.Project.owner_id == current_user.id) |
-            (models.Project.members.any(id=current_user.id))
-        ).all()
-        project_ids = [p.id for p in user_projects]
-        tasks = db.query(models.Task).filter(models.Task.project_id.in_(project_ids)).all()
-    
-    return tasks
+        project_ids = (await db.scalars(auth.accessible_project_ids(current_user.id))).all()
+        query = projection.select().where(models.Task.project_id.in_(project_ids))
+    
+    query = filters.apply(query)
+    return await pagination.list_response(db, query, projection, limit, cursor, stream, filters.order)
+
+@router.get("/mine", response_model=List[schemas.TaskResponse])
+async def get_my_tasks(
+    limit: Optional[int] = Query(None, ge=1, le=pagination.MAX_PAGE_SIZE, description="Page size, enables keyset pagination"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    stream: Optional[pagination.StreamFormat] = Query(None, description="Stream rows as NDJSON or a chunked JSON array"),
+    fields: Optional[str] = Query(None, description="Comma-separated attributes to return"),
+    filters: TaskFilters = Depends(),
+    current_user: models.User = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Tasks assigned to the current user across all projects they can access"""
+    projection = Projection(models.Task, schemas.TaskResponse, fieldsets.select_fields(schemas.TaskResponse, fields))
+    
+    project_ids = (await db.scalars(auth.accessible_project_ids(current_user.id))).all()
+    query = projection.select().where(
+        models.Task.assignee_id == current_user.id,
+        models.Task.project_id.in_(project_ids),
+    )
+    query = filters.apply(query)
+    return await pagination.list_response(db, query, projection, limit, cursor, stream, filters.order)
+
+@router.post("/bulk", response_model=schemas.BulkResponse)
+async def create_tasks_bulk(
+    payload: schemas.TaskBulkCreate,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Create many tasks in one transaction, reporting a status per item"""
+    roles = await _project_roles(db, current_user.id, [task.project_id for task in payload.items])
+    
+    results = []
+    rows, row_indexes = [], []
+    for index, task in enumerate(payload.items):
+        error = _write_error(roles[task.project_id])
+        if error:
+            results.append(schemas.BulkItemResult(index=index, status=403, detail=error))
+            continue
+        rows.append(task.dict())
+        row_indexes.append(index)
+        results.append(None)
+    
+    if rows:
+        def insert_tasks(session):
+            # RETURNING order is unspecified, so ids are assigned rather than read
+            # back: the first row takes SQLite's write lock and the next free rowid
+            # (one above the largest), no other connection can insert until this
+            # commits, and the rest are inserted with the ids that follow it
+            first_id = session.execute(insert(models.Task).returning(models.Task.id), rows[0]).scalar_one()
+            ids = list(range(first_id, first_id + len(rows)))
+            if len(rows) > 1:
+                # With RETURNING, SQLAlchemy batches the rows into multi-row
+                # INSERTs; the returned ids are the given ones, in whatever order
+                session.execute(insert(models.Task).returning(models.Task.id), [
+                    {**row, "id": task_id} for row, task_id in zip(rows[1:], ids[1:])
+                ])
+            return ids
+        
+        ids = await run_write(db, insert_tasks)
+        for index, task_id in zip(row_indexes, ids):
+            results[index] = schemas.BulkItemResult(index=index, id=task_id, status=201)
+        event_hub.publish_grouped("task.created", (
+            (rows[position]["project_id"], task_id) for position, task_id in enumerate(ids)
+        ))
+    
+    return {"results": results}
+
+@router.patch("/bulk", response_model=schemas.BulkResponse)
+async def update_tasks_bulk(
+    payload: schemas.TaskBulkUpdate,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Update many tasks in one transaction, reporting a status per item"""
+    project_ids = await _task_projects(db, [item.id for item in payload.items])
+    roles = await _project_roles(db, current_user.id, project_ids.values())
+    
+    results = []
+    rows = []
+    for index, item in enumerate(payload.items):
+        if item.id not in project_ids:
+            results.append(schemas.BulkItemResult(index=index, id=item.id, status=404, detail="Task not found"))
+            continue
+        error = _write_error(roles[project_ids[item.id]])
+        if error:
+            results.append(schemas.BulkItemResult(index=index, id=item.id, status=403, detail=error))
+            continue
+        changes = item.dict(exclude_unset=True, exclude={"id"})
+        if changes:
+            rows.append({"id": item.id, **changes})
+        results.append(schemas.BulkItemResult(index=index, id=item.id, status=200))
+    
+    if rows:
+        # Bulk UPDATE by primary key, batched per distinct set of columns
+        await run_write(db, lambda session: session.execute(update(models.Task), rows))
+        event_hub.publish_grouped("task.updated", ((project_ids[row["id"]], row["id"]) for row in rows))
+    
+    return {"results": results}
+
+@router.delete("/bulk", response_model=schemas.BulkResponse)
+async def delete_tasks_bulk(
+    payload: schemas.TaskBulkDelete,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Delete many tasks in one transaction, reporting a status per item"""
+    project_ids = await _task_projects(db, payload.ids)
+    roles = await _project_roles(db, current_user.id, project_ids.values())
+    
+    results = []
+    deleted = set()
+    for index, task_id in enumerate(payload.ids):
+        if task_id not in project_ids:
+            results.append(schemas.BulkItemResult(index=index, id=task_id, status=404, detail="Task not found"))
+            continue
+        role = roles[project_ids[task_id]]
+        if not role:
+            results.append(schemas.BulkItemResult(index=index, id=task_id, status=403, detail="Access denied to project"))
+            continue
+        # Only admins can delete tasks
+        if role not in [models.UserRole.ADMIN]:
+            results.append(schemas.BulkItemResult(index=index, id=task_id, status=403, detail="Only admins can delete tasks"))
+            continue
+        deleted.add(task_id)
+        results.append(schemas.BulkItemResult(index=index, id=task_id, status=200))
+    
+    if deleted:
+        def delete_tasks(session):
+            # Bulk DELETE skips ORM cascades, so remove the tasks' documentation first
+            session.execute(
+                delete(models.Documentation).where(models.Documentation.task_id.in_(deleted))
+                .execution_options(synchronize_session=False)
+            )
+            session.execute(
+                delete(models.Task).where(models.Task.id.in_(deleted))
+                .execution_options(synchronize_session=False)
+            )
+        
+        await run_write(db, delete_tasks)
+        event_hub.publish_grouped("task.deleted", ((project_ids[task_id], task_id) for task_id in deleted))
+    
+    return {"results": results}
 
 @router.get("/{task_id}", response_model=schemas.TaskResponse)
-def get_task(
+async def get_task(
     task_id: int,
+    fields: Optional[str] = Query(None, description="Comma-separated attributes to return"),
     current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    task = db.query(models.Task).filter(models.Task.id == task_id).first()
+    task = await db.get(models.Task, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
     # Check if user has access to the project
-    user_role = auth.get_user_role_in_project(db, current_user.id, task.project_id)
+    user_role = await auth.get_user_role_in_project(db, current_user.id, task.project_id)
     if not user_role:
         raise HTTPException(status_code=403, detail="Access denied to project")
     
+    selected = fieldsets.select_fields(schemas.TaskResponse, fields)
+    if selected is not None:
+        return fieldsets.render(task, schemas.TaskResponse, selected)
     return task
 
 @router.put("/{task_id}", response_model=schemas.TaskResponse)
-def update_task(
+async def update_task(
     task_id: int,
     task_update: schemas.TaskUpdate,
     current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    task = db.query(models.Task).filter(models.Task.id == task_id).first()
+    task = await db.get(models.Task, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
     # Check if user has access to the project
-    user_role = auth.get_user_role_in_project(db, current_user.id, task.project_id)
+    user_role = await auth.get_user_role_in_project(db, current_user.id, task.project_id)
     if not user_role:
         raise HTTPException(status_code=403, detail="Access denied to project")
     
@@ -88,25 +272,33 @@ def update_task(
     if user_role not in [models.UserRole.ADMIN, models.UserRole.MEMBER]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
-    for field, value in task_update.dict(exclude_unset=True).items():
-        setattr(task, field, value)
+    changes = task_update.dict(exclude_unset=True)
     
-    db.commit()
-    db.refresh(task)
+    def apply_update(session):
+        task = session.get(models.Task, task_id)
+        if task is None:
+            raise HTTPException(status_code=404, detail="Task not found")
+        for field, value in changes.items():
+            setattr(task, field, value)
+        session.flush()
+        return task
+    
+    task = await run_write(db, apply_update)
+    event_hub.publish("task.updated", task.project_id, [task_id])
     return task
 
 @router.delete("/{task_id}")
-def delete_task(
+async def delete_task(
     task_id: int,
     current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    task = db.query(models.Task).filter(models.Task.id == task_id).first()
+    task = await db.get(models.Task, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
     # Check if user has access to the project
-    user_role = auth.get_user_role_in_project(db, current_user.id, task.project_id)
+    user_role = await auth.get_user_role_in_project(db, current_user.id, task.project_id)
     if not user_role:
         raise HTTPException(status_code=403, detail="Access denied to project")
     
@@ -114,6 +306,12 @@ def delete_task(
     if user_role not in [models.UserRole.ADMIN]:
         raise HTTPException(status_code=403, detail="Only admins can delete tasks")
     
-    db.delete(task)
-    db.commit()
+    def delete_task_row(session):
+        # The delete cascades to the task's documentation; load it in one go
+        task = session.get(models.Task, task_id, options=[selectinload(models.Task.documentation)])
+        if task is not None:
+            session.delete(task)
+    
+    await run_write(db, delete_task_row)
+    event_hub.publish("task.deleted", task.project_id, [task_id])
     return {"message": "Task deleted successfully"} 
\ No newline at end of file
@@ -0,0 +1,36 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models, schemas, auth
+from ..database import get_db
+from ..metrics import TimedRoute
+from ..user_directory import user_directory
+
+router = APIRouter(prefix="/users", tags=["users"], route_class=TimedRoute)
+
+@router.get("/search", response_model=List[schemas.UserSummary])
+async def search_users(
+    q: str = Query(..., min_length=1, max_length=254, description="Prefix of a username or email"),
+    limit: int = Query(20, ge=1, le=100),
+    exclude_project_id: Optional[int] = Query(None, description="Leave out the owner and members of this project"),
+    current_user: models.User = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Users whose username or email starts with q, e.g. to pick a new project member"""
+    # A blank prefix would match everyone and page through the whole directory
+    q = q.strip()
+    if not q:
+        raise HTTPException(status_code=422, detail="q must not be blank")
+    
+    exclude = ()
+    if exclude_project_id is not None:
+        user_role = await auth.get_user_role_in_project(db, current_user.id, exclude_project_id)
+        if not user_role:
+            if not await auth.membership_index.project_exists(db, exclude_project_id):
+                raise HTTPException(status_code=404, detail="Project not found")
+            raise HTTPException(status_code=403, detail="Access denied")
+        exclude = await auth.membership_index.get_members(db, exclude_project_id)
+    
+    await user_directory.refresh()
+    return ORJSONResponse(user_directory.search(q, limit, exclude))
@@ -1,8 +1,11 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+import os
+from pydantic import BaseModel, EmailStr, Field
+from typing import Dict, Optional, List
 from datetime import datetime
 from enum import Enum
 
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "5000"))
+
 class UserRole(str, Enum):
     ADMIN = "admin"
     MEMBER = "member"
@@ -13,6 +16,16 @@ class DocumentationType(str, Enum):
     LINK = "link"
     CODE_SNIPPET = "code_snippet"
 
+class TaskStatus(str, Enum):
+    PENDING = "pending"
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+
+class TaskPriority(str, Enum):
+    LOW = "low"
+    MEDIUM = "medium"
+    HIGH = "high"
+
 # User schemas
 class UserBase(BaseModel):
     email: EmailStr
@@ -28,6 +41,11 @@ class UserResponse(UserBase):
     class Config:
         from_attributes = True
 
+class UserSummary(BaseModel):
+    id: int
+    username: str
+    email: str
+
 # Project schemas
 class ProjectBase(BaseModel):
     name: str
@@ -57,8 +75,8 @@ class ProjectWithMembers(ProjectResponse):
 class TaskBase(BaseModel):
     title: str
     description: Optional[str] = None
-    status: Optional[str] = "pending"
-    priority: Optional[str] = "medium"
+    status: Optional[TaskStatus] = TaskStatus.PENDING
+    priority: Optional[TaskPriority] = TaskPriority.MEDIUM
 
 class TaskCreate(TaskBase):
     project_id: int
@@ -67,8 +85,8 @@ class TaskCreate(TaskBase):
 class TaskUpdate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
-    status: Optional[str] = None
-    priority: Optional[str] = None
+    status: Optional[TaskStatus] = None
+    priority: Optional[TaskPriority] = None
     assignee_id: Optional[int] = None
 
 class TaskResponse(TaskBase):
@@ -81,6 +99,38 @@ class TaskResponse(TaskBase):
     class Config:
         from_attributes = True
 
+# Task statistics schemas
+class TaskCounts(BaseModel):
+    total: int
+    by_status: Dict[str, int]
+    by_priority: Dict[str, int]
+    by_assignee: Dict[str, int]  # Keyed by user id, "none" for unassigned
+
+class ProjectStats(TaskCounts):
+    project_id: int
+
+# Bulk task schemas
+class TaskBulkCreate(BaseModel):
+    items: List[TaskCreate] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+
+class TaskBulkUpdateItem(TaskUpdate):
+    id: int
+
+class TaskBulkUpdate(BaseModel):
+    items: List[TaskBulkUpdateItem] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+
+class TaskBulkDelete(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+
+class BulkItemResult(BaseModel):
+    index: int  # Position of the item in the request
+    id: Optional[int] = None
+    status: int  # HTTP status the item would have had as a single request
+    detail: Optional[str] = None
+
+class BulkResponse(BaseModel):
+    results: List[BulkItemResult]
+
 # Documentation schemas
 class DocumentationBase(BaseModel):
     title: str
@@ -112,11 +162,60 @@ class DocumentationResponse(DocumentationBase):
     class Config:
         from_attributes = True
 
+class DocumentationSummary(DocumentationResponse):
+    content: Optional[str] = None  # Only with fields=content; otherwise see excerpt
+    content_size: int  # UTF-8 bytes of content
+    excerpt: str  # Start of content
+    snippet: Optional[str] = None  # Highlighted match, set for full-text searches
+
+# Dashboard schemas
+class DashboardProject(ProjectResponse):
+    task_counts: TaskCounts
+
+class DashboardDocument(BaseModel):
+    id: int
+    title: str
+    doc_type: DocumentationType
+    author_id: int
+    project_id: Optional[int]
+    task_id: Optional[int]
+    updated_at: datetime
+
+class DashboardResponse(BaseModel):
+    projects: List[DashboardProject] = []
+    task_counts: TaskCounts  # Summed over projects
+    my_tasks: List[TaskResponse] = []  # Open tasks assigned to the user, highest priority first
+    recent_documentation: List[DashboardDocument] = []
+
+# Sync schemas
+class SyncMembership(BaseModel):
+    project_id: int
+    user_id: int
+    role: Optional[UserRole] = None
+
+class SyncDeleted(BaseModel):
+    projects: List[int] = []
+    tasks: List[int] = []
+    documentation: List[int] = []
+    memberships: List[SyncMembership] = []
+
+class SyncResponse(BaseModel):
+    cursor: str  # Pass as since= on the next call
+    projects: List[ProjectResponse] = []
+    tasks: List[TaskResponse] = []
+    documentation: List[DocumentationResponse] = []
+    memberships: List[SyncMembership] = []
+    deleted: SyncDeleted = SyncDeleted()
+
 # Authentication schemas
 class Token(BaseModel):
     access_token: str
     token_type: str
 
+class StreamTicket(BaseModel):
+    ticket: str
+    expires_in: int  # seconds
+
 class TokenData(BaseModel):
     username: Optional[str] = None
 
@@ -0,0 +1,101 @@
+import logging
+import re
+from sqlalchemy import column, func, literal, literal_column, table, text
+from sqlalchemy.exc import OperationalError
+from . import doc_storage, models
+
+logger = logging.getLogger(__name__)
+
+# Column weights for bm25 ranking: a hit in the title outranks one in the body
+TITLE_WEIGHT = 10.0
+CONTENT_WEIGHT = 1.0
+SNIPPET_START = "<mark>"
+SNIPPET_END = "</mark>"
+SNIPPET_TOKENS = 24
+
+# External-content FTS5 index over documentation(title, content), kept in
+# sync by triggers so every insert, update and delete is indexed incrementally.
+# Bodies may be stored compressed, so the index reads them through doc_text()
+# (see app.doc_storage), and snippets through the documentation_text view.
+FTS_DDL = [
+    """CREATE VIEW IF NOT EXISTS documentation_text AS
+        SELECT id, title, doc_text(content) AS content FROM documentation""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS documentation_fts USING fts5(
+        title, content, content='documentation_text', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS documentation_fts_ai AFTER INSERT ON documentation BEGIN
+        INSERT INTO documentation_fts(rowid, title, content) VALUES (new.id, new.title, doc_text(new.content));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS documentation_fts_ad AFTER DELETE ON documentation BEGIN
+        INSERT INTO documentation_fts(documentation_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, doc_text(old.content));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS documentation_fts_au AFTER UPDATE OF title, content ON documentation BEGIN
+        INSERT INTO documentation_fts(documentation_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, doc_text(old.content));
+        INSERT INTO documentation_fts(rowid, title, content) VALUES (new.id, new.title, doc_text(new.content));
+    END""",
+]
+_FTS_TRIGGERS = ("documentation_fts_ai", "documentation_fts_ad", "documentation_fts_au")
+
+documentation_fts = table("documentation_fts", column("rowid"))
+_fts = literal_column("documentation_fts")
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+fts_enabled = False
+
+def create_search_index(engine):
+    """Create the FTS5 index and its triggers, backfilling existing rows on first run"""
+    global fts_enabled
+    if engine.dialect.name != "sqlite":
+        return False
+    try:
+        with engine.begin() as conn:
+            existing = conn.execute(text(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'documentation_fts'"
+            )).scalar()
+            if existing is not None and "documentation_text" not in existing:
+                # Built when it indexed documentation.content directly; rebuild over the view
+                for trigger in _FTS_TRIGGERS:
+                    conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+                conn.execute(text("DROP TABLE documentation_fts"))
+                existing = None
+            existed = existing is not None
+            for ddl in FTS_DDL:
+                conn.execute(text(ddl))
+            if not existed:
+                conn.execute(text("INSERT INTO documentation_fts(documentation_fts) VALUES ('rebuild')"))
+    except OperationalError as exc:
+        # SQLite builds without FTS5 keep the LIKE-based search
+        logger.warning("FTS5 unavailable, documentation search falls back to LIKE: %s", exc)
+        return False
+    fts_enabled = True
+    return True
+
+def to_match_query(search: str) -> str:
+    """Turn free text into an FTS5 query: every word must match, as a prefix"""
+    return " ".join(f'"{term}"*' for term in _TERM.findall(search))
+
+def apply_search(query, search: str):
+    """Restrict a query over documentation to rows matching search.
+
+    Adds a snippet column and orders rows by relevance; the snippet is None
+    when the LIKE fallback is used.
+    """
+    match_query = to_match_query(search) if fts_enabled else ""
+    if not match_query:
+        search_filter = f"%{search}%"
+        return query.where(
+            (models.Documentation.title.ilike(search_filter)) |
+            (doc_storage.plain_text(models.Documentation.content).ilike(search_filter))
+        ).add_columns(literal(None).label("snippet"))
+
+    return (
+        query.join(documentation_fts, documentation_fts.c.rowid == models.Documentation.id)
+        .where(_fts.op("MATCH")(match_query))
+        .add_columns(func.snippet(
+            _fts, -1, SNIPPET_START, SNIPPET_END, "…", SNIPPET_TOKENS
+        ).label("snippet"))
+        .order_by(func.bm25(_fts, TITLE_WEIGHT, CONTENT_WEIGHT))
+    )
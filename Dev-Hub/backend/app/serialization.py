@@ -0,0 +1,60 @@
+from typing import FrozenSet, Optional
+import orjson
+from sqlalchemy import select
+
+# Keyset pagination reads these from every row, selected or not
+CURSOR_COLUMNS = ("id", "updated_at")
+
+class Projection:
+    """Columns behind a response schema, read as plain rows and turned into dicts.
+
+    Lists built this way skip ORM object hydration and Pydantic validation;
+    the dicts go straight to orjson. nested maps a relationship name to the
+    (model, schema) it embeds, e.g. {"author": (models.User, schemas.UserResponse)},
+    and is loaded with a join. fields, from fieldsets.select_fields, limits
+    the columns selected. Schema fields with no column behind them take
+    their default unless the query adds a column of that name, as the
+    documentation search does for snippet.
+    """
+
+    def __init__(self, model, schema, fields: Optional[FrozenSet[str]] = None, nested: dict = None):
+        nested = nested or {}
+        wanted = [name for name in schema.model_fields if fields is None or name in fields]
+        self.model = model
+        self.keys = [name for name in wanted if name not in nested and hasattr(model, name)]
+        self.defaults = {
+            name: schema.model_fields[name].default
+            for name in wanted if name not in nested and not hasattr(model, name)
+        }
+        hidden = [name for name in CURSOR_COLUMNS if name not in self.keys]
+        self.columns = [getattr(model, name) for name in self.keys + hidden]
+        self.nested = []
+        self.joins = []
+        for name, (target, target_schema) in nested.items():
+            if name not in wanted:
+                continue
+            target_keys = list(target_schema.model_fields)
+            self.nested.append((name, len(self.columns), target_keys))
+            self.columns += [getattr(target, key).label(f"{name}__{key}") for key in target_keys]
+            self.joins.append(getattr(model, name))
+        self.extra_start = len(self.columns)
+
+    def select(self):
+        query = select(*self.columns)
+        for relationship in self.joins:
+            query = query.join(relationship)
+        return query
+
+    def to_dict(self, row) -> dict:
+        item = dict(zip(self.keys, row))
+        for name, start, keys in self.nested:
+            item[name] = dict(zip(keys, row[start:start + len(keys)]))
+        if self.defaults:
+            item.update(self.defaults)
+            for name, value in zip(row._fields[self.extra_start:], row[self.extra_start:]):
+                if name in self.defaults:
+                    item[name] = value
+        return item
+
+def dumps(items) -> bytes:
+    return orjson.dumps(items)
@@ -0,0 +1,192 @@
+"""Per-project task counters by status, priority and assignee.
+
+Counters live in project_task_stats and are kept current by triggers on
+tasks, so every write path (single and bulk endpoints, the write queue,
+project cascade deletes) updates them in the same transaction. Reading
+stats is then one indexed lookup per project instead of a scan of its tasks.
+
+Check or repair the counters against the tasks table:
+
+    python -m app.stats verify
+    python -m app.stats rebuild
+"""
+import argparse
+import logging
+import sys
+from sqlalchemy import String, cast, column, func, select, table, text
+from sqlalchemy.exc import OperationalError
+from . import models
+
+logger = logging.getLogger(__name__)
+
+# Dimension name -> tasks column it counts
+DIMENSIONS = {"status": "status", "priority": "priority", "assignee": "assignee_id"}
+# Counter value used for NULL status, priority or assignee
+UNSET = "none"
+
+_ADJUST = """INSERT INTO project_task_stats(project_id, dimension, value, count)
+        SELECT {ref}.project_id, '{dimension}', COALESCE(CAST({ref}.{col} AS TEXT), '{unset}'), {delta}
+        WHERE {ref}.project_id IS NOT NULL
+        ON CONFLICT(project_id, dimension, value) DO UPDATE SET count = count + {delta};"""
+
+def _adjust(ref, delta):
+    return "\n        ".join(
+        _ADJUST.format(ref=ref, dimension=dimension, col=col, unset=UNSET, delta=delta)
+        for dimension, col in DIMENSIONS.items()
+    )
+
+STATS_DDL = [
+    """CREATE TABLE IF NOT EXISTS project_task_stats (
+        project_id INTEGER NOT NULL,
+        dimension TEXT NOT NULL,
+        value TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (project_id, dimension, value)
+    ) WITHOUT ROWID""",
+    f"""CREATE TRIGGER IF NOT EXISTS tasks_stats_ai AFTER INSERT ON tasks BEGIN
+        {_adjust("new", 1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS tasks_stats_ad AFTER DELETE ON tasks BEGIN
+        {_adjust("old", -1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS tasks_stats_au AFTER UPDATE OF status, priority, assignee_id, project_id ON tasks
+    WHEN old.status IS NOT new.status OR old.priority IS NOT new.priority
+        OR old.assignee_id IS NOT new.assignee_id OR old.project_id IS NOT new.project_id
+    BEGIN
+        {_adjust("old", -1)}
+        {_adjust("new", 1)}
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS projects_stats_ad AFTER DELETE ON projects BEGIN
+        DELETE FROM project_task_stats WHERE project_id = old.id;
+    END""",
+]
+
+project_task_stats = table(
+    "project_task_stats", column("project_id"), column("dimension"), column("value"), column("count")
+)
+
+stats_enabled = False
+
+def _expected_rows(conn):
+    """Counters recomputed from the tasks table, as (project_id, dimension, value, count)"""
+    rows = []
+    for dimension, col in DIMENSIONS.items():
+        key = func.coalesce(cast(getattr(models.Task, col), String), UNSET)
+        rows += [
+            (project_id, dimension, value, count)
+            for project_id, value, count in conn.execute(
+                select(models.Task.project_id, key, func.count()).group_by(models.Task.project_id, key)
+            )
+        ]
+    return rows
+
+def rebuild(conn):
+    """Replace every counter with one recomputed from the tasks table"""
+    conn.execute(project_task_stats.delete())
+    rows = _expected_rows(conn)
+    if rows:
+        conn.execute(project_task_stats.insert(), [
+            {"project_id": project_id, "dimension": dimension, "value": value, "count": count}
+            for project_id, dimension, value, count in rows
+        ])
+    return len(rows)
+
+def verify(conn):
+    """Return the counters that disagree with the tasks table as (key, stored, expected)"""
+    expected = {(p, d, v): c for p, d, v, c in _expected_rows(conn)}
+    stored = {
+        (p, d, v): c for p, d, v, c in conn.execute(select(project_task_stats).where(project_task_stats.c.count != 0))
+    }
+    return [
+        (key, stored.get(key, 0), expected.get(key, 0))
+        for key in sorted(expected.keys() | stored.keys(), key=str)
+        if stored.get(key, 0) != expected.get(key, 0)
+    ]
+
+def create_stats_triggers(engine):
+    """Create the counters table and its triggers, backfilling it on first run"""
+    global stats_enabled
+    if engine.dialect.name != "sqlite":
+        return False
+    try:
+        with engine.begin() as conn:
+            existed = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'project_task_stats'"
+            )).first() is not None
+            for ddl in STATS_DDL:
+                conn.execute(text(ddl))
+            if not existed:
+                rebuild(conn)
+    except OperationalError as exc:
+        # Stats are then aggregated from the tasks table on every read
+        logger.warning("Task counters unavailable, stats fall back to GROUP BY: %s", exc)
+        return False
+    stats_enabled = True
+    return True
+
+def _empty_counts():
+    return {"total": 0, "by_status": {}, "by_priority": {}, "by_assignee": {}}
+
+async def project_counts(db, project_ids):
+    """Task counts for each of project_ids, from the counters when available"""
+    counts = {project_id: _empty_counts() for project_id in project_ids}
+    if not counts:
+        return counts
+    if stats_enabled:
+        rows = await db.execute(
+            select(project_task_stats.c.project_id, project_task_stats.c.dimension,
+                   project_task_stats.c.value, project_task_stats.c.count)
+            .where(project_task_stats.c.project_id.in_(counts), project_task_stats.c.count > 0)
+        )
+    else:
+        rows = []
+        for dimension, col in DIMENSIONS.items():
+            key = getattr(models.Task, col)
+            rows += [
+                (project_id, dimension, UNSET if value is None else str(getattr(value, "value", value)), count)
+                for project_id, value, count in await db.execute(
+                    select(models.Task.project_id, key, func.count())
+                    .where(models.Task.project_id.in_(counts))
+                    .group_by(models.Task.project_id, key)
+                )
+            ]
+    for project_id, dimension, value, count in rows:
+        entry = counts[project_id]
+        entry[f"by_{dimension}"][value] = count
+        if dimension == "status":
+            entry["total"] += count
+    return counts
+
+def sum_counts(counts):
+    """Add up counts of several projects, as returned by project_counts"""
+    totals = _empty_counts()
+    for entry in counts:
+        totals["total"] += entry["total"]
+        for dimension in DIMENSIONS:
+            by_value = totals[f"by_{dimension}"]
+            for value, count in entry[f"by_{dimension}"].items():
+                by_value[value] = by_value.get(value, 0) + count
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description="Check or repair the per-project task counters")
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    args = parser.parse_args()
+
+    from .database import engine
+    models.Base.metadata.create_all(bind=engine)
+    if not create_stats_triggers(engine):
+        sys.exit("Task counters are not supported on this database")
+    with engine.begin() as conn:
+        drift = verify(conn)
+        for (project_id, dimension, value), stored, expected in drift:
+            print(f"project {project_id} {dimension}={value}: stored {stored}, expected {expected}")
+        if args.command == "rebuild":
+            print(f"Rebuilt {rebuild(conn)} counters, {len(drift)} were out of date")
+        elif drift:
+            sys.exit(1)
+        else:
+            print("Counters match the tasks table")
+
+if __name__ == "__main__":
+    main()
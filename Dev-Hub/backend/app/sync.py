@@ -0,0 +1,203 @@
+"""Change log behind GET /sync.
+
+Triggers on projects, project_members, tasks and documentation upsert one
+sync_log row per entity with a new value of a global sequence, so the
+rows changed after a cursor are those with a larger seq. Deletes flip the
+row into a tombstone. Separate 'grant' rows, keyed by project and user,
+record when a user gained access to a project: it was created with them
+as owner, handed over to them, or they were added as a member. Other
+changes to a project or membership leave its grant alone, so they are
+not mistaken for new access. Tombstones older than SYNC_TOMBSTONE_RETENTION are
+compacted away; cursors from before the newest compacted tombstone are
+then refused and the client reloads from scratch.
+
+Compaction runs periodically in the app and can be run by hand:
+
+    python -m app.sync compact
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from sqlalchemy import column, table, text
+from sqlalchemy.exc import OperationalError
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+SYNC_TOMBSTONE_RETENTION = int(os.getenv("SYNC_TOMBSTONE_RETENTION", str(30 * 24 * 3600)))
+SYNC_COMPACT_INTERVAL = int(os.getenv("SYNC_COMPACT_INTERVAL", "3600"))
+
+# entity -> (table, project id column, entity id column, user id column or None)
+ENTITIES = {
+    "project": ("projects", "id", "id", "owner_id"),
+    "member": ("project_members", "project_id", "user_id", "user_id"),
+    "task": ("tasks", "project_id", "id", None),
+    "documentation": ("documentation", "project_id", "id", None),
+}
+
+_LOG = """UPDATE sync_state SET seq = seq + 1 WHERE id = 1;
+        INSERT INTO sync_log(entity, project_id, entity_id, user_id, seq, deleted, changed_at)
+        SELECT '{entity}', {ref}.{project_col}, {ref}.{id_col}, {user_expr},
+            (SELECT seq FROM sync_state WHERE id = 1), {deleted}, CAST(strftime('%s', 'now') AS INTEGER)
+        WHERE {ref}.{project_col} IS NOT NULL
+        ON CONFLICT(entity, project_id, entity_id) DO UPDATE SET
+            user_id = excluded.user_id, seq = excluded.seq,
+            deleted = excluded.deleted, changed_at = excluded.changed_at;"""
+
+def _log_triggers(entity, table_name, project_col, id_col, user_col):
+    ddl = []
+    for event, ref, deleted in (("INSERT", "new", 0), ("UPDATE", "new", 0), ("DELETE", "old", 1)):
+        user_expr = f"{ref}.{user_col}" if user_col else "NULL"
+        body = _LOG.format(entity=entity, ref=ref, project_col=project_col, id_col=id_col,
+                           user_expr=user_expr, deleted=deleted)
+        ddl.append(f"""CREATE TRIGGER IF NOT EXISTS {table_name}_sync_{event.lower()}
+    AFTER {event} ON {table_name} BEGIN
+        {body}
+    END""")
+    return ddl
+
+_GRANT = """UPDATE sync_state SET seq = seq + 1 WHERE id = 1;
+        INSERT INTO sync_log(entity, project_id, entity_id, user_id, seq, deleted, changed_at)
+        SELECT 'grant', {project}, {user}, {user},
+            (SELECT seq FROM sync_state WHERE id = 1), 0, CAST(strftime('%s', 'now') AS INTEGER)
+        WHERE {user} IS NOT NULL
+        ON CONFLICT(entity, project_id, entity_id) DO UPDATE SET
+            seq = excluded.seq, changed_at = excluded.changed_at;"""
+
+_REVOKE = "DELETE FROM sync_log WHERE entity = 'grant' AND project_id = {project} AND entity_id = {user};"
+
+def _trigger(name, event, table_name, body, when=None):
+    condition = f"\n    WHEN {when}" if when else ""
+    return f"""CREATE TRIGGER IF NOT EXISTS {name}
+    AFTER {event} ON {table_name}{condition} BEGIN
+        {body}
+    END"""
+
+# The grant rows of a revoked access are dropped, not tombstoned: the
+# member or project tombstone already tells the client
+GRANT_DDL = [
+    _trigger("projects_sync_grant_insert", "INSERT", "projects",
+             _GRANT.format(project="new.id", user="new.owner_id")),
+    _trigger("projects_sync_grant_update", "UPDATE OF owner_id", "projects",
+             _REVOKE.format(project="old.id", user="old.owner_id") + "\n        "
+             + _GRANT.format(project="new.id", user="new.owner_id"),
+             when="old.owner_id IS NOT new.owner_id"),
+    _trigger("projects_sync_grant_delete", "DELETE", "projects",
+             "DELETE FROM sync_log WHERE entity = 'grant' AND project_id = old.id;"),
+    _trigger("project_members_sync_grant_insert", "INSERT", "project_members",
+             _GRANT.format(project="new.project_id", user="new.user_id")),
+    _trigger("project_members_sync_grant_update", "UPDATE OF project_id, user_id", "project_members",
+             _REVOKE.format(project="old.project_id", user="old.user_id") + "\n        "
+             + _GRANT.format(project="new.project_id", user="new.user_id"),
+             when="old.project_id IS NOT new.project_id OR old.user_id IS NOT new.user_id"),
+    _trigger("project_members_sync_grant_delete", "DELETE", "project_members",
+             _REVOKE.format(project="old.project_id", user="old.user_id")),
+]
+
+# Databases logged before grant rows existed: treat every live owner and
+# membership row as a grant at its seq, as the log was read before
+_GRANT_BACKFILL = """INSERT OR IGNORE INTO sync_log(entity, project_id, entity_id, user_id, seq, deleted, changed_at)
+    SELECT 'grant', project_id, user_id, user_id, seq, 0, changed_at FROM sync_log
+    WHERE entity IN ('project', 'member') AND deleted = 0 AND user_id IS NOT NULL"""
+
+SYNC_DDL = [
+    """CREATE TABLE IF NOT EXISTS sync_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        seq INTEGER NOT NULL,
+        horizon INTEGER NOT NULL
+    )""",
+    "INSERT OR IGNORE INTO sync_state(id, seq, horizon) VALUES (1, 0, 0)",
+    """CREATE TABLE IF NOT EXISTS sync_log (
+        entity TEXT NOT NULL,
+        project_id INTEGER NOT NULL,
+        entity_id INTEGER NOT NULL,
+        user_id INTEGER,
+        seq INTEGER NOT NULL,
+        deleted INTEGER NOT NULL DEFAULT 0,
+        changed_at INTEGER NOT NULL,
+        PRIMARY KEY (entity, project_id, entity_id)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS ix_sync_log_project_seq ON sync_log(project_id, seq)",
+    "CREATE INDEX IF NOT EXISTS ix_sync_log_user_seq ON sync_log(user_id, seq)",
+    "CREATE INDEX IF NOT EXISTS ix_sync_log_tombstones ON sync_log(deleted, changed_at)",
+    *(ddl for entity, spec in ENTITIES.items() for ddl in _log_triggers(entity, *spec)),
+    *GRANT_DDL,
+]
+
+sync_state = table("sync_state", column("id"), column("seq"), column("horizon"))
+sync_log = table(
+    "sync_log", column("entity"), column("project_id"), column("entity_id"), column("user_id"),
+    column("seq"), column("deleted"), column("changed_at"),
+)
+
+sync_enabled = False
+
+def create_sync_log(engine):
+    """Create the change log, its sequence and the triggers that fill them"""
+    global sync_enabled
+    if engine.dialect.name != "sqlite":
+        return False
+    try:
+        with engine.begin() as conn:
+            upgrading = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sync_log'"
+            )).first() and not conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'projects_sync_grant_insert'"
+            )).first()
+            for ddl in SYNC_DDL:
+                conn.execute(text(ddl))
+            if upgrading:
+                conn.execute(text(_GRANT_BACKFILL))
+    except OperationalError as exc:
+        logger.warning("Change log unavailable, GET /sync is disabled: %s", exc)
+        return False
+    sync_enabled = True
+    return True
+
+def compact(conn, retention: int = SYNC_TOMBSTONE_RETENTION) -> int:
+    """Drop tombstones older than retention seconds and advance the horizon past them"""
+    cutoff = int(time.time()) - retention
+    horizon = conn.execute(text(
+        "SELECT MAX(seq) FROM sync_log WHERE deleted = 1 AND changed_at < :cutoff"
+    ), {"cutoff": cutoff}).scalar()
+    if horizon is None:
+        return 0
+    conn.execute(text("UPDATE sync_state SET horizon = MAX(horizon, :horizon) WHERE id = 1"), {"horizon": horizon})
+    return conn.execute(text(
+        "DELETE FROM sync_log WHERE deleted = 1 AND changed_at < :cutoff"
+    ), {"cutoff": cutoff}).rowcount
+
+def _compact_now():
+    from .database import engine
+    with engine.begin() as conn:
+        return compact(conn)
+
+async def compaction_loop(interval: int = SYNC_COMPACT_INTERVAL):
+    """Compact the tombstone log every interval seconds until cancelled"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            removed = await run_in_threadpool(_compact_now)
+            if removed:
+                logger.info("Compacted %d sync tombstones", removed)
+        except OperationalError:
+            logger.exception("Sync tombstone compaction failed")
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the change log behind GET /sync")
+    parser.add_argument("command", choices=["compact"])
+    parser.add_argument("--retention", type=int, default=SYNC_TOMBSTONE_RETENTION,
+                        help="Keep tombstones younger than this many seconds")
+    args = parser.parse_args()
+
+    from .database import engine
+    from . import models
+    models.Base.metadata.create_all(bind=engine)
+    create_sync_log(engine)
+    with engine.begin() as conn:
+        print(f"Removed {compact(conn, args.retention)} tombstones")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Filtering and sorting of task lists.
+
+TaskFilters is the dependency behind the query parameters of GET /tasks/
+and GET /tasks/mine: any number of statuses, priorities and assignees,
+created and updated ranges, and a sort. Every sort ends in the task id,
+so it is total and keyset pages (see app.pagination) follow it.
+
+Priority is matched and ordered through priority_rank, a virtual column
+the database computes from priority, so "high first" walks the
+(project_id | assignee_id, priority_rank, updated_at) indexes instead of
+sorting every task. Databases created before it existed get the column
+added on startup by create_task_columns. Startup stops on stored statuses
+or priorities outside the enums; to reset them to the defaults, run from
+the backend directory:
+
+    python -m app.task_query normalize --dry-run
+    python -m app.task_query normalize
+"""
+import argparse
+import sys
+from datetime import datetime, timezone
+from enum import Enum
+from typing import List, Optional
+from fastapi import Query
+from sqlalchemy import text
+from . import models, schemas
+
+class TaskSort(str, Enum):
+    UPDATED = "updated_at"  # most recently updated first
+    CREATED = "created_at"  # newest first
+    PRIORITY = "priority"  # high to low, then most recently updated
+
+def sort_order(sort: TaskSort):
+    """(column, descending) pairs for sort, as app.pagination takes them"""
+    task = models.Task
+    if sort == TaskSort.PRIORITY:
+        return [(task.priority_rank, False), (task.updated_at, True), (task.id, True)]
+    if sort == TaskSort.CREATED:
+        return [(task.created_at, True), (task.id, True)]
+    return [(task.updated_at, True), (task.id, True)]
+
+def priority_ranks(priorities) -> List[int]:
+    order = [priority.value for priority in models.PRIORITY_ORDER]
+    return [order.index(priority.value) for priority in priorities]
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Timestamps are stored as naive UTC
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+class TaskFilters:
+    """Query parameters narrowing and ordering a task list"""
+
+    def __init__(
+        self,
+        status: Optional[List[schemas.TaskStatus]] = Query(None, description="Only these statuses; repeat for several"),
+        priority: Optional[List[schemas.TaskPriority]] = Query(None, description="Only these priorities; repeat for several"),
+        assignee_id: Optional[List[int]] = Query(None, description="Only tasks assigned to these users; repeat for several"),
+        created_after: Optional[datetime] = Query(None, description="Created at or after"),
+        created_before: Optional[datetime] = Query(None, description="Created before"),
+        updated_after: Optional[datetime] = Query(None, description="Updated at or after"),
+        updated_before: Optional[datetime] = Query(None, description="Updated before"),
+        sort: Optional[TaskSort] = Query(None, description="Order of the list; pages default to updated_at"),
+    ):
+        self.status = status
+        self.priority = priority
+        self.assignee_id = assignee_id
+        self.created_after = _naive_utc(created_after)
+        self.created_before = _naive_utc(created_before)
+        self.updated_after = _naive_utc(updated_after)
+        self.updated_before = _naive_utc(updated_before)
+        self.sort = sort
+
+    @property
+    def order(self):
+        return sort_order(self.sort) if self.sort else None
+
+    def apply(self, query):
+        task = models.Task
+        if self.status:
+            query = query.where(task.status.in_(self.status))
+        if self.priority:
+            query = query.where(task.priority_rank.in_(priority_ranks(self.priority)))
+        if self.assignee_id:
+            query = query.where(task.assignee_id.in_(self.assignee_id))
+        if self.created_after:
+            query = query.where(task.created_at >= self.created_after)
+        if self.created_before:
+            query = query.where(task.created_at < self.created_before)
+        if self.updated_after:
+            query = query.where(task.updated_at >= self.updated_after)
+        if self.updated_before:
+            query = query.where(task.updated_at < self.updated_before)
+        return query
+
+# (column, enum, value normalize writes in place of unknown ones)
+ENUM_COLUMNS = (
+    ("status", models.TaskStatus, models.TaskStatus.PENDING),
+    ("priority", models.TaskPriority, models.TaskPriority.MEDIUM),
+)
+
+# Offending rows listed when startup refuses to run
+UNKNOWN_VALUES_SHOWN = 20
+
+def _unknown_values(column: str, enum_cls) -> str:
+    allowed = ", ".join(f"'{member.value}'" for member in enum_cls)
+    return f"{column} IS NOT NULL AND {column} NOT IN ({allowed})"
+
+def unknown_values(conn, limit: Optional[int] = None):
+    """(task id, column, stored value) of statuses and priorities outside the enums"""
+    rows = []
+    for column, enum_cls, _ in ENUM_COLUMNS:
+        rows += conn.execute(text(
+            f"SELECT id, '{column}', {column} FROM tasks WHERE {_unknown_values(column, enum_cls)} ORDER BY id"
+            + (f" LIMIT {int(limit)}" if limit is not None else "")
+        )).all()
+    return rows
+
+def count_unknown_values(conn) -> dict:
+    return {
+        column: conn.execute(text(f"SELECT COUNT(*) FROM tasks WHERE {_unknown_values(column, enum_cls)}")).scalar()
+        for column, enum_cls, _ in ENUM_COLUMNS
+    }
+
+def normalize(conn) -> dict:
+    """Reset unknown statuses and priorities to the defaults; counts reset per column"""
+    return {
+        column: conn.execute(text(
+            f"UPDATE tasks SET {column} = :default WHERE {_unknown_values(column, enum_cls)}"
+        ), {"default": default.value}).rowcount
+        for column, enum_cls, default in ENUM_COLUMNS
+    }
+
+def create_task_columns(engine, check_values: bool = True):
+    """Add priority_rank to databases created before it, and refuse values outside the enums.
+
+    Runs before indexes are created, since some of them cover priority_rank.
+    Stored statuses or priorities the enums do not know would fail to load,
+    so startup stops and lists them; `python -m app.task_query normalize`
+    rewrites them once that is what should happen to them.
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+    with engine.begin() as conn:
+        # table_xinfo, unlike table_info, lists generated columns
+        columns = {row[1] for row in conn.execute(text("PRAGMA table_xinfo(tasks)"))}
+        if "priority_rank" not in columns:
+            conn.execute(text(
+                f"ALTER TABLE tasks ADD COLUMN priority_rank INTEGER GENERATED ALWAYS AS ({models.PRIORITY_RANK_SQL}) VIRTUAL"
+            ))
+        if check_values:
+            counts = count_unknown_values(conn)
+            if any(counts.values()):
+                shown = unknown_values(conn, UNKNOWN_VALUES_SHOWN)
+                raise RuntimeError(
+                    "Tasks with a status or priority outside the enums ("
+                    + ", ".join(f"{count} {column}" for column, count in counts.items() if count) + "):\n"
+                    + "\n".join(f"  task {task_id}: {column} = {value!r}" for task_id, column, value in shown)
+                    + "\nFix them, or reset them to the defaults with `python -m app.task_query normalize`"
+                    " (`--dry-run` lists them)"
+                )
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Reset task statuses and priorities outside the enums to the defaults")
+    parser.add_argument("command", choices=["normalize"])
+    parser.add_argument("--dry-run", action="store_true", help="List the tasks that would change without changing them")
+    args = parser.parse_args()
+
+    from .database import engine
+    models.Base.metadata.create_all(bind=engine)
+    if not create_task_columns(engine, check_values=False):
+        sys.exit("Task columns are only migrated on SQLite")
+    with engine.begin() as conn:
+        for task_id, column, value in unknown_values(conn):
+            print(f"task {task_id}: {column} = {value!r}")
+        if args.dry_run:
+            counts = count_unknown_values(conn)
+        else:
+            counts = normalize(conn)
+    defaults = {column: default.value for column, _, default in ENUM_COLUMNS}
+    verb = "Would reset" if args.dry_run else "Reset"
+    for column, count in counts.items():
+        print(f"{verb} {count} tasks' {column} to {defaults[column]!r}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Per-request timing: where a request's time went.
+
+The metrics middleware starts a RequestTimings for every request and
+keeps it in a context variable. Context variables follow the request into
+the threadpool, so the engine hooks below can add every query's count and
+duration to the request that issued it. Code elsewhere marks phases with
+`with phase("auth"):`. Phases may overlap: auth includes the queries it
+makes. Writes batched by the group-commit queue run on its own thread and
+are not attributed to any request.
+
+With record=True the statements themselves are kept as well, with their
+parameters and duration, for app.query_debug.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+
+class RequestTimings:
+    __slots__ = ("start", "queries", "db_seconds", "phases", "endpoint_done", "statements")
+
+    def __init__(self, record: bool = False):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.phases = {}  # name -> seconds
+        self.endpoint_done = None  # perf_counter when the endpoint returned, see metrics.TimedRoute
+        self.statements = [] if record else None  # (statement, parameters, seconds, executemany)
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+@contextmanager
+def request_scope(record: bool = False):
+    """Collect timings for the request handled inside the block"""
+    timings = RequestTimings(record)
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+def current() -> Optional[RequestTimings]:
+    return _current.get()
+
+@contextmanager
+def phase(name: str):
+    """Add the time spent in the block to the current request's phase name"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.phases[name] = timings.phases.get(name, 0.0) + time.perf_counter() - start
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._timing_start = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = _current.get()
+    if timings is not None and context is not None:
+        elapsed = time.perf_counter() - context._timing_start
+        timings.queries += 1
+        timings.db_seconds += elapsed
+        if timings.statements is not None:
+            timings.statements.append((statement, parameters, elapsed, executemany))
+
+def instrument(engine):
+    """Count queries and DB time of a (sync or async) engine towards the current request"""
+    target = getattr(engine, "sync_engine", engine)
+    if not event.contains(target, "before_cursor_execute", _before_cursor_execute):
+        event.listen(target, "before_cursor_execute", _before_cursor_execute)
+        event.listen(target, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,130 @@
+"""In-memory prefix index of usernames and emails, behind GET /users/search.
+
+Every user contributes two keys, their lowercased username and email, to
+one sorted list of (key, user_id). A search bisects to the first key at
+or after the query and walks forward while keys start with it, so its
+cost depends on the number of results, not of users.
+
+The index is loaded in the background at startup, on the thread pool.
+Signups in this process are added as they happen; users created by
+other workers are picked up by reading only the ids above the highest
+one loaded, at most every USER_DIRECTORY_REFRESH seconds. Users are
+never renamed or deleted, so nothing else invalidates it.
+"""
+import asyncio
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+from . import models
+
+USER_DIRECTORY_REFRESH = float(os.getenv("USER_DIRECTORY_REFRESH", "5"))  # seconds
+
+class UserDirectory:
+    """Sorted (key, user_id) list with the users it points at"""
+
+    def __init__(self, refresh_interval: float = USER_DIRECTORY_REFRESH):
+        self.refresh_interval = refresh_interval
+        self._keys = []  # sorted (lowercased username or email, user_id)
+        self._users = {}  # user_id -> (username, email)
+        self._max_id = 0  # highest id read from the database
+        self._refreshed_at = None
+        self._pending = []  # users added while the first load runs
+        self._lock = threading.Lock()
+        self._loading = None  # asyncio.Lock, created in the running loop
+        self._searches = 0
+        self._refreshes = 0
+
+    def _insert(self, user_id: int, username: str, email: str):
+        if user_id in self._users:
+            return
+        self._users[user_id] = (username, email)
+        insort(self._keys, (username.lower(), user_id))
+        insort(self._keys, (email.lower(), user_id))
+
+    def add(self, user_id: int, username: str, email: str):
+        """Index a user created in this process"""
+        with self._lock:
+            # _max_id is left alone: lower ids created elsewhere may still be unread
+            if self._refreshed_at is None:
+                self._pending.append((user_id, username, email))
+            else:
+                self._insert(user_id, username, email)
+
+    def _load(self, engine=None):
+        """Read users above the highest id loaded so far, all of them the first time"""
+        if engine is None:
+            from .database import reader_engine as engine
+        started = time.monotonic()
+        with engine.connect() as conn:
+            rows = conn.execute(
+                select(models.User.id, models.User.username, models.User.email)
+                .where(models.User.id > self._max_id)
+                .order_by(models.User.id)
+            ).all()
+        with self._lock:
+            if self._refreshed_at is None:
+                # Bulk load: one sort instead of an insort per key
+                for user_id, username, email in rows:
+                    self._users[user_id] = (username, email)
+                self._keys = sorted(
+                    key for user_id, username, email in rows
+                    for key in ((username.lower(), user_id), (email.lower(), user_id))
+                )
+                # Signups committed after the load read its rows
+                for user in self._pending:
+                    self._insert(*user)
+                self._pending = []
+            else:
+                for user_id, username, email in rows:
+                    self._insert(user_id, username, email)
+            if rows:
+                self._max_id = max(self._max_id, rows[-1][0])
+            self._refreshed_at = started
+            self._refreshes += 1
+
+    async def refresh(self, force: bool = False):
+        """Load the directory, or the users created since it was last read once the interval has passed"""
+        if self._loading is None:
+            self._loading = asyncio.Lock()
+        if not force and self._refreshed_at is not None and time.monotonic() - self._refreshed_at < self.refresh_interval:
+            return
+        async with self._loading:
+            # Another request may have refreshed while this one waited
+            if not force and self._refreshed_at is not None and time.monotonic() - self._refreshed_at < self.refresh_interval:
+                return
+            await run_in_threadpool(self._load)
+
+    def search(self, query: str, limit: int, exclude=()):
+        """Up to limit users whose username or email starts with query, in key order"""
+        self._searches += 1
+        prefix = query.strip().lower()
+        if not prefix:
+            return []
+        keys = self._keys
+        found = {}
+        position = bisect_left(keys, (prefix,))
+        while position < len(keys) and len(found) < limit:
+            key, user_id = keys[position]
+            if not key.startswith(prefix):
+                break
+            if user_id not in exclude and user_id not in found:
+                username, email = self._users[user_id]
+                found[user_id] = {"id": user_id, "username": username, "email": email}
+            position += 1
+        return list(found.values())
+
+    def clear(self):
+        with self._lock:
+            self._keys = []
+            self._users = {}
+            self._max_id = 0
+            self._refreshed_at = None
+            self._pending = []
+
+    def stats(self):
+        return {"users": len(self._users), "searches": self._searches, "refreshes": self._refreshes}
+
+user_directory = UserDirectory()
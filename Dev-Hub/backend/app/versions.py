@@ -0,0 +1,85 @@
+import logging
+import os
+import zlib
+from sqlalchemy import column, select, table, text
+from sqlalchemy.exc import OperationalError
+from .cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+PROJECT_CACHE_SIZE = int(os.getenv("PROJECT_CACHE_SIZE", "1024"))
+
+# One counter per project, bumped by triggers on every write to the project
+# row, its tasks, its members and its documentation. Counters outlive the
+# project so a reused id never repeats a version an old client has cached.
+_BUMP = """INSERT INTO project_versions(project_id, version)
+        SELECT {ref}.{col}, 1 WHERE {ref}.{col} IS NOT NULL
+        ON CONFLICT(project_id) DO UPDATE SET version = version + 1;"""
+
+def _bump_triggers(table_name, col):
+    ddl = []
+    for event, refs in (("INSERT", ("new",)), ("UPDATE", ("old", "new")), ("DELETE", ("old",))):
+        body = "\n        ".join(_BUMP.format(ref=ref, col=col) for ref in refs)
+        ddl.append(f"""CREATE TRIGGER IF NOT EXISTS {table_name}_version_{event.lower()}
+    AFTER {event} ON {table_name} BEGIN
+        {body}
+    END""")
+    return ddl
+
+VERSION_DDL = [
+    """CREATE TABLE IF NOT EXISTS project_versions (
+        project_id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )""",
+    *_bump_triggers("projects", "id"),
+    *_bump_triggers("tasks", "project_id"),
+    *_bump_triggers("project_members", "project_id"),
+    *_bump_triggers("documentation", "project_id"),
+]
+
+project_versions = table("project_versions", column("project_id"), column("version"))
+
+# Serialized project detail bodies keyed by (project_id, version, variant);
+# a bump makes older entries unreachable and the LRU ages them out
+project_cache = LRUCache(PROJECT_CACHE_SIZE)
+
+versions_enabled = False
+
+def create_version_triggers(engine):
+    """Create the project_versions table and the triggers that maintain it"""
+    global versions_enabled
+    if engine.dialect.name != "sqlite":
+        return False
+    try:
+        with engine.begin() as conn:
+            for ddl in VERSION_DDL:
+                conn.execute(text(ddl))
+    except OperationalError as exc:
+        # UPSERT needs SQLite 3.24+; without it project detail is never cached
+        logger.warning("Project versioning unavailable, ETags are disabled: %s", exc)
+        return False
+    versions_enabled = True
+    return True
+
+async def get_version(db, project_id: int) -> int:
+    """Current version of a project, 0 if it has never been written"""
+    version = await db.scalar(
+        select(project_versions.c.version).where(project_versions.c.project_id == project_id)
+    )
+    return version or 0
+
+def make_etag(project_id: int, version: int, variant: str = "") -> str:
+    """Strong ETag of one representation (variant) of a project version"""
+    if not variant:
+        return f'"p{project_id}-v{version}"'
+    return f'"p{project_id}-v{version}-{zlib.crc32(variant.encode()):08x}"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Evaluate an If-None-Match header against a strong ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
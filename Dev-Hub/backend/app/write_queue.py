@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from . import database
+
+logger = logging.getLogger(__name__)
+
+WRITE_QUEUE_WINDOW_MS = float(os.getenv("WRITE_QUEUE_WINDOW_MS", "2"))
+WRITE_QUEUE_MAX_BATCH = int(os.getenv("WRITE_QUEUE_MAX_BATCH", "64"))
+
+class _Write:
+    __slots__ = ("fn", "loop", "future")
+
+    def __init__(self, fn, loop, future):
+        self.fn = fn
+        self.loop = loop
+        self.future = future
+
+    def settle(self, result=None, error=None):
+        def _set():
+            if self.future.done():
+                return
+            if error is not None:
+                self.future.set_exception(error)
+            else:
+                self.future.set_result(result)
+        try:
+            self.loop.call_soon_threadsafe(_set)
+        except RuntimeError:
+            # The requesting event loop is gone; nobody is waiting for the result
+            pass
+
+class GroupCommitQueue:
+    """Single writer thread that commits queued mutations in groups.
+
+    Writes arriving within window_ms of each other (up to max_batch) share
+    one transaction and one fsync. Each caller is answered once its group
+    commits. If any write in a group fails, the group is rolled back and
+    its writes are replayed one transaction each, so an error only reaches
+    the request that caused it; write functions must therefore be safe to
+    run again on a fresh session.
+    """
+
+    def __init__(self, window_ms: float = WRITE_QUEUE_WINDOW_MS, max_batch: int = WRITE_QUEUE_MAX_BATCH):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.groups = 0
+        self.writes = 0
+        self.replayed_groups = 0
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+                self._thread.start()
+
+    async def submit(self, fn):
+        """Queue fn(session) and wait until the group containing it commits"""
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put(_Write(fn, loop, future))
+        return await future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._commit_group(batch)
+            except Exception as exc:  # Keep the writer alive whatever happens
+                logger.exception("Group commit failed")
+                for write in batch:
+                    write.settle(error=exc)
+
+    def _commit_group(self, batch):
+        results = []
+        session = database.SessionLocal()
+        try:
+            for write in batch:
+                results.append(write.fn(session))
+                session.flush()
+            session.commit()
+        except Exception as exc:
+            session.rollback()
+            if len(batch) == 1:
+                batch[0].settle(error=exc)
+            else:
+                self.replayed_groups += 1
+                for write in batch:
+                    self._commit_group([write])
+            return
+        finally:
+            session.close()
+
+        self.groups += 1
+        self.writes += len(batch)
+        for write, result in zip(batch, results):
+            write.settle(result)
+
+    def stats(self):
+        return {
+            "enabled": database.WRITE_QUEUE,
+            "queued": self._queue.qsize(),
+            "groups": self.groups,
+            "writes": self.writes,
+            "replayed_groups": self.replayed_groups,
+            "avg_group_size": self.writes / self.groups if self.groups else 0.0,
+        }
+
+write_queue = GroupCommitQueue()
+
+async def run_write(db, fn):
+    """Apply fn(session) and commit it, through the group-commit queue when enabled.
+
+    fn receives a sync Session, does its writes there and returns whatever
+    the handler needs; anything it returns must be loaded before it returns.
+    """
+    if database.WRITE_QUEUE:
+        return await write_queue.submit(fn)
+    if database.PRODUCTION:
+        # db reads from the reader pool; hold the single writer connection
+        # for this transaction only
+        async with database.session_scope() as writer:
+            result = await writer.run_sync(fn)
+            await writer.commit()
+        # Later reads of the request start a new snapshot that includes the write
+        await db.commit()
+        return result
+    result = await db.run_sync(fn)
+    await db.commit()
+    return result
@@ -0,0 +1,98 @@
+"""Response compression benchmark: bytes on the wire and CPU per request.
+
+Seeds a throwaway database with benchmarks.seed_data, logs in as the user
+owning the most projects and requests typical list pages and a project
+detail once per content coding the server supports, identity included.
+For each it reports the median over --repeat requests of:
+
+- bytes: body size on the wire
+- cpu_ms: process CPU time of the whole request, client included, so
+  compare it against identity rather than read it on its own
+- compress_ms: the compress phase from Server-Timing
+
+The project detail is versioned (ETag), so after the first request its
+compressed body comes from the cache; project_detail_uncached clears the
+cache before every request to show the cost without it.
+
+    python -m benchmarks.compression --repeat 20
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import tempfile
+import time
+
+_COMPRESS_PHASE = re.compile(r"compress;dur=([\d.]+)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--projects", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+    tmp = tempfile.TemporaryDirectory()
+    path = os.path.join(tmp.name, "bench.db")
+    from benchmarks.seed_data import PASSWORD, seed
+    seed(path, args.users, args.projects, tasks_median=30, docs_median=5)
+    from fastapi.testclient import TestClient
+    from sqlalchemy import func, select
+    from app import compression, database, models
+    from main import app
+
+    with database.engine.connect() as conn:
+        owner = conn.scalar(
+            select(models.Project.owner_id).group_by(models.Project.owner_id).order_by(func.count().desc()).limit(1)
+        )
+        project_id = conn.scalar(
+            select(models.Task.project_id).group_by(models.Task.project_id).order_by(func.count().desc()).limit(1)
+        )
+    project_owner = None
+    with database.engine.connect() as conn:
+        project_owner = conn.scalar(select(models.Project.owner_id).where(models.Project.id == project_id))
+
+    codings = ["identity", *compression.CODINGS]
+    report = {"codings": codings}
+    with TestClient(app) as client:
+        def login(user_id):
+            response = client.post("/auth/token", data={"username": f"user{user_id}", "password": PASSWORD})
+            return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        headers = login(owner)
+        cases = [
+            (f"tasks_{limit}", "/tasks/", {"limit": limit}, headers, False) for limit in (20, 100, 1000)
+        ] + [
+            (f"documentation_{limit}", "/documentation/", {"limit": limit}, headers, False) for limit in (20, 100)
+        ] + [
+            ("project_detail", f"/projects/{project_id}", {}, login(project_owner), False),
+            ("project_detail_uncached", f"/projects/{project_id}", {}, login(project_owner), True),
+        ]
+        for name, url, params, auth_headers, clear_cache in cases:
+            results = {}
+            for coding in codings:
+                request_headers = {**auth_headers, "Accept-Encoding": coding}
+                client.get(url, params=params, headers=request_headers)  # warm caches
+                sizes, cpu, compress = [], [], []
+                for _ in range(args.repeat):
+                    if clear_cache:
+                        compression.compressed_cache.clear()
+                    started = time.process_time()
+                    with client.stream("GET", url, params=params, headers=request_headers) as response:
+                        body = b"".join(response.iter_raw())
+                    cpu.append(time.process_time() - started)
+                    sizes.append(len(body))
+                    match = _COMPRESS_PHASE.search(response.headers.get("server-timing", ""))
+                    compress.append(float(match.group(1)) if match else 0.0)
+                results[coding] = {
+                    "bytes": int(statistics.median(sizes)),
+                    "cpu_ms": round(statistics.median(cpu) * 1000, 2),
+                    "compress_ms": round(statistics.median(compress), 2),
+                }
+            report[name] = results
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
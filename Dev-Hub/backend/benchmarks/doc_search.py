@@ -0,0 +1,122 @@
+"""Documentation search benchmark: FTS5 index vs. the LIKE scan.
+
+Seeds a throwaway SQLite database per corpus size and times the statement
+GET /documentation/?search= runs, once through the FTS5 index and once
+through the old title/content ILIKE filter, both for the full result set
+and for a first page of --limit rows.
+
+    python -m benchmarks.doc_search --sizes 10000 1000000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session, joinedload
+from app import doc_storage, models, search
+
+def make_vocabulary(rng, size=5000):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choices(letters, k=rng.randint(3, 10))) for _ in range(size)]
+
+def seed(engine, docs, words_per_doc, rng):
+    vocabulary = make_vocabulary(rng)
+    # Zipf-like weights so a few words are common and most are rare
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [{
+            "id": 1, "email": "bench@example.com", "username": "bench",
+            "hashed_password": "x", "created_at": now,
+        }])
+        conn.execute(insert(models.Project), [
+            {"id": pid, "name": f"project {pid}", "owner_id": 1, "created_at": now, "updated_at": now}
+            for pid in range(1, 101)
+        ])
+        batch = []
+        for doc_id in range(1, docs + 1):
+            words = rng.choices(vocabulary, weights, k=rng.randint(words_per_doc // 2, words_per_doc * 2))
+            batch.append({
+                "id": doc_id,
+                "title": " ".join(words[:6]),
+                "content": " ".join(words),
+                "doc_type": models.DocumentationType.MARKDOWN,
+                "author_id": 1,
+                "project_id": rng.randint(1, 100),
+                "created_at": now,
+                "updated_at": now,
+            })
+            if len(batch) == 10000:
+                conn.execute(insert(models.Documentation), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(models.Documentation), batch)
+    return vocabulary
+
+def time_query(engine, term, use_fts, repeat, limit=None):
+    search.fts_enabled = use_fts
+    query = select(models.Documentation).where(models.Documentation.project_id.in_(range(1, 101)))
+    query = search.apply_search(query, term).options(joinedload(models.Documentation.author)).limit(limit)
+    timings = []
+    rows = 0
+    with Session(engine) as session:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rows = len(session.execute(query).all())
+            timings.append((time.perf_counter() - start) * 1000)
+            session.expunge_all()
+    search.fts_enabled = True
+    return {
+        "rows": rows,
+        "median_ms": round(statistics.median(timings), 3),
+        "max_ms": round(max(timings), 3),
+    }
+
+def run(size, words_per_doc, repeat, limit, rng):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        # The search index triggers read bodies through doc_text()
+        doc_storage.install(engine)
+        models.Base.metadata.create_all(bind=engine)
+        search.create_search_index(engine)
+        start = time.perf_counter()
+        vocabulary = seed(engine, size, words_per_doc, rng)
+        seed_seconds = time.perf_counter() - start
+
+        terms = {
+            "common": vocabulary[0],
+            "uncommon": vocabulary[200],
+            "rare": vocabulary[4000],
+            "two_words": f"{vocabulary[10]} {vocabulary[50]}",
+        }
+        results = {}
+        for label, term in terms.items():
+            results[label] = {
+                "term": term,
+                "like": time_query(engine, term, False, repeat),
+                "fts": time_query(engine, term, True, repeat),
+                f"like_first_{limit}": time_query(engine, term, False, repeat, limit),
+                f"fts_first_{limit}": time_query(engine, term, True, repeat, limit),
+            }
+        engine.dispose()
+    return {"docs": size, "seed_seconds": round(seed_seconds, 1), "queries": results}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 1000000])
+    parser.add_argument("--words-per-doc", type=int, default=80)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    report = [run(size, args.words_per_doc, args.repeat, args.limit, rng) for size in args.sizes]
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Change feed load test: thousands of idle SSE subscribers on one worker.
+
+Starts a single uvicorn worker on a throwaway database, opens
+--subscribers streams on GET /events/ for one project and leaves them idle,
+then reports:
+
+- server memory before and after subscribing
+- latency of a regular request with no subscribers and with all of them attached
+- fan-out latency of --events task updates: time from publish until each
+  subscriber has read the event, and until the last one has. All streams
+  are read by this one Python process, so at thousands of subscribers
+  these mostly measure the client parsing every copy
+
+Needs httpx (also used by FastAPI's TestClient).
+
+    python -m benchmarks.event_fanout --subscribers 5000 --events 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _rss_mib(pid):
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    return None
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: round(samples[min(len(samples) - 1, int(q * len(samples)))] * 1000, 2)
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": round(samples[-1] * 1000, 2)}
+
+async def _request_latency(client, url, headers, count=200):
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = await client.get(url, headers=headers)
+        response.raise_for_status()
+        samples.append(time.perf_counter() - start)
+    return _percentiles(samples)
+
+# Subscribers per HTTP client; httpx scans its whole pool on every request,
+# so one client holding thousands of streams would measure itself
+SUBSCRIBERS_PER_CLIENT = 50
+
+async def run(args, base_url, server):
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    stream_clients = [
+        httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits)
+        for _ in range(0, args.subscribers, SUBSCRIBERS_PER_CLIENT)
+    ]
+    async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+        await client.post("/auth/signup", json={"email": "bench@example.com", "username": "bench", "password": "bench"})
+        token = (await client.post("/auth/token", data={"username": "bench", "password": "bench"})).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        project_id = (await client.post("/projects/", json={"name": "bench"}, headers=headers)).json()["id"]
+        task_id = (await client.post("/tasks/", json={"title": "bench", "project_id": project_id}, headers=headers)).json()["id"]
+
+        report = {"subscribers": args.subscribers, "rss_mib_idle": _rss_mib(server.pid)}
+        report["request_latency_no_subscribers"] = await _request_latency(client, f"/tasks/{task_id}", headers)
+
+        received = [dict() for _ in range(args.subscribers)]
+        ready = asyncio.Semaphore(0)
+
+        async def subscriber(index):
+            stream_client = stream_clients[index // SUBSCRIBERS_PER_CLIENT]
+            async with stream_client.stream("GET", "/events/", params={"project_id": project_id}, headers=headers) as response:
+                async for line in response.aiter_lines():
+                    if line.startswith("retry:"):
+                        ready.release()
+                    elif line.startswith("data: "):
+                        event = json.loads(line[6:])
+                        received[index][event["seq"]] = (time.time(), event["at"])
+
+        tasks = [asyncio.create_task(subscriber(index)) for index in range(args.subscribers)]
+        start = time.perf_counter()
+        for _ in range(args.subscribers):
+            await ready.acquire()
+        report["subscribe_seconds"] = round(time.perf_counter() - start, 2)
+        await asyncio.sleep(1)
+        report["rss_mib_subscribed"] = _rss_mib(server.pid)
+        report["request_latency_with_subscribers"] = await _request_latency(client, f"/tasks/{task_id}", headers)
+
+        delivery, fan_out = [], []
+        for number in range(args.events):
+            await client.put(f"/tasks/{task_id}", json={"title": f"update {number}"}, headers=headers)
+            deadline = time.monotonic() + 30
+            while time.monotonic() < deadline and any(len(seen) <= number for seen in received):
+                await asyncio.sleep(0.005)
+        for seq in received[0]:
+            times = [seen[seq] for seen in received if seq in seen]
+            published = times[0][1]
+            delivery += [arrived - published for arrived, _ in times]
+            fan_out.append(max(arrived for arrived, _ in times) - published)
+        report["events"] = args.events
+        report["events_delivered"] = sum(len(seen) for seen in received)
+        report["delivery_latency"] = _percentiles(delivery)
+        report["fan_out_complete"] = {"mean_ms": round(statistics.mean(fan_out) * 1000, 2), **_percentiles(fan_out)}
+        report["hub"] = (await client.get("/events/stats", headers=headers)).json()
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for stream_client in stream_clients:
+            await stream_client.aclose()
+        return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=5000)
+    parser.add_argument("--events", type=int, default=20)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    port = _free_port()
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp.name, 'bench.db')}", BCRYPT_ROUNDS="4")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning",
+         "--backlog", str(args.subscribers + 128)],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(100):
+            try:
+                httpx.get(base_url + "/")
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        print(json.dumps(asyncio.run(run(args, base_url, server)), indent=2))
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    main()
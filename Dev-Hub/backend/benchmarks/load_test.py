@@ -0,0 +1,270 @@
+"""Load test: a weighted request mix at fixed concurrency against local uvicorn.
+
+Seeds a dataset with benchmarks.seed_data (or copies the one given with
+--db, so every run starts from the same data), starts uvicorn on it and
+runs --concurrency virtual users for --warmup + --duration seconds. Each
+virtual user is a seeded account that owns projects. It logs in, then
+loops over requests drawn from MIX: reads of its projects, tasks and
+documents, full-text searches for Zipf-distributed terms, and task and
+document writes in its own projects. Only requests completed after the
+warmup count.
+
+Prints (or writes to --out) JSON with p50/p95/p99/mean/max latency,
+error count and throughput per route and in total, plus the run's
+configuration and commit, so two runs can be diffed. The server inherits
+the environment, e.g. DB_PROFILE=production or WRITE_QUEUE=1.
+
+Needs httpx (also used by FastAPI's TestClient).
+
+    python -m benchmarks.load_test --concurrency 32 --duration 30 --out before.json
+    python -m benchmarks.load_test --db loadtest.db --mix "POST /auth/token=0,GET /documentation/?search=30"
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+from . import seed_data
+
+# Relative weights of the request mix; override with --mix "route=weight,..."
+MIX = {
+    "POST /auth/token": 2,
+    "GET /projects/": 10,
+    "GET /projects/{project_id}": 10,
+    "GET /tasks/?project_id": 25,
+    "GET /tasks/?limit": 8,
+    "GET /documentation/?search": 10,
+    "POST /tasks/": 12,
+    "PUT /tasks/{task_id}": 12,
+    "DELETE /tasks/{task_id}": 5,
+    "POST /documentation/": 6,
+}
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _summary(samples, errors, seconds):
+    samples = sorted(samples)
+    pick = lambda q: round(samples[min(len(samples) - 1, int(q * len(samples)))] * 1000, 2)
+    return {
+        "count": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(samples) / seconds, 1),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 2),
+        "max_ms": round(samples[-1] * 1000, 2),
+    } if samples else {"count": 0, "errors": errors}
+
+def _roster(path):
+    """Users owning at least one project, with their owned and accessible project ids"""
+    conn = sqlite3.connect(path)
+    owned, accessible = {}, {}
+    for project_id, owner_id in conn.execute("SELECT id, owner_id FROM projects ORDER BY id"):
+        owned.setdefault(owner_id, []).append(project_id)
+        accessible.setdefault(owner_id, []).append(project_id)
+    for project_id, user_id in conn.execute("SELECT project_id, user_id FROM project_members ORDER BY project_id, user_id"):
+        accessible.setdefault(user_id, []).append(project_id)
+    conn.close()
+    return [(user_id, owned[user_id], accessible[user_id]) for user_id in sorted(owned)]
+
+class VirtualUser:
+    def __init__(self, client, rng, user_id, owned, accessible, terms, stats):
+        self.client = client
+        self.rng = rng
+        self.username = f"user{user_id}"
+        self.owned = owned
+        self.accessible = accessible
+        self.terms = terms
+        self.stats = stats
+        self.headers = {}
+        self.created = []  # ids of tasks this user created and has not deleted
+
+    async def login(self):
+        response = await self.client.post("/auth/token", data={"username": self.username, "password": seed_data.PASSWORD})
+        response.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        return response
+
+    async def request(self, route):
+        rng, client, headers = self.rng, self.client, self.headers
+        if route == "POST /auth/token":
+            return await self.login()
+        if route == "GET /projects/":
+            return await client.get("/projects/", headers=headers)
+        if route == "GET /projects/{project_id}":
+            return await client.get(f"/projects/{rng.choice(self.accessible)}", headers=headers)
+        if route == "GET /tasks/?project_id":
+            return await client.get("/tasks/", params={"project_id": rng.choice(self.accessible)}, headers=headers)
+        if route == "GET /tasks/?limit":
+            return await client.get("/tasks/", params={"limit": 50}, headers=headers)
+        if route == "GET /documentation/?search":
+            return await client.get("/documentation/", params={"search": rng.choice(self.terms)}, headers=headers)
+        if route == "POST /tasks/":
+            response = await client.post("/tasks/", json={
+                "title": f"load test task {rng.randrange(10 ** 6)}", "project_id": rng.choice(self.owned),
+                "description": "created by the load test", "priority": rng.choice(seed_data.PRIORITIES),
+            }, headers=headers)
+            if response.status_code == 200:
+                self.created.append(response.json()["id"])
+            return response
+        if route == "PUT /tasks/{task_id}":
+            return await client.put(f"/tasks/{rng.choice(self.created)}", json={
+                "status": rng.choice(seed_data.STATUSES), "priority": rng.choice(seed_data.PRIORITIES),
+            }, headers=headers)
+        if route == "DELETE /tasks/{task_id}":
+            return await client.delete(f"/tasks/{self.created.pop(rng.randrange(len(self.created)))}", headers=headers)
+        if route == "POST /documentation/":
+            return await client.post("/documentation/", json={
+                "title": f"load test doc {rng.randrange(10 ** 6)}", "doc_type": "markdown",
+                "content": " ".join(rng.choices(self.terms, k=rng.randint(50, 400))),
+                "project_id": rng.choice(self.owned),
+            }, headers=headers)
+        raise ValueError(f"Unknown route {route!r}")
+
+    async def run(self, mix, measure_from, until):
+        routes, weights = zip(*mix.items())
+        while time.monotonic() < until:
+            route = self.rng.choices(routes, weights)[0]
+            if route in ("PUT /tasks/{task_id}", "DELETE /tasks/{task_id}") and not self.created:
+                route = "POST /tasks/"  # Nothing of its own to change yet
+            start = time.monotonic()
+            try:
+                response = await self.request(route)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            end = time.monotonic()
+            if measure_from <= start and end <= until:
+                samples, errors = self.stats.setdefault(route, ([], [0]))
+                samples.append(end - start)
+                errors[0] += failed
+
+async def run(args, base_url, roster, terms):
+    mix = dict(MIX)
+    for item in filter(None, (args.mix or "").split(",")):
+        route, _, weight = item.rpartition("=")
+        if route not in MIX:
+            raise SystemExit(f"Unknown route in --mix: {route!r}; choose from {', '.join(MIX)}")
+        mix[route] = float(weight)
+    mix = {route: weight for route, weight in mix.items() if weight > 0}
+
+    rng = random.Random(args.seed)
+    stats = {}
+    clients = [httpx.AsyncClient(base_url=base_url, timeout=60) for _ in range(args.concurrency)]
+    users = [
+        VirtualUser(client, random.Random(args.seed * 1000 + index), *rng.choice(roster), terms, stats)
+        for index, client in enumerate(clients)
+    ]
+    await asyncio.gather(*(user.login() for user in users))
+
+    start = time.monotonic()
+    measure_from = start + args.warmup
+    until = measure_from + args.duration
+    await asyncio.gather(*(user.run(mix, measure_from, until) for user in users))
+    for client in clients:
+        await client.aclose()
+
+    routes = {route: _summary(samples, errors[0], args.duration) for route, (samples, errors) in sorted(stats.items())}
+    every = [sample for samples, _ in stats.values() for sample in samples]
+    total = _summary(every, sum(errors[0] for _, errors in stats.values()), args.duration)
+    return mix, routes, total
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="Seeded database to copy instead of seeding a new one")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--projects", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds before measuring starts")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--mix", help='Override weights, e.g. "POST /auth/token=0,GET /projects/=20"')
+    parser.add_argument("--out", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    path = os.path.join(tmp.name, "load.db")
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}")
+    if args.db:
+        # Through the backup API, so a seeded file in WAL mode copies whole
+        source, target = sqlite3.connect(args.db), sqlite3.connect(path)
+        source.backup(target)
+        source.close()
+        target.close()
+    else:
+        # In a child process: seeding configures the app's engines for its own file
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.seed_data", path, "--users", str(args.users),
+             "--projects", str(args.projects), "--seed", str(args.seed)],
+            cwd=backend, env=env, check=True, stdout=subprocess.DEVNULL,
+        )
+    roster = _roster(path)
+    terms = seed_data.vocabulary(random.Random(args.seed))[:1000]
+    conn = sqlite3.connect(path)
+    dataset = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+               for table in ("users", "projects", "project_members", "tasks", "documentation")}
+    conn.close()
+
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning",
+         "--workers", str(args.workers)],
+        cwd=backend, env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(300):
+            try:
+                httpx.get(base_url + "/")
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        mix, routes, total = asyncio.run(run(args, base_url, roster, terms))
+    finally:
+        server.terminate()
+        server.wait()
+
+    report = {
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "config": {
+            "concurrency": args.concurrency, "duration": args.duration, "warmup": args.warmup,
+            "workers": args.workers, "seed": args.seed,
+            **{name: os.environ.get(name) for name in ("DB_PROFILE", "ASYNC_DB", "WRITE_QUEUE", "BCRYPT_ROUNDS")},
+        },
+        "dataset": dataset,
+        "mix": mix,
+        "routes": routes,
+        "total": total,
+    }
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as out:
+            out.write(output + "\n")
+    else:
+        print(output)
+    tmp.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""Query-plan regression check: no full table scans behind any route.
+
+Seeds a throwaway SQLite database, calls every route of the app through
+TestClient while recording each SQL statement issued, then runs EXPLAIN
+QUERY PLAN on every distinct statement and fails if a plan scans a table
+instead of searching an index. A route that is not exercised fails the
+check as well, so new endpoints have to be added to _calls below.
+
+Exits 1 on failure; -v prints every plan.
+
+    python -m benchmarks.query_plans
+"""
+import argparse
+import asyncio
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime
+
+# Tables small enough by construction that scanning them is fine
+SMALL_TABLES = {"sync_state"}
+
+# SCAN <table> [AS alias] [USING ...]; searches, virtual table lookups and
+# temp b-trees for ORDER BY are fine, as are scans of constant rows and
+# subquery results, which are not tables
+_SCAN = re.compile(r"^SCAN (\w+)\b(?! VIRTUAL TABLE)")
+_PLANNED = ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT")
+
+def _seed(engine, models, users, projects, tasks_per_project, docs_per_project):
+    from sqlalchemy import insert, select
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"email": f"seed{i}@example.com", "username": f"seed{i}", "hashed_password": "x", "created_at": now}
+            for i in range(users)
+        ])
+        # Spread ownership and membership over every user, the ones the checks log in as included
+        user_ids = conn.execute(select(models.User.id)).scalars().all()
+        project_ids = []
+        for i in range(projects):
+            project_ids.append(conn.execute(insert(models.Project).values(
+                name=f"seed {i}", owner_id=user_ids[i % len(user_ids)], created_at=now, updated_at=now,
+            )).inserted_primary_key[0])
+        conn.execute(insert(models.project_members), [
+            {"project_id": pid, "user_id": user_ids[(i + 1) % len(user_ids)], "role": models.UserRole.MEMBER}
+            for i, pid in enumerate(project_ids)
+        ])
+        conn.execute(insert(models.Task), [
+            {"title": f"task {n}", "status": ("pending", "in_progress", "completed")[n % 3],
+             "priority": ("low", "medium", "high")[n % 3 - 1], "assignee_id": user_ids[(i + n) % len(user_ids)],
+             "project_id": pid, "created_at": now, "updated_at": now}
+            for i, pid in enumerate(project_ids) for n in range(tasks_per_project)
+        ])
+        conn.execute(insert(models.Documentation), [
+            {"title": f"doc {n}", "content": "seed document " * 20, "doc_type": models.DocumentationType.MARKDOWN,
+             "author_id": user_ids[0], "project_id": pid, "created_at": now, "updated_at": now}
+            for pid in project_ids for n in range(docs_per_project)
+        ])
+
+async def _first_chunk(app, path, query, headers=()):
+    """Call a streaming route and disconnect after its first chunk"""
+    sent = asyncio.Event()
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await sent.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200, message
+        elif message["type"] == "http.response.body" and message.get("body"):
+            sent.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": query.encode(), "root_path": "",
+        "headers": [(b"host", b"testserver"), *headers], "client": ("127.0.0.1", 1), "server": ("testserver", 80),
+    }
+    await asyncio.wait_for(app(scope, receive, send), 10)
+
+def _calls(client, app, token, other_token, other_id):
+    """Yield (route label, thunk) for every route; ids come from earlier responses"""
+    H = {"Authorization": f"Bearer {token}"}
+    HO = {"Authorization": f"Bearer {other_token}"}
+    state = {}
+
+    def check(response, code=200):
+        assert response.status_code == code, (response.request.method, response.request.url, response.status_code, response.text)
+        return response.json()
+
+    def create_project():
+        state["project"] = check(client.post("/projects/", json={"name": "plans"}, headers=H))["id"]
+
+    def create_task():
+        state["task"] = check(client.post("/tasks/", json={"title": "plans", "project_id": state["project"]}, headers=H))["id"]
+
+    def create_doc():
+        state["doc"] = check(client.post("/documentation/", json={
+            "title": "plans", "content": "query plans", "doc_type": "markdown",
+            "project_id": state["project"], "task_id": state["task"],
+        }, headers=H))["id"]
+
+    def bulk_create():
+        results = check(client.post("/tasks/bulk", json={"items": [
+            {"title": f"bulk {n}", "project_id": state["project"]} for n in range(3)
+        ]}, headers=H))["results"]
+        state["bulk"] = [result["id"] for result in results]
+
+    def sync_since():
+        cursor = check(client.get("/sync/", headers=H))["cursor"]
+        check(client.put(f"/tasks/{state['task']}", json={"status": "completed"}, headers=H))
+        check(client.get("/sync/", params={"since": cursor}, headers=H))
+
+    def first_page_then_next(path, **params):
+        def call():
+            response = client.get(path, params={"limit": 2, **params}, headers=H)
+            check(response)
+            check(client.get(path, params={"limit": 2, "cursor": response.headers["X-Next-Cursor"], **params}, headers=H))
+        return call
+
+    yield "GET /", lambda: check(client.get("/"))
+    yield "GET /auth/me", lambda: check(client.get("/auth/me", headers=H))
+    yield "GET /auth/cache-stats", lambda: check(client.get("/auth/cache-stats", headers=H))
+    yield "POST /auth/refresh", lambda: check(client.post("/auth/refresh", headers=H))
+    yield "POST /projects/", create_project
+    yield "POST /projects/{project_id}/members", lambda: check(client.post(
+        f"/projects/{state['project']}/members", json={"user_id": other_id, "role": "member"}, headers=H))
+    yield "POST /tasks/", create_task
+    yield "POST /documentation/", create_doc
+    yield "POST /tasks/bulk", bulk_create
+    yield "GET /projects/", lambda: check(client.get("/projects/", headers=H))
+    yield "GET /projects/", first_page_then_next("/projects/")
+    yield "GET /projects/stats", lambda: check(client.get("/projects/stats", headers=H))
+    yield "GET /dashboard", lambda: check(client.get("/dashboard", headers=H))
+    yield "GET /users/search", lambda: check(client.get("/users/search", params={
+        "q": "seed1", "exclude_project_id": state["project"]}, headers=H))
+    yield "GET /projects/{project_id}", lambda: check(client.get(
+        f"/projects/{state['project']}", params={"include": "members,tasks"}, headers=H))
+    yield "GET /projects/{project_id}", lambda: check(client.get(f"/projects/{state['project']}", headers=HO))
+    yield "GET /projects/{project_id}/stats", lambda: check(client.get(f"/projects/{state['project']}/stats", headers=H))
+    yield "PUT /projects/{project_id}", lambda: check(client.put(
+        f"/projects/{state['project']}", json={"description": "plans"}, headers=H))
+    yield "GET /tasks/", lambda: check(client.get("/tasks/", headers=H))
+    yield "GET /tasks/", lambda: check(client.get("/tasks/", params={"project_id": state["project"]}, headers=H))
+    yield "GET /tasks/", first_page_then_next("/tasks/", project_id=state.get("project", 0))
+    yield "GET /tasks/", lambda: check(client.get("/tasks/", params={
+        "status": ["pending", "in_progress"], "priority": ["high", "medium"], "assignee_id": [1, 2],
+        "created_after": "2000-01-01T00:00:00", "updated_before": "2100-01-01T00:00:00"}, headers=H))
+    for sort in ("priority", "created_at", "updated_at"):
+        yield "GET /tasks/", first_page_then_next("/tasks/", project_id=state.get("project", 0), sort=sort)
+    yield "GET /tasks/mine", lambda: check(client.get("/tasks/mine", params={"status": "pending"}, headers=H))
+    for sort in ("priority", "created_at", "updated_at"):
+        yield "GET /tasks/mine", first_page_then_next("/tasks/mine", sort=sort)
+    yield "GET /tasks/{task_id}", lambda: check(client.get(f"/tasks/{state['task']}", headers=H))
+    yield "PUT /tasks/{task_id}", lambda: check(client.put(f"/tasks/{state['task']}", json={"priority": "high"}, headers=H))
+    yield "PATCH /tasks/bulk", lambda: check(client.patch("/tasks/bulk", json={"items": [
+        {"id": task_id, "status": "in_progress"} for task_id in state["bulk"]]}, headers=H))
+    yield "GET /documentation/", lambda: check(client.get("/documentation/", headers=H))
+    yield "GET /documentation/", lambda: check(client.get("/documentation/", params={
+        "project_id": state["project"], "doc_type": "markdown"}, headers=H))
+    yield "GET /documentation/", lambda: check(client.get("/documentation/", params={"task_id": state["task"]}, headers=H))
+    yield "GET /documentation/", lambda: check(client.get("/documentation/", params={"search": "plans"}, headers=H))
+    yield "GET /documentation/", first_page_then_next("/documentation/")
+    yield "GET /documentation/{documentation_id}", lambda: check(client.get(f"/documentation/{state['doc']}", headers=H))
+    yield "GET /documentation/{documentation_id}/content", lambda: client.get(
+        f"/documentation/{state['doc']}/content", headers={**H, "Range": "bytes=0-4"}).raise_for_status()
+    yield "PUT /documentation/{documentation_id}", lambda: check(client.put(
+        f"/documentation/{state['doc']}", json={"title": "plans 2"}, headers=H))
+    def stream_ticket():
+        state["ticket"] = check(client.post("/events/ticket", headers=H))["ticket"]
+
+    yield "GET /events/", lambda: asyncio.run(_first_chunk(app, "/events/", "", [(b"authorization", f"Bearer {token}".encode())]))
+    yield "POST /events/ticket", stream_ticket
+    yield "GET /events/", lambda: asyncio.run(_first_chunk(
+        app, "/events/", f"ticket={state['ticket']}&project_id={state['project']}"))
+    yield "GET /metrics", lambda: client.get("/metrics").raise_for_status()
+    yield "GET /events/stats", lambda: check(client.get("/events/stats", headers=H))
+    yield "GET /sync/", sync_since
+    yield "DELETE /documentation/{documentation_id}", lambda: check(client.delete(f"/documentation/{state['doc']}", headers=H))
+    yield "DELETE /tasks/bulk", lambda: check(client.request("DELETE", "/tasks/bulk", json={"ids": state["bulk"]}, headers=H))
+    yield "DELETE /tasks/{task_id}", lambda: check(client.delete(f"/tasks/{state['task']}", headers=H))
+    yield "DELETE /projects/{project_id}", lambda: check(client.delete(f"/projects/{state['project']}", headers=H))
+
+def exercise_routes(client, app, database, models, projects=200, tasks=50, docs=10):
+    """Seed the app's database and call every route through client.
+
+    Returns ({statement: (parameters, route labels)}, labels of the routes
+    called, labels of the routes not called).
+    """
+    from fastapi.routing import APIRoute
+    from sqlalchemy import event
+
+    statements = {}  # statement -> (parameters, set of route labels)
+    current = [None]
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if current[0] and not executemany and statement.lstrip().upper().startswith(_PLANNED):
+            statements.setdefault(statement, (parameters, set()))[1].add(current[0])
+
+    engines = {database.engine, database.reader_engine,
+               database.async_engine.sync_engine, database.async_reader_engine.sync_engine}
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", record)
+
+    routes = {f"{method} {route.path}" for route in app.routes if isinstance(route, APIRoute) for method in route.methods}
+    called = set()
+    try:
+        tokens = []
+        for username in ("plans", "other"):
+            current[0] = "POST /auth/signup"
+            client.post("/auth/signup", json={"email": f"{username}@example.com", "username": username, "password": "plans"})
+            current[0] = "POST /auth/token"
+            tokens.append(client.post("/auth/token", data={"username": username, "password": "plans"}).json()["access_token"])
+        called.update(("POST /auth/signup", "POST /auth/token"))
+        current[0] = None
+        other_id = client.get("/auth/me", headers={"Authorization": f"Bearer {tokens[1]}"}).json()["id"]
+        _seed(database.engine, models, 20, projects, tasks, docs)
+        for label, call in _calls(client, app, *tokens, other_id):
+            current[0] = label
+            call()
+            called.add(label)
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", record)
+    return statements, called, sorted(routes - called)
+
+def plans(path, statements):
+    """Yield (statement, route labels, plan lines, full scans) for every recorded statement"""
+    from app import doc_storage
+    conn = sqlite3.connect(path)
+    doc_storage.register_functions(conn)  # Plans of documentation writes include its triggers
+    try:
+        tables = {name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")} - SMALL_TABLES
+        for statement, (parameters, labels) in statements.items():
+            plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + statement, parameters or ())]
+            scans = [line for line in plan if (match := _SCAN.match(line)) and match.group(1) in tables]
+            yield statement, labels, plan, scans
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--projects", type=int, default=200)
+    parser.add_argument("--tasks", type=int, default=50, help="Tasks per seeded project")
+    parser.add_argument("--docs", type=int, default=10, help="Documents per seeded project")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print every plan")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    path = os.path.join(tmp.name, "plans.db")
+    # The engines are configured at import time, so point them at the scratch file first
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+    os.environ.setdefault("TOKEN_ROLE_CLAIMS", "1")
+    from fastapi.testclient import TestClient
+    from app import database, models
+    from main import app
+
+    with TestClient(app) as client:
+        statements, called, missing = exercise_routes(client, app, database, models, args.projects, args.tasks, args.docs)
+
+    failures = []
+    for statement, labels, plan, scans in plans(path, statements):
+        if scans or args.verbose:
+            print(f"{'FULL SCAN' if scans else 'ok'} in {', '.join(sorted(labels))}\n  {' '.join(statement.split())}")
+            for line in plan:
+                print(f"    {line}")
+        if scans:
+            failures.append(statement)
+
+    for label in missing:
+        print(f"NOT EXERCISED {label}")
+    print(f"{len(statements)} statements from {len(called)} routes, {len(failures)} with full scans")
+    sys.exit(1 if failures or missing else 0)
+
+if __name__ == "__main__":
+    main()
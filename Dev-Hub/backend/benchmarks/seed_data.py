@@ -0,0 +1,186 @@
+"""Seed a SQLite file with a reproducible, realistically shaped dataset.
+
+Creates the schema exactly as the app does at startup (tables, indexes,
+search index and counter triggers), then bulk inserts:
+
+- --users users, all with the password "loadtest" (user{n} / user{n}@example.com)
+- --projects projects with owners drawn from a long-tailed distribution,
+  so a few users own many projects and most own one or none
+- memberships: a geometric number of extra members per project
+- tasks per project from a log-normal distribution (median --tasks-median)
+- documents per project likewise (median --docs-median), with log-normal
+  content lengths from a few hundred bytes to tens of KB, in a mix of
+  markdown, code snippets and links
+
+Text is drawn from a Zipf-distributed vocabulary, so search terms range
+from very common to rare. The same --seed always yields the same data.
+The password is hashed with BCRYPT_ROUNDS like the app does; set it to
+the value the server will run with, or logins rehash on first use.
+
+    python -m benchmarks.seed_data loadtest.db --users 1000 --projects 2000
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+PASSWORD = "loadtest"
+
+VOCABULARY_SIZE = 5000
+_SYLLABLES = ["ka", "lo", "mi", "ren", "sto", "va", "qui", "bel", "dor", "fen", "gal", "hu", "jor", "nix", "pra", "tes"]
+# Frequent real words so search terms also include stopword-like hits
+_COMMON = ["the", "api", "service", "user", "project", "task", "error", "config", "deploy", "test",
+           "database", "index", "query", "cache", "release", "login", "build", "review", "design", "fix"]
+_LANGUAGES = ["python", "javascript", "typescript", "go", "sql", "bash"]
+STATUSES = ["pending", "in_progress", "completed"]
+PRIORITIES = ["low", "medium", "high"]
+
+def vocabulary(rng: random.Random, size: int = VOCABULARY_SIZE):
+    words = list(_COMMON)
+    seen = set(words)
+    while len(words) < size:
+        word = "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+class Text:
+    """Zipf-weighted word sampler"""
+
+    def __init__(self, rng: random.Random, words):
+        self.rng = rng
+        self.words = words
+        self.weights = list(itertools.accumulate(1 / rank for rank in range(1, len(words) + 1)))
+
+    def pick(self, count: int):
+        return self.rng.choices(self.words, cum_weights=self.weights, k=count)
+
+    def sentence(self, low: int, high: int) -> str:
+        return " ".join(self.pick(self.rng.randint(low, high))).capitalize()
+
+    def body(self, length: int) -> str:
+        """Roughly length characters of sentences and paragraphs"""
+        parts, size = [], 0
+        while size < length:
+            sentence = self.sentence(6, 18) + ("." if self.rng.random() < 0.85 else ".\n\n")
+            parts.append(sentence)
+            size += len(sentence) + 1
+        return " ".join(parts)[:length]
+
+def _lognormal_int(rng, median, sigma, low=0, high=None):
+    value = int(rng.lognormvariate(math.log(median), sigma))
+    value = max(low, value)
+    return min(value, high) if high is not None else value
+
+def seed(path: str, users: int, projects: int, tasks_median: float, docs_median: float, seed: int = 1):
+    """Create and fill the database at path; returns a summary of what was inserted"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    from sqlalchemy import insert
+    from app import database, models
+    from app.passwords import hash_password
+    import main  # noqa: F401 - creates the schema, indexes and triggers
+
+    rng = random.Random(seed)
+    text = Text(rng, vocabulary(rng))
+    now = datetime.utcnow()
+    ago = lambda days: now - timedelta(seconds=rng.uniform(0, days * 86400))
+    hashed = hash_password(PASSWORD)
+    counts = {"users": users, "projects": projects, "memberships": 0, "tasks": 0, "documentation": 0}
+
+    with database.engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"id": n, "email": f"user{n}@example.com", "username": f"user{n}", "hashed_password": hashed,
+             "created_at": ago(365)}
+            for n in range(1, users + 1)
+        ])
+
+        # Owners follow a Pareto-like tail: low user ids own most projects
+        owner_weights = [1 / n ** 1.1 for n in range(1, users + 1)]
+        owners = rng.choices(range(1, users + 1), weights=owner_weights, k=projects)
+        project_rows, member_rows = [], []
+        people = {}  # project_id -> owner and members, for assignees and authors
+        for pid, owner in enumerate(owners, start=1):
+            created = ago(365)
+            project_rows.append({
+                "id": pid, "name": text.sentence(1, 4), "owner_id": owner, "created_at": created,
+                "updated_at": created + (now - created) * rng.random(),
+                "description": text.body(_lognormal_int(rng, 120, 0.8, 0, 2000)) or None,
+            })
+            members = set()
+            while rng.random() < 0.7 and len(members) < users - 1:
+                member = rng.randint(1, users)
+                if member != owner:
+                    members.add(member)
+            people[pid] = [owner, *sorted(members)]
+            for member in sorted(members):
+                member_rows.append({
+                    "project_id": pid, "user_id": member,
+                    "role": rng.choices(list(models.UserRole), weights=[1, 6, 3])[0],
+                })
+        conn.execute(insert(models.Project), project_rows)
+        if member_rows:
+            conn.execute(insert(models.project_members), member_rows)
+        counts["memberships"] = len(member_rows)
+
+        for pid in range(1, projects + 1):
+            task_rows = []
+            for _ in range(_lognormal_int(rng, tasks_median, 1.0, 0, 5000)):
+                created = ago(180)
+                task_rows.append({
+                    "title": text.sentence(3, 10), "project_id": pid,
+                    "description": text.body(_lognormal_int(rng, 200, 1.0, 0, 8000)) or None,
+                    "status": rng.choices(STATUSES, weights=[3, 2, 5])[0],
+                    "priority": rng.choices(PRIORITIES, weights=[3, 5, 2])[0],
+                    "assignee_id": rng.choice(people[pid]) if rng.random() < 0.7 else None,
+                    "created_at": created, "updated_at": created + (now - created) * rng.random(),
+                })
+            if task_rows:
+                conn.execute(insert(models.Task), task_rows)
+                counts["tasks"] += len(task_rows)
+
+            doc_rows = []
+            for _ in range(_lognormal_int(rng, docs_median, 1.0, 0, 1000)):
+                doc_type = rng.choices(list(models.DocumentationType), weights=[7, 1, 2])[0]
+                created = ago(365)
+                row = {
+                    "title": text.sentence(2, 8), "doc_type": doc_type, "project_id": pid,
+                    "author_id": rng.choice(people[pid]),
+                    "content": text.body(_lognormal_int(rng, 2000, 1.1, 50, 100_000)),
+                    "language": None, "url": None,
+                    "created_at": created, "updated_at": created + (now - created) * rng.random(),
+                }
+                if doc_type == models.DocumentationType.CODE_SNIPPET:
+                    row["language"] = rng.choice(_LANGUAGES)
+                elif doc_type == models.DocumentationType.LINK:
+                    row["url"] = f"https://docs.example.com/{'/'.join(text.pick(3))}"
+                    row["content"] = text.sentence(5, 30)
+                doc_rows.append(row)
+            if doc_rows:
+                conn.execute(insert(models.Documentation), doc_rows)
+                counts["documentation"] += len(doc_rows)
+    database.engine.dispose()
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="SQLite file to create; must not exist")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--projects", type=int, default=2000)
+    parser.add_argument("--tasks-median", type=float, default=30, help="Median tasks per project")
+    parser.add_argument("--docs-median", type=float, default=5, help="Median documents per project")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if os.path.exists(args.path):
+        parser.error(f"{args.path} exists")
+    start = time.perf_counter()
+    counts = seed(os.path.abspath(args.path), args.users, args.projects, args.tasks_median, args.docs_median, args.seed)
+    print(json.dumps({**counts, "seconds": round(time.perf_counter() - start, 1)}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""List serialization benchmark: ORM + Pydantic + json vs. column projection + orjson.
+
+Seeds a throwaway SQLite database with --rows projects, tasks and
+documents, then times building the JSON body of a full list three ways,
+query included:
+
+- orm_pydantic: ORM objects validated into the response model and encoded
+  with the stdlib json module, as response_model + JSONResponse did
+- type_adapter: the same ORM objects through a precompiled TypeAdapter
+  straight to JSON bytes
+- projection_orjson: plain column rows turned into dicts and encoded with
+  orjson, as the list endpoints now do
+
+    python -m benchmarks.serialization --rows 10000
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from typing import List
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    # The engines are configured at import time, so point them at the scratch file first
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp.name, 'bench.db')}"
+    from pydantic import TypeAdapter
+    from sqlalchemy import insert, select
+    from sqlalchemy.orm import joinedload
+    from app import database, models, schemas
+    from app.serialization import Projection, dumps
+
+    models.Base.metadata.create_all(bind=database.engine)
+    now = datetime.utcnow()
+    with database.engine.begin() as conn:
+        conn.execute(insert(models.User), [{
+            "id": 1, "email": "bench@example.com", "username": "bench", "hashed_password": "x", "created_at": now,
+        }])
+        conn.execute(insert(models.Project), [
+            {"id": i, "name": f"project {i}", "description": "benchmark project", "owner_id": 1,
+             "created_at": now, "updated_at": now}
+            for i in range(1, args.rows + 1)
+        ])
+        conn.execute(insert(models.Task), [
+            {"id": i, "title": f"task {i}", "description": "benchmark task " * 4, "status": "pending",
+             "priority": "medium", "project_id": 1, "created_at": now, "updated_at": now}
+            for i in range(1, args.rows + 1)
+        ])
+        conn.execute(insert(models.Documentation), [
+            {"id": i, "title": f"doc {i}", "content": "lorem ipsum " * 40, "doc_type": models.DocumentationType.MARKDOWN,
+             "author_id": 1, "project_id": 1, "created_at": now, "updated_at": now}
+            for i in range(1, args.rows + 1)
+        ])
+
+    cases = {
+        "projects": (models.Project, schemas.ProjectResponse, [], {}),
+        "tasks": (models.Task, schemas.TaskResponse, [], {}),
+        "documentation": (
+            models.Documentation, schemas.DocumentationSummary,
+            [joinedload(models.Documentation.author)], {"author": (models.User, schemas.UserResponse)},
+        ),
+    }
+
+    def timed(fn):
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            body = fn()
+            samples.append(time.perf_counter() - start)
+        seconds = statistics.median(samples)
+        return {"ms": round(seconds * 1000, 1), "rows_per_second": round(args.rows / seconds), "bytes": len(body)}
+
+    report = {"rows": args.rows}
+    for name, (model, schema, options, nested) in cases.items():
+        adapter = TypeAdapter(List[schema])
+        projection = Projection(model, schema, nested=nested)
+
+        def orm_pydantic():
+            with database.SessionLocal() as session:
+                rows = session.scalars(select(model).options(*options)).unique().all()
+                content = adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json")
+            return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+        def type_adapter():
+            with database.SessionLocal() as session:
+                rows = session.scalars(select(model).options(*options)).unique().all()
+                return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+
+        def projection_orjson():
+            with database.SessionLocal() as session:
+                rows = session.execute(projection.select()).all()
+            return dumps([projection.to_dict(row) for row in rows])
+
+        report[name] = {
+            "orm_pydantic": timed(orm_pydantic),
+            "type_adapter": timed(type_adapter),
+            "projection_orjson": timed(projection_orjson),
+        }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
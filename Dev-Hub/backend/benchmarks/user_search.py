@@ -0,0 +1,86 @@
+"""User directory benchmark: GET /users/search against many users.
+
+Fills a throwaway database with --users users named after random words
+(realistic shared prefixes) and reports:
+
+- load_ms: building the prefix index from the users table, done in the
+  background when a process starts
+- search_us: median and p99 time of UserDirectory.search for prefixes
+  of one to six characters, and the same excluding a project's members
+- endpoint_ms: median wall time of GET /users/search through the app
+
+    python -m benchmarks.user_search --users 300000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    return {"p50": round(statistics.median(samples), 2), "p99": round(samples[int(len(samples) * 0.99)], 2)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=300000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp.name, 'bench.db')}"
+    from fastapi.testclient import TestClient
+    from sqlalchemy import insert
+    from app import database, models
+    from app.user_directory import UserDirectory, user_directory
+    from main import app
+
+    rng = random.Random(args.seed)
+    syllables = ["an", "be", "chi", "do", "el", "fa", "gu", "ha", "io", "ju", "ka", "lo", "ma", "ne", "or", "pi"]
+    names = set()
+    while len(names) < args.users:
+        names.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) + str(rng.randint(0, 999)))
+    names = sorted(names)
+    rng.shuffle(names)
+    with database.engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"username": name, "email": f"{name}@{rng.choice(['example.com', 'mail.test'])}", "hashed_password": "x"}
+            for name in names
+        ])
+
+    directory = UserDirectory()
+    started = time.perf_counter()
+    directory._load(database.engine)
+    load_ms = (time.perf_counter() - started) * 1000
+
+    members = set(rng.sample(range(1, args.users + 1), min(1000, args.users)))
+    prefixes = [rng.choice(names)[:length] for length in range(1, 7) for _ in range(args.queries // 6)]
+    report = {"users": args.users, "load_ms": round(load_ms, 1), "search_us": {}}
+    for label, exclude in (("plain", ()), ("exclude_1000_members", members)):
+        timings = []
+        for prefix in prefixes:
+            started = time.perf_counter()
+            directory.search(prefix, 20, exclude)
+            timings.append((time.perf_counter() - started) * 1e6)
+        report["search_us"][label] = _percentiles(timings)
+
+    with TestClient(app) as client:
+        client.post("/auth/signup", json={"email": "bench@example.com", "username": "bench", "password": "bench"})
+        token = client.post("/auth/token", data={"username": "bench", "password": "bench"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        client.get("/users/search", params={"q": "a"}, headers=headers)  # waits for the index
+        timings = []
+        for prefix in prefixes[:200]:
+            started = time.perf_counter()
+            client.get("/users/search", params={"q": prefix}, headers=headers)
+            timings.append((time.perf_counter() - started) * 1000)
+        report["endpoint_ms"] = _percentiles(timings)
+        report["directory"] = user_directory.stats()
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,42 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app import models
+from app import compression, database, doc_storage, membership, metrics, models, search, stats, sync, task_query, timing, versions
 from app.database import engine
-from app.routers import auth, projects, tasks, documentation
+from app.user_directory import user_directory
+from app.routers import auth, projects, tasks, documentation, dashboard, events, users, sync as sync_router, metrics as metrics_router
 
 # Create database tables
 models.Base.metadata.create_all(bind=engine)
+task_query.create_task_columns(engine)
+# create_all only adds indexes along with their table; add new ones to existing databases
+for table in models.Base.metadata.sorted_tables:
+    for index in table.indexes:
+        index.create(bind=engine, checkfirst=True)
+doc_storage.create_doc_storage(engine)
+search.create_search_index(engine)
+versions.create_version_triggers(engine)
+stats.create_stats_triggers(engine)
+sync.create_sync_log(engine)
+membership.create_membership_versions(engine)
+# Per-request query counts and DB time for metrics and Server-Timing
+for instrumented in (database.engine, database.reader_engine, database.async_engine, database.async_reader_engine):
+    timing.instrument(instrumented)
 
-app = FastAPI(title="Project Management API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Periodically drop old tombstones from the sync change log
+    compaction = asyncio.create_task(sync.compaction_loop()) if sync.sync_enabled else None
+    # Build the user search index before the first search needs it
+    warm = asyncio.create_task(user_directory.refresh())
+    yield
+    warm.cancel()
+    if compaction:
+        compaction.cancel()
+
+app = FastAPI(title="Project Management API", version="1.0.0", default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -16,13 +45,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Server-Timing"],
 )
+app.add_middleware(compression.CompressionMiddleware)
+# Outermost, so the recorded time covers the other middleware too
+app.add_middleware(metrics.MetricsMiddleware)
+app.router.route_class = metrics.TimedRoute
 
 # Include routers
 app.include_router(auth.router)
 app.include_router(projects.router)
 app.include_router(tasks.router)
 app.include_router(documentation.router)
+app.include_router(dashboard.router)
+app.include_router(users.router)
+app.include_router(events.router)
+app.include_router(sync_router.router)
+app.include_router(metrics_router.router)
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,45 @@
+"""App and client shared by the tests.
+
+The engines are configured from DATABASE_URL when app.database is first
+imported, so it points at a scratch database before any test imports the
+app. Every test module shares that database; use names of your own.
+"""
+import os
+import tempfile
+import pytest
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'test.db')}"
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ.setdefault("TOKEN_ROLE_CLAIMS", "1")
+
+# Query budgets for the tests that declare them, see app.query_budget
+pytest_plugins = ["app.query_budget"]
+
+@pytest.fixture(scope="session")
+def app():
+    from main import app
+    return app
+
+@pytest.fixture(scope="session")
+def client(app):
+    from fastapi.testclient import TestClient
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture(scope="session")
+def login(client):
+    """Authorization headers for username, signed up on first use"""
+    def login(username: str) -> dict:
+        client.post("/auth/signup", json={"email": f"{username}@example.com", "username": username, "password": "secret"})
+        response = client.post("/auth/token", data={"username": username, "password": "secret"})
+        assert response.status_code == 200, response.text
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return login
+
+@pytest.fixture(scope="session")
+def user_id(client):
+    """Id of the user the headers authenticate"""
+    def user_id(headers: dict) -> int:
+        return client.get("/auth/me", headers=headers).json()["id"]
+    return user_id
@@ -0,0 +1,50 @@
+"""Every benchmark runs end to end on a tiny dataset.
+
+The benchmarks seed their own databases through the app's models,
+triggers and SQL functions, so a schema or trigger change can break them
+without breaking the app. Each runs as its own process, since the engines
+are configured from DATABASE_URL at import time.
+"""
+import os
+import subprocess
+import sys
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SMALL_RUNS = {
+    "compression": ["--users", "3", "--projects", "5", "--repeat", "1"],
+    "doc_search": ["--sizes", "100", "--repeat", "1"],
+    "event_fanout": ["--subscribers", "5", "--events", "2"],
+    "load_test": ["--users", "5", "--projects", "5", "--concurrency", "2", "--duration", "1", "--warmup", "0.5"],
+    "query_plans": ["--projects", "50", "--tasks", "10", "--docs", "3"],
+    "serialization": ["--rows", "50", "--repeat", "1"],
+    "user_search": ["--users", "100", "--queries", "60"],
+    "write_queue": ["--concurrency", "4", "--seconds", "0.5"],
+}
+
+def test_every_benchmark_has_a_small_run():
+    modules = {
+        name[:-3] for name in os.listdir(os.path.join(BACKEND, "benchmarks"))
+        if name.endswith(".py") and name != "__init__.py"
+    }
+    assert modules == set(SMALL_RUNS) | {"seed_data"}
+
+def run_benchmark(name, *args):
+    env = dict(os.environ, BCRYPT_ROUNDS="4")
+    env.pop("DATABASE_URL", None)
+    result = subprocess.run(
+        [sys.executable, "-m", f"benchmarks.{name}", *args],
+        cwd=BACKEND, env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stdout[-2000:] + result.stderr[-4000:]
+    return result.stdout
+
+@pytest.mark.parametrize("name", sorted(SMALL_RUNS))
+def test_benchmark_runs(name):
+    run_benchmark(name, *SMALL_RUNS[name])
+
+def test_seed_data(tmp_path):
+    path = tmp_path / "seed.db"
+    run_benchmark("seed_data", str(path), "--users", "5", "--projects", "5", "--tasks-median", "3", "--docs-median", "2")
+    assert path.exists()
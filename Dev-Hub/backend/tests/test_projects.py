@@ -0,0 +1,39 @@
+"""ETags and conditional GETs of project detail."""
+import pytest
+
+@pytest.fixture(scope="module")
+def owner(login):
+    return login("etag_owner")
+
+def test_unchanged_project_answers_304(client, owner, login):
+    project_id = client.post("/projects/", json={"name": "etag"}, headers=owner).json()["id"]
+    response = client.get(f"/projects/{project_id}", headers=owner)
+    etag = response.headers["ETag"]
+    assert client.get(f"/projects/{project_id}", headers={**owner, "If-None-Match": etag}).status_code == 304
+    assert client.get(f"/projects/{project_id}", headers={**owner, "If-None-Match": f"W/{etag}"}).status_code == 304
+    # The ETag does not stand in for access
+    outsider = login("etag_outsider")
+    assert client.get(f"/projects/{project_id}", headers={**outsider, "If-None-Match": etag}).status_code == 403
+
+@pytest.mark.parametrize("change", ["rename", "add_task", "update_task", "bulk_tasks"])
+def test_changes_move_the_etag(client, owner, change):
+    project_id = client.post("/projects/", json={"name": "etag"}, headers=owner).json()["id"]
+    task_id = client.post("/tasks/", json={"title": "etag", "project_id": project_id}, headers=owner).json()["id"]
+    etag = client.get(f"/projects/{project_id}", headers=owner).headers["ETag"]
+    if change == "rename":
+        client.put(f"/projects/{project_id}", json={"name": "etag 2"}, headers=owner)
+    elif change == "add_task":
+        client.post("/tasks/", json={"title": "etag 2", "project_id": project_id}, headers=owner)
+    elif change == "update_task":
+        client.put(f"/tasks/{task_id}", json={"status": "completed"}, headers=owner)
+    else:
+        client.patch("/tasks/bulk", json={"items": [{"id": task_id, "priority": "high"}]}, headers=owner)
+    response = client.get(f"/projects/{project_id}", headers={**owner, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+def test_deleted_project_is_not_served_from_cache(client, owner):
+    project_id = client.post("/projects/", json={"name": "etag"}, headers=owner).json()["id"]
+    etag = client.get(f"/projects/{project_id}", headers=owner).headers["ETag"]
+    client.delete(f"/projects/{project_id}", headers=owner)
+    assert client.get(f"/projects/{project_id}", headers={**owner, "If-None-Match": etag}).status_code == 404
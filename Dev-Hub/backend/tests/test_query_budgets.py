@@ -0,0 +1,88 @@
+"""Statements per request of the list, detail and dashboard endpoints.
+
+Every budget holds for a workspace of several projects, each with several
+members, tasks and documents, so a query per row shows up twice: as a
+repeated statement (see app.query_budget) and as a count over budget.
+Budgets are the measured counts plus one, for re-reading the membership
+version once its cached entry has expired.
+"""
+import pytest
+
+PROJECTS = 4
+MEMBERS = 3  # besides the owner
+TASKS = 5  # per project
+DOCS = 3  # per project
+
+@pytest.fixture(scope="module")
+def workspace(client, login, user_id):
+    owner = login("budget_owner")
+    owner_id = user_id(owner)
+    member_ids = [user_id(login(f"budget_member{n}")) for n in range(MEMBERS)]
+    project_ids = []
+    for n in range(PROJECTS):
+        project_id = client.post("/projects/", json={"name": f"budget {n}"}, headers=owner).json()["id"]
+        project_ids.append(project_id)
+        for member_id in member_ids:
+            response = client.post(f"/projects/{project_id}/members", json={"user_id": member_id, "role": "member"}, headers=owner)
+            assert response.status_code == 200, response.text
+        response = client.post("/tasks/bulk", json={"items": [
+            {"title": f"task {k}", "project_id": project_id, "assignee_id": owner_id, "priority": ("low", "medium", "high")[k % 3]}
+            for k in range(TASKS)
+        ]}, headers=owner)
+        assert all(result["status"] == 201 for result in response.json()["results"]), response.text
+        for k in range(DOCS):
+            client.post("/documentation/", json={
+                "title": f"doc {k}", "content": "budget " * 20, "doc_type": "markdown", "project_id": project_id,
+            }, headers=owner)
+    # A token issued after the memberships carries current role claims
+    token = client.post("/auth/refresh", headers=owner).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    client.get("/auth/me", headers=headers)  # later requests find the principal cached
+    return {"headers": headers, "owner_id": owner_id, "project_ids": project_ids}
+
+def _get(client, workspace, path, **params):
+    response = client.get(path, params=params, headers=workspace["headers"])
+    assert response.status_code == 200, response.text
+    return response
+
+@pytest.mark.parametrize("path, params, budget", [
+    ("/projects/", {}, 3),
+    ("/projects/", {"limit": 2}, 2),
+    ("/projects/stats", {}, 3),
+    ("/tasks/", {}, 3),
+    ("/tasks/mine", {}, 3),
+    ("/tasks/mine", {"sort": "priority", "limit": 2}, 3),
+    ("/documentation/", {}, 3),
+    ("/documentation/", {"limit": 2}, 3),
+    ("/sync/", {}, 7),
+])
+def test_lists_within_budget(client, workspace, query_budget, path, params, budget):
+    with query_budget(budget):
+        _get(client, workspace, path, **params)
+
+def test_lists_return_every_row(client, workspace):
+    project_ids = set(workspace["project_ids"])
+    assert project_ids <= {project["id"] for project in _get(client, workspace, "/projects/").json()}
+    tasks = [task for task in _get(client, workspace, "/tasks/").json() if task["project_id"] in project_ids]
+    assert len(tasks) == PROJECTS * TASKS
+    docs = [doc for doc in _get(client, workspace, "/documentation/").json() if doc["project_id"] in project_ids]
+    assert len(docs) == PROJECTS * DOCS
+
+def test_dashboard_within_budget(client, workspace, query_budget):
+    with query_budget(5):
+        dashboard = _get(client, workspace, "/dashboard").json()
+    projects = {project["id"]: project for project in dashboard["projects"]}
+    assert all(projects[project_id]["task_counts"]["total"] == TASKS for project_id in workspace["project_ids"])
+    high = sum(1 for k in range(TASKS) if k % 3 == 2) * PROJECTS
+    assert [task["priority"] for task in dashboard["my_tasks"][:high]] == ["high"] * high
+
+@pytest.mark.query_budget(routes={"GET /projects/{project_id}": 7})
+def test_project_detail_within_budget(client, workspace):
+    for project_id in workspace["project_ids"]:
+        project = _get(client, workspace, f"/projects/{project_id}", include="members,tasks").json()
+        assert len(project["members"]) == MEMBERS
+        assert len(project["tasks"]) == TASKS
+
+@pytest.mark.query_budget(0)
+def test_cached_principal_issues_no_query(client, workspace):
+    assert _get(client, workspace, "/auth/me").json()["id"] == workspace["owner_id"]
@@ -0,0 +1,29 @@
+"""No route's SQL scans a whole table.
+
+Calls every route the way benchmarks.query_plans does and runs EXPLAIN
+QUERY PLAN on each distinct statement they issued. A new route needs a
+call in benchmarks.query_plans._calls, or test_every_route_is_exercised
+fails.
+"""
+import pytest
+from benchmarks import query_plans
+
+@pytest.fixture(scope="module")
+def exercised(app, client):
+    from app import database, models
+    return query_plans.exercise_routes(client, app, database, models, projects=100, tasks=20, docs=5)
+
+def test_every_route_is_exercised(exercised):
+    _, _, missing = exercised
+    assert not missing, f"Routes without a call in benchmarks.query_plans._calls: {missing}"
+
+def test_no_full_scans(exercised):
+    from app import database
+    statements, _, _ = exercised
+    assert statements
+    failures = [
+        f"{', '.join(sorted(labels))}: {' '.join(statement.split())}\n    " + "\n    ".join(plan)
+        for statement, labels, plan, scans in query_plans.plans(database.engine.url.database, statements)
+        if scans
+    ]
+    assert not failures, "Full table scans:\n" + "\n".join(failures)
@@ -0,0 +1,54 @@
+"""Delta sync: full loads, row deltas, tombstones and gained access."""
+import pytest
+
+@pytest.fixture(scope="module")
+def owner(login):
+    return login("sync_owner")
+
+@pytest.fixture(scope="module")
+def member(login):
+    return login("sync_member")
+
+def _sync(client, headers, since=None):
+    response = client.get("/sync/", params={"since": since} if since else {}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def _project(client, owner, name, tasks):
+    project_id = client.post("/projects/", json={"name": name}, headers=owner).json()["id"]
+    task_ids = [client.post("/tasks/", json={"title": f"{name} {n}", "project_id": project_id}, headers=owner).json()["id"]
+                for n in range(tasks)]
+    return project_id, task_ids
+
+def test_deltas_carry_changed_rows_and_tombstones(client, owner):
+    project_id, task_ids = _project(client, owner, "sync deltas", 4)
+    full = _sync(client, owner)
+    assert project_id in {project["id"] for project in full["projects"]}
+    assert set(task_ids) <= {task["id"] for task in full["tasks"]}
+
+    cursor = full["cursor"]
+    unchanged = _sync(client, owner, cursor)
+    assert unchanged["cursor"] == cursor and not unchanged["tasks"] and not unchanged["projects"]
+
+    client.put(f"/tasks/{task_ids[0]}", json={"title": "changed"}, headers=owner)
+    client.delete(f"/tasks/{task_ids[1]}", headers=owner)
+    delta = _sync(client, owner, cursor)
+    assert [(task["id"], task["title"]) for task in delta["tasks"]] == [(task_ids[0], "changed")]
+    assert delta["deleted"]["tasks"] == [task_ids[1]]
+    # Editing a project's rows is not gaining access to it: no full resend
+    assert delta["projects"] == []
+
+    cursor = delta["cursor"]
+    client.delete(f"/projects/{project_id}", headers=owner)
+    assert project_id in _sync(client, owner, cursor)["deleted"]["projects"]
+
+def test_gaining_access_sends_the_whole_project(client, owner, member, user_id):
+    project_id, task_ids = _project(client, owner, "sync access", 3)
+    cursor = _sync(client, member)["cursor"]
+    client.post(f"/projects/{project_id}/members", json={"user_id": user_id(member), "role": "member"}, headers=owner)
+    delta = _sync(client, member, cursor)
+    assert [project["id"] for project in delta["projects"]] == [project_id]
+    assert sorted(task["id"] for task in delta["tasks"]) == sorted(task_ids)
+
+def test_invalid_cursor_is_rejected(client, owner):
+    assert client.get("/sync/", params={"since": "abc"}, headers=owner).status_code == 400
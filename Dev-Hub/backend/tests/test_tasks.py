@@ -0,0 +1,76 @@
+"""Bulk task endpoints and keyset pages of task lists."""
+import pytest
+
+@pytest.fixture(scope="module")
+def owner(login):
+    return login("tasks_owner")
+
+@pytest.fixture(scope="module")
+def outsider(login):
+    return login("tasks_outsider")
+
+@pytest.fixture(scope="module")
+def project_id(client, owner):
+    return client.post("/projects/", json={"name": "tasks"}, headers=owner).json()["id"]
+
+def _bulk(client, method, headers, payload):
+    response = client.request(method, "/tasks/bulk", json=payload, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["results"]
+
+def test_bulk_create_maps_ids_to_items(client, owner, outsider, project_id):
+    foreign = client.post("/projects/", json={"name": "not yours"}, headers=outsider).json()["id"]
+    items = [{"title": f"bulk {n}", "project_id": foreign if n == 3 else project_id} for n in range(8)]
+    results = _bulk(client, "POST", owner, {"items": items})
+    assert [result["index"] for result in results] == list(range(8))
+    assert results[3]["status"] == 403 and results[3]["id"] is None
+    for n, result in enumerate(results):
+        if n != 3:
+            assert result["status"] == 201
+            assert client.get(f"/tasks/{result['id']}", headers=owner).json()["title"] == f"bulk {n}"
+
+def test_bulk_update_and_delete_report_each_item(client, owner, project_id):
+    ids = [result["id"] for result in _bulk(client, "POST", owner, {"items": [
+        {"title": f"change {n}", "project_id": project_id} for n in range(3)
+    ]})]
+    results = _bulk(client, "PATCH", owner, {"items": [{"id": task_id, "status": "completed"} for task_id in ids] + [
+        {"id": 10 ** 9, "status": "completed"},
+    ]})
+    assert [result["status"] for result in results] == [200, 200, 200, 404]
+    assert all(client.get(f"/tasks/{task_id}", headers=owner).json()["status"] == "completed" for task_id in ids)
+
+    results = _bulk(client, "DELETE", owner, {"ids": [ids[0], 10 ** 9, ids[1]]})
+    assert [result["status"] for result in results] == [200, 404, 200]
+    assert client.get(f"/tasks/{ids[0]}", headers=owner).status_code == 404
+    assert client.get(f"/tasks/{ids[2]}", headers=owner).status_code == 200
+
+def _pages(client, headers, path, **params):
+    seen, cursor = [], None
+    while True:
+        response = client.get(path, params={**params, "limit": 4, **({"cursor": cursor} if cursor else {})}, headers=headers)
+        assert response.status_code == 200, response.text
+        seen += response.json()
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return seen
+
+@pytest.mark.parametrize("sort", [None, "updated_at", "created_at", "priority"])
+def test_keyset_pages_cover_the_list_in_order(client, owner, project_id, sort):
+    _bulk(client, "POST", owner, {"items": [
+        {"title": f"page {n}", "project_id": project_id, "priority": ("low", "medium", "high")[n % 3]} for n in range(10)
+    ]})
+    params = {"project_id": project_id, **({"sort": sort} if sort else {})}
+    full = client.get("/tasks/", params=params, headers=owner).json()
+    paged = _pages(client, owner, "/tasks/", **params)
+    assert len({task["id"] for task in paged}) == len(paged)
+    if sort:
+        assert [task["id"] for task in paged] == [task["id"] for task in full]
+    else:
+        # Unpaged lists keep their old order; pages run newest first
+        assert sorted(task["id"] for task in paged) == sorted(task["id"] for task in full)
+    if sort == "priority":
+        ranks = {"high": 0, "medium": 1, "low": 2}
+        assert [ranks[task["priority"]] for task in paged] == sorted(ranks[task["priority"]] for task in paged)
+
+def test_invalid_cursor_is_rejected(client, owner):
+    assert client.get("/tasks/", params={"cursor": "garbage"}, headers=owner).status_code == 400
@@ -79,9 +79,33 @@ const DocumentationList = ({ projectId, taskId }) => {
     }
   };
 
-  const handleEdit = (doc) => {
-    setEditingDoc(doc);
-    setShowModal(true);
+  // The list only returns an excerpt of each body; fetch the whole document when needed
+  const loadFullDoc = async (doc) => {
+    if (doc.content !== undefined) {
+      return doc;
+    }
+    try {
+      const response = await authFetch(`${API_BASE_URL}/documentation/${doc.id}`);
+      if (response.ok) {
+        const fullDoc = await response.json();
+        setDocumentation(prev => prev.map(item => 
+          item.id === fullDoc.id ? fullDoc : item
+        ));
+        return fullDoc;
+      }
+      setError('Failed to load documentation');
+    } catch (err) {
+      setError('An error occurred while loading documentation');
+    }
+    return null;
+  };
+
+  const handleEdit = async (doc) => {
+    const fullDoc = await loadFullDoc(doc);
+    if (fullDoc) {
+      setEditingDoc(fullDoc);
+      setShowModal(true);
+    }
   };
 
   const handleAddNew = () => {
@@ -90,12 +114,27 @@ const DocumentationList = ({ projectId, taskId }) => {
   };
 
   const renderDocumentationContent = (doc) => {
+    const content = doc.content ?? doc.excerpt ?? '';
+    const truncated = doc.content === undefined && doc.content_size > content.length;
+    return (
+      <>
+        {renderBody(doc, content)}
+        {truncated && (
+          <button onClick={() => loadFullDoc(doc)} className="btn btn-small btn-secondary">
+            Show more
+          </button>
+        )}
+      </>
+    );
+  };
+
+  const renderBody = (doc, content) => {
     switch (doc.doc_type) {
       case 'markdown':
         return (
           <div className="doc-content">
             <div className="markdown-preview">
-              {doc.content.split('\n').map((line, index) => {
+              {content.split('\n').map((line, index) => {
                 if (line.startsWith('# ')) {
                   return <h3 key={index}>{line.substring(2)}</h3>;
                 } else if (line.startsWith('## ')) {
@@ -123,7 +162,7 @@ const DocumentationList = ({ projectId, taskId }) => {
             >
               {doc.url}
             </a>
-            {doc.content && <p className="doc-description">{doc.content}</p>}
+            {content && <p className="doc-description">{content}</p>}
           </div>
         );
 
@@ -135,14 +174,14 @@ const DocumentationList = ({ projectId, taskId }) => {
                 <span className="language-tag">{doc.language || 'code'}</span>
               </div>
               <pre className="code-content">
-                <code>{doc.content}</code>
+                <code>{content}</code>
               </pre>
             </div>
           </div>
         );
 
       default:
-        return <div className="doc-content">{doc.content}</div>;
+        return <div className="doc-content">{content}</div>;
     }
   };
 
@@ -10,20 +10,22 @@ import Sidebar from '../components/Sidebar';
 const Dashboard = () => {
   const { user, token, logout, API_BASE_URL } = useAuth();
   const [projects, setProjects] = useState([]);
-  const [tasks, setTasks] = useState([]);
+  const [taskCounts, setTaskCounts] = useState({ total: 0, by_status: {} });
+  const [myTasks, setMyTasks] = useState([]);
+  const [recentDocs, setRecentDocs] = useState([]);
   const [loading, setLoading] = useState(true);
   const [showCreateProject, setShowCreateProject] = useState(false);
   const [showCreateTask, setShowCreateTask] = useState(false);
   const [selectedProject, setSelectedProject] = useState(null);
 
   useEffect(() => {
-    fetchProjects();
-    fetchTasks();
+    fetchDashboard();
   }, []);
 
-  const fetchProjects = async () => {
+  // Projects with task counts, the user's open tasks and recent docs in one request
+  const fetchDashboard = async () => {
     try {
-      const response = await fetch(`${API_BASE_URL}/projects/`, {
+      const response = await fetch(`${API_BASE_URL}/dashboard`, {
         headers: {
           'Authorization': `Bearer ${token}`,
           'Content-Type': 'application/json',
@@ -31,27 +33,13 @@ const Dashboard = () => {
       });
       if (response.ok) {
         const data = await response.json();
-        setProjects(data);
+        setProjects(data.projects);
+        setTaskCounts(data.task_counts);
+        setMyTasks(data.my_tasks);
+        setRecentDocs(data.recent_documentation);
       }
     } catch (error) {
-      console.error('Error fetching projects:', error);
-    }
-  };
-
-  const fetchTasks = async () => {
-    try {
-      const response = await fetch(`${API_BASE_URL}/tasks/`, {
-        headers: {
-          'Authorization': `Bearer ${token}`,
-          'Content-Type': 'application/json',
-        },
-      });
-      if (response.ok) {
-        const data = await response.json();
-        setTasks(data);
-      }
-    } catch (error) {
-      console.error('Error fetching tasks:', error);
+      console.error('Error fetching dashboard:', error);
     } finally {
       setLoading(false);
     }
@@ -62,26 +50,26 @@ const Dashboard = () => {
     setShowCreateProject(false);
   };
 
-  const handleTaskCreated = (newTask) => {
-    setTasks([...tasks, newTask]);
+  const handleTaskCreated = () => {
+    fetchDashboard();
     setShowCreateTask(false);
   };
 
   const handleProjectDeleted = (projectId) => {
     setProjects(projects.filter(p => p.id !== projectId));
-    setTasks(tasks.filter(t => t.project_id !== projectId));
+    fetchDashboard();
   };
 
-  const handleTaskDeleted = (taskId) => {
-    setTasks(tasks.filter(t => t.id !== taskId));
+  const handleTaskDeleted = () => {
+    fetchDashboard();
   };
 
   const handleProjectUpdated = (updatedProject) => {
-    setProjects(projects.map(p => p.id === updatedProject.id ? updatedProject : p));
+    setProjects(projects.map(p => p.id === updatedProject.id ? { ...p, ...updatedProject } : p));
   };
 
-  const handleTaskUpdated = (updatedTask) => {
-    setTasks(tasks.map(t => t.id === updatedTask.id ? updatedTask : t));
+  const handleTaskUpdated = () => {
+    fetchDashboard();
   };
 
   if (loading) {
@@ -94,9 +82,9 @@ const Dashboard = () => {
 
   // Stats
   const totalProjects = projects.length;
-  const totalTasks = tasks.length;
-  const completedTasks = tasks.filter(t => t.status === 'completed').length;
-  const pendingTasks = tasks.filter(t => t.status !== 'completed').length;
+  const totalTasks = taskCounts.total;
+  const completedTasks = taskCounts.by_status.completed || 0;
+  const pendingTasks = totalTasks - completedTasks;
 
   return (
     <div className="dashboard-container">
@@ -131,6 +119,49 @@ const Dashboard = () => {
             <span className="stat-value">{pendingTasks}</span>
           </div>
         </div>
+        <div className="main-sections">
+          <section className="card">
+            <div className="section-header">
+              <h2>My Open Tasks</h2>
+            </div>
+            {myTasks.length === 0 ? (
+              <div className="no-tasks">No open tasks assigned to you</div>
+            ) : (
+              <div className="task-list">
+                {myTasks.map(task => (
+                  <div key={task.id} className="task-card">
+                    <div className="task-main">
+                      <h3 className="task-title">{task.title}</h3>
+                      <div className="task-meta">
+                        <span className={`status-badge status-${task.status}`}>{task.status?.replace('_', ' ')}</span>
+                        <span className={`priority-badge priority-${task.priority}`}>{task.priority}</span>
+                      </div>
+                    </div>
+                  </div>
+                ))}
+              </div>
+            )}
+          </section>
+          <section className="card">
+            <div className="section-header">
+              <h2>Recent Documentation</h2>
+            </div>
+            {recentDocs.length === 0 ? (
+              <div className="no-tasks">No documentation yet</div>
+            ) : (
+              <div className="task-list">
+                {recentDocs.map(doc => (
+                  <div key={doc.id} className="task-card">
+                    <div className="task-main">
+                      <h3 className="task-title">{doc.title}</h3>
+                      <p className="task-date">Updated: {new Date(doc.updated_at).toLocaleDateString()}</p>
+                    </div>
+                  </div>
+                ))}
+              </div>
+            )}
+          </section>
+        </div>
       </main>
     </div>
   );